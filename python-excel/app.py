@@ -1,64 +1,306 @@
+import logging
 import os
-from flask import Flask, request, send_file
+import time
+from flask import Flask, Response, g, request, send_file, jsonify
 from flask_cors import CORS
 
 # 1. Import the Engine and the Writer
 from generators.excel.engine import generate_full_report
-from generators.excel.writer import save_to_memory
+from generators.excel.writer import save_to_spooled_file
+from generators.pdf.engine import generate_pdf_report
+from generators.admission import admission, estimate_cost, Overloaded
+from generators.batch import iter_batch_zip, VALID_MODES, XLSX_ONLY_MODES
+from generators.jobs import jobs, QueueFull
+from generators.output_cache import output_cache_key, open_cached_output, store_output
+from generators.common.config import BATCH_MAX_ITEMS, ROLLUP_MAX_DAYS, UPLOAD_MAX_PARTS, UPLOAD_MAX_FIELD_BYTES
+from generators.common.logs import configure_logging
+from generators.common.metrics import Counter, Gauge, Histogram, render_metrics
+from generators.common.uploads import load_multipart_payload
+from generators.warmup import start_warm_up, warm_up_status
+
+configure_logging()
+logger = logging.getLogger("app")
 
 app = Flask(__name__)
+app.config["MAX_FORM_PARTS"] = UPLOAD_MAX_PARTS
+app.config["MAX_FORM_MEMORY_SIZE"] = UPLOAD_MAX_FIELD_BYTES
 CORS(app)
 
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response is handed to the server (streamed bodies keep going after).",
+    ("endpoint",),
+)
+REQUESTS = Counter("http_requests", "Finished requests by endpoint and status code.", ("endpoint", "status"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.")
+
+def _endpoint_label():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+@app.before_request
+def _start_request():
+    g.request_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+@app.after_request
+def _record_request(response):
+    REQUESTS.inc(endpoint=_endpoint_label(), status=str(response.status_code))
+    return response
+
+@app.teardown_request
+def _finish_request(exc):
+    started = g.pop("request_started", None)
+    if started is None:
+        return
+    IN_FLIGHT.dec()
+    elapsed = time.perf_counter() - started
+    REQUEST_SECONDS.observe(elapsed, endpoint=_endpoint_label())
+    logger.info("request method=%s path=%s duration=%.3fs", request.method, request.path, elapsed)
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def _send_stream(output, download_name, mimetype):
+    """Streams a spooled output file back to the client (send_file closes it)."""
+    size = output.seek(0, os.SEEK_END)
+    output.seek(0)
+
+    response = send_file(
+        output,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=mimetype,
+    )
+    response.content_length = size
+    return response
+
+def _render(data, mode, fmt):
+    """Renders one output into a spooled temp file positioned at 0."""
+    if fmt == "pdf":
+        # Straight to PDF with reportlab (no xlsx conversion step)
+        return generate_pdf_report(data, mode=mode)
+    # Spooled temp file (RAM for small files, disk for large ones) instead of a BytesIO
+    return save_to_spooled_file(generate_full_report(data, mode=mode, reuse_parts=True))
+
+def _send_report(data, mode, fmt, name):
+    """
+    Serves one report, from the output cache when the same payload was already
+    rendered. The cache key doubles as a strong ETag, so a client sending it
+    back in If-None-Match gets a 304 without anything being generated.
+    Only actual renders go through admission control (503 when it is full).
+    """
+    fmt = "pdf" if fmt == "pdf" else "xlsx"
+    mimetype = "application/pdf" if fmt == "pdf" else XLSX_MIMETYPE
+
+    key = output_cache_key(data, mode, fmt)
+    if key is not None and request.if_none_match.contains(key):
+        response = Response(status=304)
+        response.set_etag(key)
+        return response
+
+    output = open_cached_output(key)
+    cache_status = "hit"
+    if output is None:
+        try:
+            with admission.admit(estimate_cost(data, mode)):
+                output = _render(data, mode, fmt)
+        except Overloaded as e:
+            logger.warning("rejected render mode=%s: %s", mode, e)
+            return jsonify({"error": "Server is busy, try again later"}), 503, {"Retry-After": str(e.retry_after)}
+        store_output(key, output)
+        cache_status = "miss" if key is not None else "bypass"
+
+    response = _send_stream(output, f"{name}.{fmt}", mimetype)
+    response.headers["X-Output-Cache"] = cache_status
+    if key is not None:
+        response.set_etag(key)
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def _request_payload(detach=False):
+    """
+    The request body: plain JSON, or multipart/form-data with the same JSON in
+    a "payload" part and each photo as its own raw part, referenced from the
+    JSON as "attachment:<part name>" (see generators/common/uploads.py).
+    Returns None if the body can't be read.
+    """
+    if request.mimetype == "multipart/form-data":
+        try:
+            return load_multipart_payload(request.form, request.files, detach=detach)
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.info("rejected multipart payload: %s", e)
+            return None
+    return request.get_json(silent=True)
+
+def _bad_payload():
+    return jsonify({"error": "Expected a JSON body or multipart/form-data with a 'payload' part"}), 400
+
+def _requested_format(payload=None):
+    """
+    Output format: "xlsx" (default) or "pdf".
+    Taken from ?format=... or a "format" key in the JSON payload.
+    """
+    fmt = request.args.get("format")
+    if not fmt and isinstance(payload, dict):
+        fmt = payload.get("format")
+    return (fmt or "xlsx").lower()
+
+def _invalid_request(data, mode, fmt):
+    """An error response for a mode/format/data combination that can't be rendered, or None."""
+    if mode in XLSX_ONLY_MODES and fmt == "pdf":
+        return jsonify({"error": f"Mode {mode!r} is only available as xlsx"}), 400
+    if mode == "rollup":
+        days = data.get("days") if isinstance(data, dict) else None
+        if not isinstance(days, list):
+            return jsonify({"error": "Expected 'days': a list of daily report payloads"}), 400
+        if len(days) > ROLLUP_MAX_DAYS:
+            return jsonify({"error": f"Too many days (max {ROLLUP_MAX_DAYS})"}), 413
+    return None
+
 # --- REFACTORED ROUTES ---
 
 @app.route("/generate-report", methods=["POST"])
 def generate_report():
-    payload = request.json
+    payload = _request_payload()
+    if not isinstance(payload, dict):
+        return _bad_payload()
     mode = payload.get('mode', 'report')
     data = payload.get('data')  # Extract the actual data
     
-    # Debug: Print what we received
-    print(f"Mode: {mode}")
-    print(f"Data keys: {list(data.keys()) if data else 'None'}")
-    
-    wb = generate_full_report(data, mode=mode)
-    output = save_to_memory(wb)
-    
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name="Report_Only_Verification.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
+    logger.debug("generate-report mode=%s data_keys=%s", mode, sorted(data) if data else None)
+
+    fmt = _requested_format(payload)
+    error = _invalid_request(data, mode, fmt)
+    if error:
+        return error
+    return _send_report(data, mode, fmt, "Report_Only_Verification")
 
 @app.route("/generate-reference", methods=["POST"])
 def generate_reference():
-    data = request.json 
-    # Use the engine with mode="reference" (it will delete the report sheet automatically)
-    wb = generate_full_report(data, mode="reference")
-    output = save_to_memory(wb)
-
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name="Reference_Only_Verification.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
+    data = _request_payload()
+    if not isinstance(data, dict):
+        return _bad_payload()
+    # mode="reference" deletes the report sheet automatically
+    return _send_report(data, "reference", _requested_format(data), "Reference_Only_Verification")
 
 @app.route("/generate-combined", methods=["POST"])
 def generate_combined():
-    data = request.json 
-    # Use the engine with mode="combined" (keeps both sheets)
-    wb = generate_full_report(data, mode="combined")
-    output = save_to_memory(wb)
+    data = _request_payload()
+    if not isinstance(data, dict):
+        return _bad_payload()
+    # mode="combined" keeps both sheets
+    return _send_report(data, "combined", _requested_format(data), "Full_Combined_Report")
 
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name="Full_Combined_Report.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+@app.route("/generate-rollup", methods=["POST"])
+def generate_rollup():
+    """
+    Weekly/monthly summary of many daily reports in one sheet.
+    Body: {"days": [daily report data, ...], "title"?: "..."}; xlsx only.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return _bad_payload()
+    fmt = _requested_format(data)
+    error = _invalid_request(data, "rollup", fmt)
+    if error:
+        return error
+    return _send_report(data, "rollup", fmt, "Rollup_Summary")
+
+@app.route("/generate-batch", methods=["POST"])
+def generate_batch():
+    """
+    Many reports in one call (month-end runs). Body: {"items": [...]} or a bare
+    list, each item shaped like /generate-report's body: {"mode", "data", "format"?, "name"?}.
+    Items are generated in parallel on a process pool and streamed back as a zip;
+    manifest.json inside reports success or the error for every item. Each item
+    is admitted like a single render: the ones the server is too busy for are
+    listed there as failed, with a retry_after.
+    """
+    payload = request.get_json(silent=True)
+    items = payload.get("items") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty list of items"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Too many items (max {BATCH_MAX_ITEMS})"}), 413
+    items = [item if isinstance(item, dict) else {} for item in items]
+
+    return Response(
+        iter_batch_zip(items),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=Batch_Reports.zip"},
     )
 
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """
+    Async generation for big reports: same body as /generate-report
+    ({"mode", "data", "format"?}), as JSON or multipart. Returns 202 with a
+    job id right away; poll GET /jobs/<id> for progress, then download
+    GET /jobs/<id>/result.
+    """
+    # Uploaded photos must outlive this request
+    payload = _request_payload(detach=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get("data"), dict):
+        return jsonify({"error": "Expected a JSON object with a 'data' object"}), 400
+    mode = payload.get("mode", "report")
+    if mode not in VALID_MODES:
+        return jsonify({"error": f"Unknown mode: {mode!r}"}), 400
+    fmt = _requested_format(payload)
+    error = _invalid_request(payload["data"], mode, fmt)
+    if error:
+        return error
+
+    try:
+        job = jobs.submit(payload["data"], mode=mode, fmt=fmt)
+    except QueueFull:
+        return jsonify({"error": "Job queue is full, try again later"}), 503
+
+    body = job.to_dict()
+    body["status_url"] = f"/jobs/{job.id}"
+    body["result_url"] = f"/jobs/{job.id}/result"
+    return jsonify(body), 202, {"Location": body["status_url"]}
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    if job.status == "failed":
+        return jsonify(job.to_dict()), 500
+    if job.status != "done":
+        return jsonify(job.to_dict()), 409
+
+    try:
+        output = open(job.result_path, "rb")
+    except OSError:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    mimetype = "application/pdf" if job.format == "pdf" else XLSX_MIMETYPE
+    return _send_stream(output, job.download_name, mimetype)
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """
+    Readiness probe: 200 once the warm-up (template parsed, codecs, fonts) is
+    done, 503 until then. server.py warms up before forking; otherwise the
+    first probe starts it in the background.
+    """
+    start_warm_up()
+    status = warm_up_status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus scrape endpoint: stage/request histograms, in-flight requests, cache counters."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
+    # Development server. In production run server.py (pre-forked, warmed-up workers)
     # Note: Using your port 5001 as per your original code
+    start_warm_up()
     app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
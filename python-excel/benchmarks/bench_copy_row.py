@@ -0,0 +1,83 @@
+# benchmarks/bench_copy_row.py
+"""
+Cloning the reference entry block for a large reference sheet:
+the old copy_row (six copy()'d style objects per cell, ws.max_column per row)
+vs. stamping the compiled per-column style IDs.
+
+Run from python-excel/:
+    python -m benchmarks.bench_copy_row [entries]
+"""
+import sys
+import time
+import warnings
+from copy import copy
+from openpyxl.cell.cell import MergedCell
+
+from generators.common.config import ENTRY_BLOCK_START, ENTRY_BLOCK_END, ENTRY_HEIGHT
+from generators.excel.engine import TEMPLATE_PATH
+from generators.excel.template_cache import load_template
+from generators.excel.templates import copy_row, compile_row
+from generators.excel.sheets.reference import fill_reference_sheet
+
+
+def _legacy_copy_row(ws, src_row, tgt_row):
+    # copy_row as it was before style IDs were compiled
+    ws.row_dimensions[tgt_row].height = ws.row_dimensions[src_row].height
+    for col in range(1, ws.max_column + 1):
+        src_cell = ws.cell(row=src_row, column=col)
+        tgt_cell = ws.cell(row=tgt_row, column=col)
+        if not isinstance(tgt_cell, MergedCell):
+            tgt_cell.value = src_cell.value
+        if src_cell.has_style:
+            tgt_cell.font = copy(src_cell.font)
+            tgt_cell.border = copy(src_cell.border)
+            tgt_cell.fill = copy(src_cell.fill)
+            tgt_cell.alignment = copy(src_cell.alignment)
+            tgt_cell.number_format = copy(src_cell.number_format)
+            tgt_cell.protection = copy(src_cell.protection)
+
+
+def _clone_blocks(entries, clone):
+    ws = load_template(TEMPLATE_PATH).worksheets[1]
+    start = time.perf_counter()
+    clone(ws, entries)
+    return time.perf_counter() - start
+
+
+def _legacy_clone(ws, entries):
+    for i in range(1, entries):
+        row = ENTRY_BLOCK_START + i * ENTRY_HEIGHT
+        for r in range(ENTRY_BLOCK_START, ENTRY_BLOCK_END + 1):
+            _legacy_copy_row(ws, r, row + (r - ENTRY_BLOCK_START))
+
+
+def _compiled_clone(ws, entries):
+    compiled = {r: compile_row(ws, r) for r in range(ENTRY_BLOCK_START, ENTRY_BLOCK_END + 1)}
+    for i in range(1, entries):
+        row = ENTRY_BLOCK_START + i * ENTRY_HEIGHT
+        for r in range(ENTRY_BLOCK_START, ENTRY_BLOCK_END + 1):
+            copy_row(ws, r, row + (r - ENTRY_BLOCK_START), compiled[r])
+
+
+def main(entries=500):
+    warnings.simplefilter("ignore")  # openpyxl's "extension is not supported" noise
+
+    legacy = _clone_blocks(entries, _legacy_clone)
+    compiled = _clone_blocks(entries, _compiled_clone)
+    print(f"copy_row, {entries} entry blocks")
+    print(f"  legacy copy()   : {legacy:8.3f}s")
+    print(f"  compiled IDs    : {compiled:8.3f}s  ({legacy / compiled:.1f}x)")
+
+    # The whole sheet (merges, footers, page breaks) without images
+    ws = load_template(TEMPLATE_PATH).worksheets[1]
+    payload = [
+        {"section_title": f"Section {i // 12}", "images": [], "footers": [f"Photo {i}a", f"Photo {i}b"]}
+        for i in range(entries)
+    ]
+    start = time.perf_counter()
+    fill_reference_sheet(ws, payload)
+    print(f"fill_reference_sheet, {entries} entries: {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,187 @@
+# benchmarks/bench_fetch.py
+"""
+Remote (http://) photos against a local stand-in backend, with regression gates.
+
+Measures, with --latency seconds added to every response:
+  sequential_s      each photo downloaded in turn on a new connection (the naive way)
+  pooled_s          the same photos through ImageFetcher (keep-alive, per-host limit)
+  report_inline_s   generate_full_report with the photos inline as data URIs
+  report_remote_s   the same report with the photos as URLs, downloads overlapping the fill
+and checks the pool: connections opened, most requests in flight at once
+(must stay within IMAGE_FETCH_PER_HOST) and photos embedded in the remote report.
+
+Run from python-excel/:
+    python -m benchmarks.bench_fetch --output fetch.json
+    python -m benchmarks.bench_fetch --baseline fetch.json --threshold 0.25
+"""
+import argparse
+import base64
+import http.client
+import json
+import platform
+import sys
+import time
+import warnings
+from concurrent.futures import wait
+from urllib.parse import urlsplit
+
+from generators.common.config import IMAGE_FETCH_PER_HOST
+from generators.common import fetch
+from generators.common.fetch import ImageFetcher
+from generators.excel import images, sheet_parts
+from generators.excel.engine import generate_full_report
+from .image_server import HOST, ImageServer
+from .payloads import build_payload
+
+RESULTS_VERSION = 1
+GATED_METRICS = ("pooled_s", "report_remote_s")
+
+
+def _raw(data_uri):
+    return base64.b64decode(data_uri.split(",", 1)[1])
+
+
+def _remote_payload(data, server):
+    """data with every photo served by server and referenced by URL."""
+    names = {}
+    for entry in data["reference"]:
+        for src in entry["images"]:
+            if src not in names:
+                names[src] = f"{len(names)}.jpg"
+                server.images[names[src]] = _raw(src)
+    reference = [dict(entry, images=[server.url(names[src]) for src in entry["images"]]) for entry in data["reference"]]
+    return dict(data, reference=reference)
+
+
+def _sequential(urls):
+    for url in urls:
+        parts = urlsplit(url)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        conn.request("GET", parts.path)
+        conn.getresponse().read()
+        conn.close()
+
+
+def _timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(entries, latency, repeat):
+    data = build_payload(entries=entries, image_size=(1600, 1200), distinct_images=entries * 2)
+    with ImageServer({}, latency) as server:
+        remote = _remote_payload(data, server)
+        urls = sorted({src for entry in remote["reference"] for src in entry["images"]})
+
+        sequential_s = _timed(lambda: _sequential(urls), 1)
+
+        server.reset_counters()
+        fetcher = ImageFetcher(allowed_hosts=(HOST,))
+        pooled_s = _timed(lambda: wait([fetcher.submit(url) for url in urls]), repeat)
+        pool_connections, pool_peak = server.connections, server.peak_in_flight
+        fetcher.close()
+
+        report_inline_s = _timed(lambda: generate_full_report(data, mode="combined"), repeat)
+        server.reset_counters()
+        report_remote_s = _timed(lambda: generate_full_report(remote, mode="combined"), repeat)
+        report_peak = server.peak_in_flight
+        # The template's own pictures included, so compared with the inline report
+        embedded, expected = (
+            sum(len(ws._images) for ws in generate_full_report(payload, mode="combined").worksheets)
+            for payload in (remote, data)
+        )
+
+    return {
+        "photos": len(urls),
+        "latency_s": latency,
+        "sequential_s": round(sequential_s, 4),
+        "pooled_s": round(pooled_s, 4),
+        "pool_connections": pool_connections,
+        "pool_peak_in_flight": pool_peak,
+        "report_inline_s": round(report_inline_s, 4),
+        "report_remote_s": round(report_remote_s, 4),
+        "report_peak_in_flight": report_peak,
+        "images_embedded": embedded,
+        "images_expected": expected,
+    }
+
+
+def compare(result, baseline, threshold):
+    """Lines describing every regression beyond threshold (empty list: all good)."""
+    regressions = []
+    if result["pool_peak_in_flight"] > IMAGE_FETCH_PER_HOST or result["report_peak_in_flight"] > IMAGE_FETCH_PER_HOST:
+        regressions.append(f"more than IMAGE_FETCH_PER_HOST={IMAGE_FETCH_PER_HOST} requests in flight to one host")
+    if result["pool_connections"] > IMAGE_FETCH_PER_HOST:
+        regressions.append(f"{result['pool_connections']} connections opened, keep-alive not reused")
+    if result["images_embedded"] < result["images_expected"]:
+        regressions.append(f"only {result['images_embedded']} of {result['images_expected']} remote photos embedded")
+    for metric in GATED_METRICS:
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if change > threshold:
+            regressions.append(f"{metric} {old} -> {new} (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=40, help="reference entries (2 distinct photos each)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the stand-in waits before each response")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is kept)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative increase before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")  # openpyxl's "extension is not supported" noise
+    # Photos really decoded on every run, like in bench_pipeline
+    images._raster_cache = None
+    sheet_parts._part_cache = None
+    # The stand-in runs on loopback, which only an explicitly listed host may reach
+    fetch.fetcher.allowed_hosts = (HOST,)
+    result = run(args.entries, args.latency, max(1, args.repeat))
+    print(f"{result['photos']} photos, {result['latency_s'] * 1000:.0f}ms latency")
+    print(f"sequential      {result['sequential_s']:.3f}s")
+    print(f"pooled          {result['pooled_s']:.3f}s  {result['pool_connections']} connections  "
+          f"peak {result['pool_peak_in_flight']} in flight")
+    print(f"report inline   {result['report_inline_s']:.3f}s")
+    print(f"report remote   {result['report_remote_s']:.3f}s  "
+          f"{result['images_embedded']}/{result['images_expected']} photos embedded")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "version": RESULTS_VERSION,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "repeat": args.repeat,
+                **result,
+            }, f, indent=2)
+        print(f"results written to {args.output}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(result, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    if args.baseline:
+        print(f"\nno regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
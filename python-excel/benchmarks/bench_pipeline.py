@@ -0,0 +1,279 @@
+# benchmarks/bench_pipeline.py
+"""
+End-to-end benchmark of generate_full_report + saving, with regression gates.
+
+Starting from one default case, each axis is swept on its own:
+reference entries, image format, image size, team/material table rows
+(past the template's 6 rows the layout planner moves the rows below) and mode.
+Each case records per-stage timings (best of --repeat runs), peak traced
+memory, output size and how many photos made it into the workbook.
+
+Run from python-excel/:
+    python -m benchmarks.bench_pipeline --output results.json
+    python -m benchmarks.bench_pipeline --baseline results.json --threshold 0.25
+
+With --baseline the run exits with status 1 if any case got slower, used
+more memory or produced a bigger file than the baseline by more than the
+threshold (or failed, or embedded fewer photos, where the baseline did not).
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+import zipfile
+
+from generators.excel import images, sheet_parts
+from generators.excel.engine import TEMPLATE_PATH, generate_full_report
+from generators.excel.template_cache import load_template
+from generators.excel.writer import save_to_spooled_file
+from .payloads import IMAGE_FORMATS, build_payload
+
+RESULTS_VERSION = 1
+GATED_METRICS = ("total_s", "peak_mb", "output_bytes")
+
+DEFAULT_CASE = {
+    "mode": "combined",
+    "entries": 40,
+    "image_format": "jpeg",
+    "image_size": (1600, 1200),
+    "table_rows": 5,
+}
+
+SWEEPS = {
+    "entries": (10, 40, 160),
+    "image_format": IMAGE_FORMATS,
+    "image_size": ((640, 480), (1600, 1200), (4000, 3000)),
+    "table_rows": (5, 20, 80),
+    "mode": ("report", "reference", "combined"),
+}
+
+# Small enough for a CI smoke run
+QUICK_DEFAULT_CASE = dict(DEFAULT_CASE, entries=8, image_size=(640, 480))
+QUICK_SWEEPS = {
+    "entries": (4, 16),
+    "image_format": IMAGE_FORMATS,
+    "image_size": ((640, 480),),
+    "table_rows": (5, 12),
+    "mode": ("report", "reference", "combined"),
+}
+
+
+def case_name(case):
+    width, height = case["image_size"]
+    return (
+        f"{case['mode']}-e{case['entries']}-{case['image_format']}{width}x{height}"
+        f"-t{case['table_rows']}"
+    )
+
+
+def build_cases(sweeps, default=DEFAULT_CASE):
+    """The default case plus one variation per swept value, without duplicates."""
+    cases = {}
+    for axis, values in sweeps.items():
+        for value in values:
+            case = dict(default, **{axis: value})
+            cases.setdefault(case_name(case), case)
+    return list(cases.values())
+
+
+class StageTimer:
+    """
+    progress callback that turns the engine's progress events into stage timings:
+    template, report, images (the photo pre-pass before reference entry 0)
+    and reference (the entry loop).
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.stages = {}
+
+    def _close(self, stage, now):
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self.last)
+        self.last = now
+
+    def __call__(self, stage, done, total):
+        now = time.perf_counter()
+        if stage == "reference" and done == 0:
+            self._close("images", now)
+        else:
+            self._close(stage, now)
+
+    def lap(self, stage):
+        self._close(stage, time.perf_counter())
+
+
+def run_once(data, mode):
+    """One generation + save. Returns (stage timings, output size, embedded image count)."""
+    timer = StageTimer()
+    wb = generate_full_report(data, mode=mode, progress=timer, reuse_parts=True)
+    timer.lap("build")
+    with save_to_spooled_file(wb) as output:
+        size = output.seek(0, io.SEEK_END)
+        timer.lap("save")
+        # Counted in the saved drawings: a spliced sheet's images never reach the workbook
+        with zipfile.ZipFile(output) as xlsx:
+            embedded = sum(
+                xlsx.read(name).count(b"<pic>")
+                for name in xlsx.namelist() if name.startswith("xl/drawings/drawing")
+            )
+    stages = timer.stages
+    stages["total"] = timer.last - timer.start
+    return stages, size, embedded
+
+
+def peak_memory(data, mode):
+    """Peak Python-level allocation of one run, in MB (Pillow's pixel buffers are not traced)."""
+    tracemalloc.start()
+    try:
+        run_once(data, mode)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def run_case(case, repeat=3, memory=True):
+    data = build_payload(
+        entries=case["entries"],
+        image_format=case["image_format"],
+        image_size=case["image_size"],
+        table_rows=case["table_rows"],
+    )
+    result = {"name": case_name(case), "case": dict(case, image_size=list(case["image_size"]))}
+    try:
+        runs = [run_once(data, case["mode"]) for _ in range(repeat)]
+        stage_names = runs[0][0].keys()
+        # Best of N per stage: the least noisy estimate on a shared machine
+        result["stages"] = {s: round(min(r[0].get(s, 0.0) for r in runs), 4) for s in stage_names}
+        result["total_s"] = result["stages"]["total"]
+        result["output_bytes"] = runs[0][1]
+        # A photo that fails to decode is skipped silently, so keep count
+        result["images_embedded"] = runs[0][2]
+        if memory:
+            result["peak_mb"] = round(peak_memory(data, case["mode"]), 2)
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Lines describing every regression beyond threshold (empty list: all good)."""
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result["name"])
+        if before is None:
+            continue
+        if result["status"] != "ok":
+            if before["status"] == "ok":
+                regressions.append(f"{result['name']}: now fails ({result['error']})")
+            continue
+        if result.get("images_embedded", 0) < before.get("images_embedded", 0):
+            regressions.append(
+                f"{result['name']}: images_embedded {before['images_embedded']} -> {result['images_embedded']}"
+            )
+        for metric in GATED_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append(f"{result['name']}: {metric} {old} -> {new} (+{change:.0%})")
+    return regressions
+
+
+def print_result(result, baseline_by_name):
+    if result["status"] != "ok":
+        print(f"{result['name']:<40} ERROR {result['error']}")
+        return
+    stages = "  ".join(f"{k}={v:.3f}" for k, v in result["stages"].items() if k != "total")
+    line = f"{result['name']:<40} {result['total_s']:8.3f}s"
+    if "peak_mb" in result:
+        line += f" {result['peak_mb']:8.1f}MB"
+    line += f" {result['output_bytes'] / 1024:9.0f}KB {result['images_embedded']:5d} img"
+    before = baseline_by_name.get(result["name"])
+    if before and before.get("total_s"):
+        line += f"  ({(result['total_s'] - before['total_s']) / before['total_s']:+.0%} vs baseline)"
+    print(line)
+    print(f"{'':<40}   {stages}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="small sweep for CI")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--only", help="only run cases whose name contains this text")
+    parser.add_argument("--raster-cache", action="store_true",
+                        help="keep the on-disk raster cache (off by default so photos are really decoded)")
+    parser.add_argument("--sheet-part-cache", action="store_true",
+                        help="keep the sheet part cache (off by default: repeats would only splice cached sheets)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative increase before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")  # openpyxl's "extension is not supported" noise
+    if not args.raster_cache:
+        images._raster_cache = None
+    if not args.sheet_part_cache:
+        sheet_parts._part_cache = None
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    baseline_by_name = {r["name"]: r for r in baseline.get("results", [])}
+
+    if args.quick:
+        cases = build_cases(QUICK_SWEEPS, QUICK_DEFAULT_CASE)
+    else:
+        cases = build_cases(SWEEPS)
+    if args.only:
+        cases = [c for c in cases if args.only in case_name(c)]
+
+    # The first template load parses the xlsx; every request after that gets a clone
+    start = time.perf_counter()
+    load_template(TEMPLATE_PATH)
+    print(f"template parse (once per process): {time.perf_counter() - start:.3f}s")
+
+    results = []
+    for case in cases:
+        result = run_case(case, repeat=max(1, args.repeat), memory=not args.no_memory)
+        print_result(result, baseline_by_name)
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "version": RESULTS_VERSION,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "quick": args.quick,
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nno regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
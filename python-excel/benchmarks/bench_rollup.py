@@ -0,0 +1,152 @@
+# benchmarks/bench_rollup.py
+"""
+mode="rollup" at scale: a year of daily reports from dozens of projects
+summed into one summary sheet, with regression gates.
+
+Records the NumPy aggregation on its own (aggregate_days), the whole
+generation + save, peak traced memory, output size and the number of
+summary rows. A spot check compares a few items against a plain Python sum.
+
+Run from python-excel/:
+    python -m benchmarks.bench_rollup --output rollup.json
+    python -m benchmarks.bench_rollup --baseline rollup.json --threshold 0.25
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from generators.common.helpers import to_num
+from generators.common.rollup import aggregate_days
+from generators.excel.engine import generate_full_report
+from generators.excel.writer import save_to_spooled_file
+from .payloads import build_rollup_days
+
+RESULTS_VERSION = 1
+GATED_METRICS = ("aggregate_s", "total_s", "peak_mb")
+
+
+def _best(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _generate_and_save(days):
+    wb = generate_full_report({"days": days}, mode="rollup")
+    with save_to_spooled_file(wb) as output:
+        return output.seek(0, io.SEEK_END)
+
+
+def _spot_check(days, rollup):
+    """Items whose period total differs from summing the payloads one by one."""
+    wrong = []
+    for index in (0, len(rollup.items) // 2, len(rollup.items) - 1):
+        item = rollup.items[index]
+        if item.is_total:
+            continue
+        expected = sum(
+            to_num(row.get("today"))
+            for day in days if day["projectName"] == item.project
+            for row in day[item.table] if row["description"] == item.description
+        )
+        if abs(expected - rollup.period_total[index]) > 1e-6:
+            wrong.append(f"{item.project} / {item.description}: {rollup.period_total[index]} != {expected}")
+    return wrong
+
+
+def run(projects, days_per_project, repeat):
+    days = build_rollup_days(projects, days_per_project)
+    rows = sum(len(day[t]) for day in days for t in ("managementTeam", "workingTeam", "materials", "machinery"))
+    rollup = aggregate_days(days)
+    aggregate_s = _best(lambda: aggregate_days(days), repeat)
+    total_s = _best(lambda: _generate_and_save(days), repeat)
+
+    tracemalloc.start()
+    try:
+        output_bytes = _generate_and_save(days)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "payloads": len(days),
+        "table_rows": rows,
+        "summary_rows": len(rollup.items),
+        "granularity": rollup.granularity,
+        "periods": len(rollup.periods),
+        "aggregate_s": round(aggregate_s, 4),
+        "total_s": round(total_s, 4),
+        "peak_mb": round(peak / (1024 * 1024), 2),
+        "output_bytes": output_bytes,
+        "mismatches": _spot_check(days, rollup),
+    }
+
+
+def compare(result, baseline, threshold):
+    """Lines describing every regression beyond threshold (empty list: all good)."""
+    regressions = [f"wrong total: {line}" for line in result["mismatches"]]
+    for metric in GATED_METRICS:
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if change > threshold:
+            regressions.append(f"{metric} {old} -> {new} (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--projects", type=int, default=36)
+    parser.add_argument("--days", type=int, default=365, help="daily reports per project")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is kept)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative increase before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    result = run(args.projects, args.days, max(1, args.repeat))
+    print(f"{result['payloads']} daily payloads, {result['table_rows']} table rows -> "
+          f"{result['summary_rows']} summary rows x {result['periods']} {result['granularity']} columns")
+    print(f"aggregate       {result['aggregate_s']:.3f}s")
+    print(f"generate+save   {result['total_s']:.3f}s  {result['output_bytes']} bytes  "
+          f"peak {result['peak_mb']:.1f}MB traced")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "version": RESULTS_VERSION,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "repeat": args.repeat,
+                **result,
+            }, f, indent=2)
+        print(f"results written to {args.output}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(result, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    if args.baseline:
+        print(f"\nno regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# benchmarks/bench_startup.py
+"""
+Cold start of the service: `import app` and the warm-up, each in a fresh
+interpreter, with regression gates.
+
+Every run starts `python -X importtime -c "import app"` and records the
+wall time, the import time Python itself reports and the slowest
+imports app.py makes. A second process imports the app and runs warm_up(),
+which is what stands between a new instance and a 200 from GET /ready.
+Optional codecs (cairosvg, imageio) are expected to stay unloaded until a
+photo needs them; one that shows up at import time is a regression.
+
+Run from python-excel/:
+    python -m benchmarks.bench_startup --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json --threshold 0.25
+"""
+import argparse
+import json
+import platform
+import re
+import subprocess
+import sys
+import time
+
+RESULTS_VERSION = 1
+GATED_METRICS = ("import_wall_s", "import_self_s", "ready_s")
+
+# Must not be imported by `import app` (see generators/common/optional_codecs.py)
+DEFERRED_MODULES = ("cairosvg", "cairocffi", "imageio")
+
+# "import time: self [us] | cumulative | imported package" lines from -X importtime
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+_WARM_UP = (
+    "import json, sys, time\n"
+    "started = time.perf_counter()\n"
+    "import app\n"
+    "from generators.warmup import warm_up\n"
+    "steps = warm_up()\n"
+    "print(json.dumps({'ready_s': time.perf_counter() - started, 'steps': steps,\n"
+    "                  'deferred_loaded': [m for m in %r if m in sys.modules]}))\n"
+) % (DEFERRED_MODULES,)
+
+
+def _python(*args):
+    """Runs a fresh interpreter; returns (wall seconds, stdout, stderr)."""
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, *args], capture_output=True, text=True, check=True)
+    return time.perf_counter() - started, proc.stdout, proc.stderr
+
+
+def parse_importtime(stderr):
+    """{module: (self us, cumulative us, depth)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if m:
+            modules[m.group(4)] = (int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2)
+    return modules
+
+
+def measure_import():
+    wall, _, stderr = _python("-X", "importtime", "-c", "import app")
+    modules = parse_importtime(stderr)
+    # What app.py imports directly, by cumulative time
+    direct = sorted(
+        ((name, cum) for name, (_, cum, depth) in modules.items() if depth == 1),
+        key=lambda item: -item[1],
+    )
+    return {
+        "wall_s": wall,
+        "self_s": modules["app"][1] / 1e6 if "app" in modules else None,
+        "modules": len(modules),
+        "slowest": [[name, round(cum / 1e6, 4)] for name, cum in direct[:10]],
+        "deferred_loaded": sorted({name.split(".")[0] for name in modules} & set(DEFERRED_MODULES)),
+    }
+
+
+def measure_ready():
+    _, stdout, _ = _python("-c", _WARM_UP)
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def run(repeat):
+    imports = [measure_import() for _ in range(repeat)]
+    readies = [measure_ready() for _ in range(repeat)]
+    best_import = min(imports, key=lambda r: r["wall_s"])
+    best_ready = min(readies, key=lambda r: r["ready_s"])
+    return {
+        # Best of N: the least noisy estimate on a shared machine
+        "import_wall_s": round(best_import["wall_s"], 4),
+        "import_self_s": round(min(r["self_s"] or 0.0 for r in imports), 4),
+        "ready_s": round(best_ready["ready_s"], 4),
+        "warm_up_steps": {k: round(v, 4) for k, v in best_ready["steps"].items()},
+        "modules": best_import["modules"],
+        "slowest_imports": best_import["slowest"],
+        "deferred_loaded": sorted(set(best_import["deferred_loaded"]) | set(best_ready["deferred_loaded"])),
+    }
+
+
+def compare(result, baseline, threshold):
+    """Lines describing every regression beyond threshold (empty list: all good)."""
+    regressions = []
+    if result["deferred_loaded"]:
+        regressions.append(f"optional codecs imported at startup: {', '.join(result['deferred_loaded'])}")
+    for metric in GATED_METRICS:
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if change > threshold:
+            regressions.append(f"{metric} {old} -> {new} (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per measurement (best is kept)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative increase before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    result = run(max(1, args.repeat))
+    print(f"import app      {result['import_wall_s']:.3f}s wall  "
+          f"{result['import_self_s']:.3f}s importing  {result['modules']} modules")
+    print(f"ready (+warm)   {result['ready_s']:.3f}s  "
+          + "  ".join(f"{k}={v:.3f}" for k, v in result["warm_up_steps"].items()))
+    print("slowest imports " + "  ".join(f"{name}={seconds:.3f}" for name, seconds in result["slowest_imports"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "version": RESULTS_VERSION,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "repeat": args.repeat,
+                **result,
+            }, f, indent=2)
+        print(f"results written to {args.output}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(result, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    if args.baseline:
+        print(f"\nno regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
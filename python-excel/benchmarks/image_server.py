@@ -0,0 +1,137 @@
+# benchmarks/image_server.py
+"""
+Local stand-in for the Node backend's /uploads/images/<file> route, for
+exercising generators/common/fetch.py without the network.
+
+    GET /uploads/images/<name>   the photo registered under name (404 if none)
+    GET /redirect/<n>/<name>     n redirect hops, then the photo
+    GET /status/<code>           an empty response with that status
+
+HTTP/1.1 with keep-alive. Every response waits `latency` seconds first, like
+a remote backend would. The server counts the connections it accepted and the
+most requests it had in flight at once, so callers can check pooling and the
+per-host limit.
+
+Standalone, serving synthetic JPEGs 0.jpg..15.jpg:
+    python -m benchmarks.image_server --port 5002 --latency 0.05
+The generator only fetches from loopback when it is listed by name, so run
+the app with IMAGE_FETCH_ALLOWED_HOSTS=127.0.0.1 to point payloads at it.
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HOST = "127.0.0.1"
+_TYPES = {"jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp", "svg": "image/svg+xml"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.count_connection()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.enter()
+        try:
+            time.sleep(server.latency)
+            parts = self.path.split("?", 1)[0].strip("/").split("/")
+            if parts[:2] == ["uploads", "images"] and len(parts) == 3 and parts[2] in server.images:
+                name = parts[2]
+                kind = _TYPES.get(name.rsplit(".", 1)[-1].lower(), "application/octet-stream")
+                self._send(200, server.images[name], [("Content-Type", kind)])
+            elif parts[0] == "redirect" and len(parts) == 3 and parts[1].isdigit():
+                hops = int(parts[1])
+                target = f"/redirect/{hops - 1}/{parts[2]}" if hops > 1 else f"/uploads/images/{parts[2]}"
+                self._send(302, headers=[("Location", target)])
+            elif parts[0] == "status" and len(parts) == 2 and parts[1].isdigit():
+                self._send(int(parts[1]))
+            else:
+                self._send(404)
+        finally:
+            server.leave()
+
+
+class ImageServer(ThreadingHTTPServer):
+    """Serves images ({name: bytes}) on HOST (loopback) from a background thread."""
+
+    daemon_threads = True
+
+    def __init__(self, images, latency=0.0, port=0):
+        super().__init__((HOST, port), _Handler)
+        self.images = dict(images)
+        self.latency = latency
+        self.connections = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{HOST}:{self.server_address[1]}"
+
+    def url(self, name):
+        return f"{self.base_url}/uploads/images/{name}"
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def reset_counters(self):
+        with self._lock:
+            self.connections = self.in_flight = self.peak_in_flight = 0
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    import base64
+    from .payloads import make_image
+
+    parser = argparse.ArgumentParser(description="Stand-in for the backend's image uploads route.")
+    parser.add_argument("--port", type=int, default=5002)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before every response")
+    args = parser.parse_args(argv)
+
+    images = {f"{i}.jpg": base64.b64decode(make_image("jpeg", 1600, 1200, i).split(",", 1)[1]) for i in range(16)}
+    server = ImageServer(images, args.latency, args.port)
+    print(f"serving {len(images)} photos at {server.url('<0-15>.jpg')}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
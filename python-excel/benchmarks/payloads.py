@@ -0,0 +1,139 @@
+# benchmarks/payloads.py
+"""
+Synthetic /generate-* payloads for the benchmarks.
+Everything is seeded, so the same arguments always build the same payload.
+"""
+import base64
+import random
+from datetime import date, timedelta
+from io import BytesIO
+from PIL import Image
+
+IMAGE_FORMATS = ("jpeg", "png", "webp", "svg")
+
+_MIME = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+
+
+def _photo(width, height, rng):
+    """
+    Something that compresses like a photo: a colour gradient plus
+    low-frequency blotches (solid colours would make JPEG/PNG look free).
+    """
+    small = (max(1, width // 32), max(1, height // 32))
+    blotches = Image.frombytes("RGB", small, rng.randbytes(small[0] * small[1] * 3))
+    blotches = blotches.resize((width, height), Image.BICUBIC)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    base = Image.merge("RGB", (gradient, gradient.rotate(90), Image.new("L", (width, height), rng.randrange(256))))
+    return Image.blend(base, blotches, 0.5)
+
+
+def _svg(width, height, rng):
+    shapes = []
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randrange(5, max(6, min(width, height) // 6))
+        color = "#%06x" % rng.randrange(0x1000000)
+        shapes.append(f'<circle cx="{x}" cy="{y}" r="{r}" fill="{color}" fill-opacity="0.7"/>')
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">'
+        f'<rect width="{width}" height="{height}" fill="#dde4ee"/>{"".join(shapes)}</svg>'
+    ).encode()
+
+
+def make_image(fmt, width, height, seed=0):
+    """One synthetic photo as a data URI, like the frontend sends."""
+    rng = random.Random(f"{fmt}-{width}x{height}-{seed}")
+    if fmt == "svg":
+        raw = _svg(width, height, rng)
+    else:
+        buf = BytesIO()
+        im = _photo(width, height, rng)
+        if fmt == "png":
+            im.save(buf, "PNG")
+        elif fmt == "webp":
+            im.save(buf, "WEBP", quality=85)
+        else:
+            im.save(buf, "JPEG", quality=90)
+        raw = buf.getvalue()
+    return f"data:{_MIME[fmt]};base64," + base64.b64encode(raw).decode()
+
+
+def build_payload(entries=40, image_format="jpeg", image_size=(1600, 1200),
+                  table_rows=5, images_per_entry=2, distinct_images=16, entries_per_section=6):
+    """
+    A full report payload.
+    table_rows sizes the team and material tables (past the template's rows
+    they push the rest of the sheet down); distinct_images bounds how many different
+    photos are generated, entries cycle through them.
+    """
+    width, height = image_size
+    pool = [
+        make_image(image_format, width, height, seed)
+        for seed in range(max(1, min(distinct_images, entries * images_per_entry)))
+    ]
+
+    reference = []
+    for i in range(entries):
+        reference.append({
+            "section_title": f"Section {i // entries_per_section + 1}",
+            "images": [pool[(i * images_per_entry + k) % len(pool)] for k in range(images_per_entry)],
+            "footers": [f"Photo {i + 1}.{k + 1}" for k in range(images_per_entry)],
+        })
+
+    def team(prefix):
+        return [{"description": f"{prefix} {i + 1}", "prev": i * 3, "today": i % 4} for i in range(table_rows)]
+
+    def resources(prefix, unit):
+        return [
+            {"description": f"{prefix} {i + 1}", "unit": unit, "prev": i * 10, "today": i % 7}
+            for i in range(table_rows)
+        ]
+
+    return {
+        "projectName": "Benchmark Tower",
+        "reportDate": "2026-01-15T00:00:00Z",
+        "weatherAM": "Sunny",
+        "weatherPM": "Cloudy",
+        "tempAM": 29,
+        "tempPM": 31,
+        "activityToday": "\n".join(f"Activity line {i + 1}: concrete pouring on level {i}" for i in range(8)),
+        "workPlanNextDay": "\n".join(f"Plan line {i + 1}: formwork for level {i + 1}" for i in range(6)),
+        "managementTeam": team("Manager"),
+        "workingTeam": team("Worker"),
+        "materials": resources("Material", "m3"),
+        "machinery": resources("Machine", "h"),
+        "reference": reference,
+    }
+
+
+def build_rollup_days(projects=36, days=365, table_rows=8, start=date(2026, 1, 1)):
+    """
+    Daily payloads for mode="rollup": every project reports every day, with
+    the same item descriptions day after day and varying "today" figures
+    (numbers, numeric strings and blanks, as the frontend sends them).
+    """
+    rng = random.Random(f"rollup-{projects}-{days}-{table_rows}")
+    choices = (0, 1, 2, 3, 5, 8, 2.5, "4", "", None)
+    payloads = []
+    for p in range(projects):
+        for d in range(days):
+            def rows(prefix, unit=None):
+                return [
+                    {"description": f"{prefix} {i + 1}", "unit": unit, "prev": (d * 3 + i) * 2,
+                     "today": rng.choice(choices)}
+                    for i in range(table_rows)
+                ]
+            payloads.append({
+                "projectName": f"Project {p + 1}",
+                "reportDate": f"{start + timedelta(days=d)}T00:00:00Z",
+                "managementTeam": rows("Manager"),
+                "workingTeam": rows("Worker"),
+                "materials": rows("Material", "m3"),
+                "machinery": rows("Machine", "h"),
+            })
+    return payloads
@@ -0,0 +1,338 @@
+# generators/admission.py
+"""
+Admission control for report generation.
+
+Every render is charged an estimated memory cost taken from its payload
+(table rows, reference entries, photo bytes) before it starts. Renders run
+while the estimates fit ADMISSION_MEMORY_MB and at most ADMISSION_MAX_CONCURRENT
+run at once; the others wait in a bounded FIFO queue. A request that can't
+get in (queue full, or not admitted within ADMISSION_MAX_WAIT) gets
+Overloaded, which the routes turn into 503 + Retry-After.
+
+The budget and the queue live in shared memory allocated when this module
+is imported. server.py imports it before forking, so all its workers admit
+against one budget for the whole server, not one each. A worker can die at
+any point (OOM-kill), so nothing waits on it: queued renders poll instead of
+being notified, and the server's parent takes the lock over from a worker
+that died holding it (release_process).
+"""
+import logging
+import math
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+from .common.config import (
+    ADMISSION_MEMORY_BYTES,
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_MAX_WAIT,
+    IMAGE_WORKERS
+)
+from .common.metrics import Counter, Histogram, register_collector, simple_metric
+from .excel.images import target_pixel_size
+
+logger = logging.getLogger(__name__)
+
+# Cost model (bytes). Rough, but in proportion to what a render holds:
+# the workbook clone + writer + output spool, openpyxl cells per table row
+# and per reference entry, every photo's raw bytes plus its embedded copy
+# (both kept in image_cache until the workbook is saved) and the pixel
+# buffers of the photos being decoded at the same time.
+BASE_COST = 16 * 1024 * 1024
+TABLE_ROW_COST = 16 * 1024
+ENTRY_COST = 32 * 1024
+EMBEDDED_IMAGE_COST = 128 * 1024
+# Used when a photo's size can't be told without reading it
+UNKNOWN_IMAGE_BYTES = 1024 * 1024
+# Rollups: the flattened values of one daily table row (lists, then arrays)
+ROLLUP_ROW_COST = 256
+
+# How often a queued render looks again whether it can start
+_POLL_SECONDS = 0.05
+# The lock is only ever held for a few array scans; release_process waits
+# this long before it looks whether the process it reaped is the holder
+_LOCK_TIMEOUT = 0.5
+
+_REFERENCE_MODES = ("reference", "combined")
+
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds",
+    "Time renders waited in the admission queue before starting.",
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections",
+    "Renders turned away with 503 by admission control.",
+    ("reason",),
+)
+
+
+class Overloaded(Exception):
+    """No room for this render: reason is "queue_full" or "timeout"."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"server busy ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _image_bytes(src):
+    """Size of one photo source without decoding it."""
+    if isinstance(src, str):
+        if src.startswith("data:"):
+            return (len(src) - src.find(",") - 1) * 3 // 4
+        try:
+            return os.path.getsize(src)
+        except (OSError, ValueError):
+            return UNKNOWN_IMAGE_BYTES
+    stream = getattr(src, "stream", None)
+    if stream is not None:
+        try:
+            pos = stream.tell()
+            size = stream.seek(0, os.SEEK_END)
+            stream.seek(pos)
+            return size
+        except (OSError, AttributeError):
+            pass
+    return UNKNOWN_IMAGE_BYTES
+
+
+def estimate_cost(data, mode):
+    """Estimated peak memory (bytes) of rendering data in mode."""
+    if not isinstance(data, dict):
+        return BASE_COST
+    cost = BASE_COST
+
+    if mode == "rollup":
+        days = data.get("days")
+        if isinstance(days, list):
+            cost += ROLLUP_ROW_COST * sum(
+                len(day.get(key) or [])
+                for day in days if isinstance(day, dict)
+                for key in ("managementTeam", "workingTeam", "materials", "machinery")
+            )
+        return cost
+
+    table_rows = sum(
+        len(data.get(key) or [])
+        for key in ("managementTeam", "workingTeam", "materials", "machinery")
+    )
+    cost += table_rows * TABLE_ROW_COST
+
+    if mode in _REFERENCE_MODES:
+        entries = [e for e in (data.get("reference") or []) if isinstance(e, dict)]
+        sizes = [_image_bytes(src) for e in entries for src in (e.get("images") or []) if src]
+        cost += len(entries) * ENTRY_COST
+        cost += sum(sizes) + len(sizes) * EMBEDDED_IMAGE_COST
+        if sizes:
+            # Photos decoded side by side in the pre-pass: JPEGs at draft scale
+            # (under 4x the box), other formats at full size (~3x their bytes)
+            width, height = target_pixel_size()
+            per_decode = max(width * height * 4 * 4, max(sizes) * 3)
+            cost += min(len(sizes), IMAGE_WORKERS) * per_decode
+    return cost
+
+
+class AdmissionController:
+    """
+    Memory/concurrency budget shared by every render of every process forked
+    after it was created, with a FIFO wait queue.
+
+    State: one slot per render that may run (pid, cost) and one per place in
+    the queue (pid, ticket), all in shared memory under one process-shared
+    lock, which records the pid holding it. The lowest ticket waiting is
+    first in line. Slots carry the pid so the slots of a worker that died
+    can be freed (release_process).
+    """
+
+    def __init__(self, capacity=ADMISSION_MEMORY_BYTES, max_concurrent=ADMISSION_MAX_CONCURRENT,
+                 max_queue=ADMISSION_QUEUE_SIZE, max_wait=ADMISSION_MAX_WAIT):
+        self.capacity = capacity
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self._lock = multiprocessing.Lock()
+        self._holder = multiprocessing.RawValue("q", 0)
+        self._run_pid = multiprocessing.RawArray("q", self.max_concurrent)
+        self._run_cost = multiprocessing.RawArray("q", self.max_concurrent)
+        self._queue_pid = multiprocessing.RawArray("q", max(1, self.max_queue))
+        self._queue_ticket = multiprocessing.RawArray("q", max(1, self.max_queue))
+        self._next_ticket = multiprocessing.RawValue("q", 1)
+        # Moving average of how long a render holds its slot, for Retry-After
+        self._avg_seconds = multiprocessing.RawValue("d", 1.0)
+
+    @contextmanager
+    def _locked(self):
+        self._lock.acquire()
+        self._holder.value = os.getpid()
+        try:
+            yield
+        finally:
+            self._unlock()
+
+    def _unlock(self):
+        self._holder.value = 0
+        self._lock.release()
+
+    # All of these run with self._lock held
+
+    def _pause(self, timeout):
+        """Lets go of the lock for up to _POLL_SECONDS (or timeout, if sooner)."""
+        self._unlock()
+        try:
+            time.sleep(_POLL_SECONDS if timeout is None else max(0.0, min(timeout, _POLL_SECONDS)))
+        finally:
+            self._lock.acquire()
+            self._holder.value = os.getpid()
+
+    def _running(self):
+        return sum(1 for pid in self._run_pid if pid)
+
+    def _queued(self):
+        return sum(1 for ticket in self._queue_ticket[:self.max_queue] if ticket)
+
+    def _in_use(self):
+        return sum(self._run_cost)
+
+    def _run_slot(self, cost):
+        """A free running slot if a render of cost fits now, else None."""
+        free = None
+        for slot, pid in enumerate(self._run_pid):
+            if not pid:
+                free = slot
+                break
+        if free is None:
+            return None
+        # A render bigger than the whole budget still runs, on its own
+        running = self._running()
+        if running == 0 or not self.capacity or self._in_use() + cost <= self.capacity:
+            return free
+        return None
+
+    def _take_ticket(self):
+        """(queue slot, ticket), or None when the queue is full."""
+        for slot in range(self.max_queue):
+            if not self._queue_ticket[slot]:
+                ticket = self._next_ticket.value
+                self._next_ticket.value = ticket + 1
+                self._queue_ticket[slot] = ticket
+                self._queue_pid[slot] = os.getpid()
+                return slot, ticket
+        return None
+
+    def _first_in_line(self, ticket):
+        return ticket == min(t for t in self._queue_ticket[:self.max_queue] if t)
+
+    def retry_after(self):
+        """Seconds a turned-away client should wait: the queue ahead of it, drained max_concurrent at a time."""
+        waves = (self._queued() + self._running()) / self.max_concurrent
+        return min(120, max(1, math.ceil(waves * self._avg_seconds.value)))
+
+    def _reject(self, reason):
+        ADMISSION_REJECTIONS.inc(reason=reason)
+        return Overloaded(reason, self.retry_after())
+
+    def _wait_for_slot(self, cost, started, timeout):
+        """Queues up and returns a running slot once first in line and cost fits. Raises Overloaded."""
+        place = self._take_ticket()
+        if place is None and timeout is not None:
+            raise self._reject("queue_full")
+        try:
+            while True:
+                if place is None:
+                    # Async jobs (timeout=None) wait for room in a full queue instead of failing
+                    place = self._take_ticket()
+                if place is not None and self._first_in_line(place[1]):
+                    slot = self._run_slot(cost)
+                    if slot is not None:
+                        return slot
+                remaining = None if timeout is None else started + timeout - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise self._reject("timeout")
+                self._pause(remaining)
+        finally:
+            if place is not None:
+                self._queue_ticket[place[0]] = 0
+                self._queue_pid[place[0]] = 0
+
+    @contextmanager
+    def admit(self, cost, timeout=-1):
+        """
+        Holds cost bytes of the budget for the duration of the with block.
+        timeout: seconds to wait in the queue (-1: ADMISSION_MAX_WAIT).
+        timeout=None waits as long as it takes and skips the queue limit;
+        async jobs use that, their own pool already bounds them.
+        """
+        if timeout == -1:
+            timeout = self.max_wait
+        cost = min(cost, self.capacity) if self.capacity else cost
+        started = time.monotonic()
+        with self._locked():
+            slot = None if self._queued() else self._run_slot(cost)
+            if slot is None:
+                slot = self._wait_for_slot(cost, started, timeout)
+            self._run_pid[slot] = os.getpid()
+            self._run_cost[slot] = cost
+        admitted = time.monotonic()
+        ADMISSION_WAIT_SECONDS.observe(admitted - started)
+        try:
+            yield
+        finally:
+            with self._locked():
+                self._run_pid[slot] = 0
+                self._run_cost[slot] = 0
+                avg = self._avg_seconds.value
+                self._avg_seconds.value = avg + 0.2 * ((time.monotonic() - admitted) - avg)
+
+    def release_process(self, pid):
+        """
+        Frees the running and queue slots of process pid, e.g. a worker that was
+        killed mid-render. For the parent that reaped pid, so it never blocks:
+        if pid died holding the lock it takes the lock over, and if another
+        process holds it returns False (call again later). True once done.
+        """
+        if not self._lock.acquire(timeout=_LOCK_TIMEOUT):
+            if self._holder.value != pid:
+                return False
+            logger.warning("exited process %d held the admission lock, taking it over", pid)
+        self._holder.value = os.getpid()
+        try:
+            freed = 0
+            for slot in range(self.max_concurrent):
+                if self._run_pid[slot] == pid:
+                    self._run_pid[slot] = 0
+                    self._run_cost[slot] = 0
+                    freed += 1
+            for slot in range(self.max_queue):
+                if self._queue_pid[slot] == pid:
+                    self._queue_pid[slot] = 0
+                    self._queue_ticket[slot] = 0
+                    freed += 1
+            if freed:
+                logger.warning("freed %d admission slots of exited process %d", freed, pid)
+        finally:
+            self._unlock()
+        return True
+
+    def snapshot(self):
+        with self._locked():
+            return {"in_use_bytes": self._in_use(), "running": self._running(), "queued": self._queued()}
+
+
+admission = AdmissionController()
+
+
+def _admission_metrics():
+    state = admission.snapshot()
+    return (
+        simple_metric("admission_running", "gauge", "Renders admitted and running.",
+                      [({}, state["running"])])
+        + simple_metric("admission_queued", "gauge", "Renders waiting in the admission queue.",
+                        [({}, state["queued"])])
+        + simple_metric("admission_memory_bytes", "gauge", "Estimated memory of the running renders.",
+                        [({}, state["in_use_bytes"])])
+    )
+
+
+# Same numbers in every process: reported once, not added up across workers
+register_collector(_admission_metrics, shared=True)
@@ -0,0 +1,247 @@
+# generators/batch.py
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import traceback
+import zipfile
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from .admission import Overloaded, admission, estimate_cost
+from .common.config import BATCH_WORKERS
+from .excel.engine import generate_full_report
+from .excel.writer import save_workbook
+from .pdf.engine import generate_pdf_report
+
+VALID_MODES = ("report", "reference", "combined", "rollup")
+# Modes with no PDF rendering
+XLSX_ONLY_MODES = ("rollup",)
+_COPY_CHUNK = 256 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """
+    One process pool per server process, created on first use.
+    openpyxl is pure Python, so only separate processes use more than one core.
+    "spawn" because forking a threaded web server can deadlock the children.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=BATCH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    """
+    Drops a broken pool (a worker died: OOM-kill, crash) so the next
+    _get_pool() starts a fresh one instead of failing every later batch.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(index, item, out_dir):
+    """(pool, future) rendering one item; one retry on a new pool if the current one is already broken."""
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            return pool, pool.submit(render_batch_item, index, item, out_dir)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            if attempt:
+                raise
+
+
+def _failed_item(index, error):
+    return {"index": index, "status": "error", "error": f"{type(error).__name__}: {error}"}
+
+
+class _BatchAdmission:
+    """
+    Admission control (see admission.py) for the items of one batch. They
+    queue one at a time, in order. While another item of the batch renders,
+    the batch is making progress and the next one waits as long as it takes,
+    like an async job; otherwise it gets the usual timeout. Once one item has
+    been turned away the rest fail the same way at once, instead of each
+    waiting out the timeout in turn.
+    """
+
+    def __init__(self):
+        self._turn = threading.Lock()
+        self._lock = threading.Lock()
+        self._running = 0
+        self.turned_away = None
+        self.stopped = threading.Event()
+
+    @contextmanager
+    def admit(self, cost):
+        with ExitStack() as admitted:
+            with self._turn:
+                if self.turned_away is not None:
+                    raise Overloaded(self.turned_away.reason, self.turned_away.retry_after)
+                try:
+                    admitted.enter_context(admission.admit(cost, timeout=None if self._running else -1))
+                except Overloaded as e:
+                    self.turned_away = e
+                    raise
+                with self._lock:
+                    self._running += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+
+def _render_admitted(index, item, out_dir, batch):
+    """Runs on one of the batch's threads: admits the item, then has a pool worker render it."""
+    try:
+        with batch.admit(estimate_cost(item.get("data"), item.get("mode", "report"))):
+            if batch.stopped.is_set():
+                return _failed_item(index, RuntimeError("batch abandoned"))
+            pool, future = _submit(index, item, out_dir)
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                _discard_pool(pool)
+                raise
+    except Overloaded as e:
+        return dict(_failed_item(index, e), retry_after=e.retry_after)
+    except Exception as e:
+        return _failed_item(index, e)
+
+
+def shutdown_pool():
+    """Stops the process pool (if one was started); used when a server worker exits."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _safe_name(text):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(text)).strip("_")[:80]
+
+
+def item_filename(index, item, ext):
+    """001_<name or project>_<mode>.xlsx - unique inside the archive thanks to the index."""
+    data = item.get("data") or {}
+    label = item.get("name") or data.get("projectName") or data.get("title") or "report"
+    return f"{index + 1:03d}_{_safe_name(label) or 'report'}_{item.get('mode', 'report')}.{ext}"
+
+
+def render_batch_item(index, item, out_dir):
+    """
+    Runs in a pool worker: renders one payload to a file in out_dir.
+    Never raises - failures are reported back so one bad item can't sink the batch.
+    """
+    try:
+        mode = item.get("mode", "report")
+        if mode not in VALID_MODES:
+            raise ValueError(f"Unknown mode: {mode!r}")
+        data = item.get("data")
+        if not isinstance(data, dict):
+            raise ValueError("Item is missing a 'data' object")
+
+        fmt = (item.get("format") or "xlsx").lower()
+        filename = item_filename(index, item, "pdf" if fmt == "pdf" else "xlsx")
+        path = os.path.join(out_dir, filename)
+
+        if fmt == "pdf":
+            with generate_pdf_report(data, mode=mode) as src, open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst, _COPY_CHUNK)
+        else:
+            wb = generate_full_report(data, mode=mode, reuse_parts=True)
+            save_workbook(wb, path)
+
+        return {"index": index, "file": filename, "path": path, "status": "ok"}
+    except Exception as e:
+        return {
+            "index": index,
+            "status": "error",
+            "error": f"{type(e).__name__}: {e}",
+            "detail": traceback.format_exc(limit=5),
+        }
+
+
+class _ZipSink:
+    """Write-only target for ZipFile; the response generator drains it chunk by chunk."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_batch_zip(items):
+    """
+    Generates every item on the worker pool and yields a zip archive as the
+    results come in (finished workbooks are streamed while others still run).
+    Each item goes through admission control, BATCH_WORKERS at a time.
+    The archive ends with manifest.json: one status/error line per item,
+    with retry_after for the items the server was too busy for. If a pool
+    worker dies, the items it had are listed as failed there; the archive
+    itself is always complete.
+    """
+    out_dir = tempfile.mkdtemp(prefix="batch-")
+    batch = _BatchAdmission()
+    threads = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+    futures = [threads.submit(_render_admitted, i, item, out_dir, batch) for i, item in enumerate(items)]
+    manifest = []
+    sink = _ZipSink()
+
+    try:
+        # Outputs are already compressed (xlsx/pdf), so store them as-is
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+            for future in as_completed(futures):
+                result = future.result()
+                path = result.pop("path", None)
+                manifest.append(result)
+                if path is None:
+                    continue
+
+                with open(path, "rb") as src, zf.open(result["file"], "w", force_zip64=True) as dst:
+                    for chunk in iter(lambda: src.read(_COPY_CHUNK), b""):
+                        dst.write(chunk)
+                        yield sink.drain()
+                os.remove(path)
+                yield sink.drain()
+
+            manifest.sort(key=lambda r: r["index"])
+            zf.writestr("manifest.json", json.dumps({
+                "total": len(items),
+                "succeeded": sum(1 for r in manifest if r["status"] == "ok"),
+                "failed": sum(1 for r in manifest if r["status"] != "ok"),
+                "items": manifest,
+            }, indent=2))
+        yield sink.drain()
+    finally:
+        # Client went away or we finished: drop queued work and temp files
+        batch.stopped.set()
+        threads.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(out_dir, ignore_errors=True)
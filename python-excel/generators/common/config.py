@@ -1,5 +1,7 @@
 # python-excel/generators/common/config.py
 import os
+import tempfile
+from urllib.parse import urlsplit
 
 # 1. Update Path Logic
 # __file__ is: .../python-excel/generators/common/config.py
@@ -36,4 +38,143 @@ ENTRY_HEIGHT = ENTRY_BLOCK_END - ENTRY_BLOCK_START + 1
 PDF_MARGIN = 50
 PDF_IMAGE_HEIGHT = 267
 PDF_FOOTER_HEIGHT = 20
-PDF_PADDING_HEIGHT = 15
\ No newline at end of file
+PDF_PADDING_HEIGHT = 15
+
+# 4. Embedded Image Sizing
+# Size of the photo box anchored in each reference entry (inches)
+IMAGE_WIDTH_IN = 4.93
+IMAGE_HEIGHT_IN = 3.7
+EMU_PER_INCH = 914400
+
+# Photos are downscaled to the box at this resolution before embedding.
+# Opaque images are stored as JPEG, images with transparency stay PNG.
+IMAGE_DPI = int(os.environ.get("IMAGE_DPI", "200"))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "85"))
+
+# Threads used to decode/rasterize reference photos before the sheet is filled
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Decoding limits, in pixels actually decoded (JPEGs are decoded at 1/2, 1/4 or
+# 1/8 scale when that still covers the photo box, so a 48 MP photo counts ~1 MP).
+# A photo over IMAGE_MAX_PIXELS is skipped as too large / a decompression bomb;
+# once a request has decoded IMAGE_REQUEST_PIXEL_BUDGET pixels, its remaining
+# photos are skipped. Raster cache hits decode nothing. 0 disables a limit.
+IMAGE_MAX_PIXELS = int(float(os.environ.get("IMAGE_MAX_MEGAPIXELS", "64")) * 1_000_000)
+IMAGE_REQUEST_PIXEL_BUDGET = int(float(os.environ.get("IMAGE_REQUEST_MEGAPIXELS", "1000")) * 1_000_000)
+
+# Rasterized photos are cached on local disk, keyed by a hash of the source bytes
+# plus target size/quality, and shared by every worker process on this machine.
+# Set RASTER_CACHE_DIR to an empty string to disable it.
+RASTER_CACHE_DIR = os.environ.get(
+    "RASTER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "daily-report-raster-cache")
+)
+RASTER_CACHE_MAX_BYTES = int(os.environ.get("RASTER_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# Parsed SVG trees kept per process (by content hash), so the same plan or
+# drawing is parsed once for every size and request. 0 disables it.
+SVG_TREE_CACHE_SIZE = int(os.environ.get("SVG_TREE_CACHE_SIZE", "32"))
+
+# 5. Output
+# Generated workbooks larger than this are spooled to a temp file instead of RAM
+OUTPUT_SPOOL_MAX_BYTES = int(os.environ.get("OUTPUT_SPOOL_MAX_MB", "8")) * 1024 * 1024
+
+# Finished workbooks/PDFs are cached on local disk, keyed by a hash of the
+# normalized payload, mode, format, template and generator code, so repeated
+# downloads skip generation. Set OUTPUT_CACHE_DIR to an empty string to disable it.
+OUTPUT_CACHE_DIR = os.environ.get(
+    "OUTPUT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "daily-report-output-cache")
+)
+OUTPUT_CACHE_MAX_BYTES = int(os.environ.get("OUTPUT_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+# Serialized worksheet XML + media, cached per sheet by a fingerprint of that
+# sheet's inputs. Editing only the report fields re-emits the cached reference
+# sheet (and vice versa) instead of rebuilding it. "" disables it.
+SHEET_PART_CACHE_DIR = os.environ.get(
+    "SHEET_PART_CACHE_DIR", os.path.join(tempfile.gettempdir(), "daily-report-sheet-parts")
+)
+SHEET_PART_CACHE_MAX_BYTES = int(os.environ.get("SHEET_PART_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+# 6. Batch Generation
+# Worker processes for /generate-batch and the most items one request may carry
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", str(os.cpu_count() or 1)))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "500"))
+
+# 7. Async Jobs
+# Threads running /jobs submissions, how many more may wait in the queue,
+# and how long (seconds) a finished result stays downloadable
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "20"))
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", "3600"))
+JOB_RESULT_DIR = os.environ.get(
+    "JOB_RESULT_DIR", os.path.join(tempfile.gettempdir(), "daily-report-jobs")
+)
+
+# 8. Logging
+# LOG_FORMAT "text" (key=value lines) or "json" (one object per line, for log shippers)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+
+# 9. Multipart Uploads
+# multipart/form-data requests: most parts (photos + payload) per request and
+# the size limit for the payload when it is sent as a plain form field
+# (send it as a file part to avoid the limit). Parts over 500 KB are spooled to disk.
+UPLOAD_MAX_PARTS = int(os.environ.get("UPLOAD_MAX_PARTS", "5000"))
+UPLOAD_MAX_FIELD_BYTES = int(os.environ.get("UPLOAD_MAX_FIELD_MB", "16")) * 1024 * 1024
+
+# 10. Server (server.py)
+# Pre-forked worker processes, and when each one is replaced by a fresh fork:
+# after about SERVER_MAX_REQUESTS requests (+ up to SERVER_MAX_REQUESTS_JITTER,
+# so workers don't all restart together) or once its RSS passes SERVER_MAX_RSS_MB.
+# 0 disables either limit. SERVER_GRACEFUL_TIMEOUT: seconds a stopping worker
+# gets to finish before it is killed on shutdown.
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("PORT", os.environ.get("SERVER_PORT", "5001")))
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", str(os.cpu_count() or 1)))
+SERVER_MAX_REQUESTS = int(os.environ.get("SERVER_MAX_REQUESTS", "500"))
+SERVER_MAX_REQUESTS_JITTER = int(os.environ.get("SERVER_MAX_REQUESTS_JITTER", "50"))
+SERVER_MAX_RSS_BYTES = int(os.environ.get("SERVER_MAX_RSS_MB", "1024")) * 1024 * 1024
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", "300"))
+
+# 11. Admission Control (generators/admission.py)
+# One budget for the whole server (all of server.py's workers): renders run while
+# their estimated memory fits ADMISSION_MEMORY_MB and fewer than ADMISSION_MAX_CONCURRENT
+# are running. Up to ADMISSION_QUEUE_SIZE more wait (at most ADMISSION_MAX_WAIT
+# seconds), beyond that requests get 503 + Retry-After.
+ADMISSION_MEMORY_BYTES = int(os.environ.get("ADMISSION_MEMORY_MB", "768")) * 1024 * 1024
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("ADMISSION_MAX_CONCURRENT", str(os.cpu_count() or 1)))
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "16"))
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", "30"))
+
+# 12. Remote Images
+# Photos given as http(s):// URLs (e.g. the Node backend's /uploads/images/...)
+# are downloaded concurrently while the workbook is being filled, over
+# keep-alive connections: at most IMAGE_FETCH_WORKERS downloads in total and
+# IMAGE_FETCH_PER_HOST per host. IMAGE_FETCH_TIMEOUT: seconds for the connect
+# and for each read, IMAGE_FETCH_DEADLINE: seconds for a whole download.
+# A photo over IMAGE_FETCH_MAX_MB is skipped.
+# IMAGE_FETCH_ALLOWED_HOSTS: comma separated host names photos may come from,
+# by default only the backend's (BASE_URL, same variable and default as
+# src/config/env.js). "*" allows any other host as long as it resolves to
+# public addresses only: loopback, private and link-local addresses (internal
+# services, cloud metadata) are reached only through a host listed by name.
+# Every redirect hop is checked the same way.
+IMAGE_FETCH_WORKERS = int(os.environ.get("IMAGE_FETCH_WORKERS", "16"))
+IMAGE_FETCH_PER_HOST = int(os.environ.get("IMAGE_FETCH_PER_HOST", "6"))
+IMAGE_FETCH_TIMEOUT = float(os.environ.get("IMAGE_FETCH_TIMEOUT", "10"))
+IMAGE_FETCH_DEADLINE = float(os.environ.get("IMAGE_FETCH_DEADLINE", "30"))
+IMAGE_FETCH_MAX_BYTES = int(float(os.environ.get("IMAGE_FETCH_MAX_MB", "25")) * 1024 * 1024)
+IMAGE_FETCH_KEEPALIVE = float(os.environ.get("IMAGE_FETCH_KEEPALIVE", "30"))
+BACKEND_BASE_URL = os.environ.get("BASE_URL", "https://daily-report-backend.onrender.com")
+IMAGE_FETCH_ALLOWED_HOSTS = tuple(
+    host.strip().lower()
+    for host in os.environ.get("IMAGE_FETCH_ALLOWED_HOSTS", urlsplit(BACKEND_BASE_URL).hostname or "").split(",")
+    if host.strip()
+)
+
+# 13. Rollup (mode="rollup": many daily payloads summed into one summary sheet)
+# Per-period columns are days while the period spans at most ROLLUP_DAY_COLUMNS
+# days, weeks while it spans at most ROLLUP_WEEK_COLUMNS weeks, months after that.
+# ROLLUP_MAX_DAYS: daily payloads accepted in one rollup request.
+ROLLUP_DAY_COLUMNS = int(os.environ.get("ROLLUP_DAY_COLUMNS", "31"))
+ROLLUP_WEEK_COLUMNS = int(os.environ.get("ROLLUP_WEEK_COLUMNS", "26"))
+ROLLUP_MAX_DAYS = int(os.environ.get("ROLLUP_MAX_DAYS", "50000"))
@@ -0,0 +1,166 @@
+# generators/common/disk_cache.py
+import os
+import shutil
+import tempfile
+import threading
+
+_COPY_CHUNK = 1024 * 1024
+
+
+class DiskCache:
+    """
+    A small content-addressed byte cache on local disk.
+
+    - Keys are hex digests; each entry is one file (fanned out by the first 2 chars).
+    - Writes go to a temp file and are moved in with os.replace, so several
+      worker processes can share the same directory without locking:
+      readers either see the whole entry or nothing.
+    - LRU by file mtime: a hit touches the file, eviction deletes the oldest
+      entries once the directory grows past max_bytes.
+    - hits / misses / writes / evictions are counted per process (see stats()).
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        # Bytes written since the last eviction scan (other processes write too,
+        # so this only decides *when* to rescan, the scan itself is authoritative)
+        self._written_since_scan = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            # Mark as recently used for LRU eviction
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def open(self, key):
+        """Like get(), but returns an open binary file (or None) for entries too big to hold in RAM."""
+        path = self._path(key)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return f
+
+    def put(self, key, data):
+        self._store(key, lambda f: f.write(data))
+
+    def put_file(self, key, src):
+        """put() for a file object, copied in chunks from its current position."""
+        self._store(key, lambda f: shutil.copyfileobj(src, f, _COPY_CHUNK))
+
+    def _store(self, key, write):
+        path = self._path(key)
+        folder = os.path.dirname(path)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    write(f)
+                    size = f.tell()
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError:
+            # A full or read-only disk must never fail the request itself
+            return
+
+        with self._lock:
+            self.writes += 1
+            self._written_since_scan += size
+            needs_scan = self._written_since_scan >= self.max_bytes // 10
+            if needs_scan:
+                self._written_since_scan = 0
+        if needs_scan:
+            self.evict()
+
+    def evict(self):
+        """
+        Deletes least recently used entries until the cache is back under
+        90% of max_bytes. Safe to run concurrently from several processes.
+        """
+        entries = []
+        total = 0
+        try:
+            folders = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in folders:
+            folder = os.path.join(self.directory, name)
+            try:
+                with os.scandir(folder) as it:
+                    for item in it:
+                        if item.name.startswith(".tmp-"):
+                            continue
+                        try:
+                            st = item.stat()
+                        except OSError:
+                            continue
+                        entries.append((st.st_mtime, st.st_size, item.path))
+                        total += st.st_size
+            except OSError:
+                continue
+
+        if total <= self.max_bytes:
+            return
+
+        low_watermark = int(self.max_bytes * 0.9)
+        entries.sort()
+        removed = 0
+        for _mtime, size, path in entries:
+            if total <= low_watermark:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                # Already removed by another worker
+                pass
+            total -= size
+
+        with self._lock:
+            self.evictions += removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,297 @@
+# generators/common/fetch.py
+"""
+Downloads http(s):// photo sources, e.g. the Node backend's
+/uploads/images/<file> URLs.
+
+Connections are kept alive and reused per (scheme, host, port), so a report
+with 200 photos from the same backend costs a handful of TCP/TLS handshakes,
+not 200. At most IMAGE_FETCH_PER_HOST downloads hit one host at a time and
+IMAGE_FETCH_WORKERS run in total. Every download has a connect/read timeout,
+an overall deadline and a size cap; redirects are followed a few hops.
+Only allowed hosts are fetched from (by default the backend's own), and a
+host allowed through "*" must resolve to public addresses; the connection
+then goes to the address that was checked. Settings: section 12 of config.py.
+
+fetcher.submit(url) returns a Future, so the engines can start every
+download before filling the workbook and pick the bytes up later.
+"""
+import http.client
+import ipaddress
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+from .config import (
+    IMAGE_FETCH_WORKERS,
+    IMAGE_FETCH_PER_HOST,
+    IMAGE_FETCH_TIMEOUT,
+    IMAGE_FETCH_DEADLINE,
+    IMAGE_FETCH_MAX_BYTES,
+    IMAGE_FETCH_KEEPALIVE,
+    IMAGE_FETCH_ALLOWED_HOSTS
+)
+from .metrics import Counter, Histogram, register_collector, simple_metric
+
+MAX_REDIRECTS = 3
+_REDIRECTS = (301, 302, 303, 307, 308)
+_CHUNK = 64 * 1024
+# A reused connection the server already closed fails like this before any response
+_STALE = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+IMAGE_FETCHES = Counter(
+    "image_fetches",
+    "Photo downloads by result (ok, http_error, too_large, timeout, blocked, error).",
+    ("result",),
+)
+IMAGE_FETCH_SECONDS = Histogram(
+    "image_fetch_duration_seconds",
+    "Time to download one photo, redirects included.",
+)
+IMAGE_FETCH_CONNECTIONS = Counter(
+    "image_fetch_connections",
+    "Connections used for downloads: opened new or reused from the keep-alive pool.",
+    ("result",),
+)
+
+
+class FetchError(Exception):
+    """A photo URL that could not be downloaded; result is the image_fetches label."""
+
+    def __init__(self, message, result="error"):
+        super().__init__(message)
+        self.result = result
+
+
+def is_remote(src):
+    return isinstance(src, str) and src[:8].lower().startswith(("http://", "https://"))
+
+
+def _public_address(host, port):
+    """
+    First address host resolves to, if every one of them is public.
+    Raises FetchError for loopback, private, link-local, reserved or multicast
+    ones, so a public name can't be pointed at internal services.
+    """
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise FetchError(f"could not resolve {host}: {e}") from e
+    addresses = [info[4][0] for info in infos]
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            raise FetchError(f"{host} resolves to non-public address {address}", "blocked")
+    return addresses[0]
+
+
+class _HostPool:
+    """
+    Idle keep-alive connections to one host, and the per-host download limit.
+    public_only: every new connection checks the host resolves to public
+    addresses and connects to the one checked (no second lookup to rebind).
+    """
+
+    def __init__(self, scheme, host, port, limit, public_only=False):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.public_only = public_only
+        self.slots = threading.BoundedSemaphore(max(1, limit))
+        # Loading the CA bundle is slow: once per host, not per connection
+        self._context = ssl.create_default_context() if scheme == "https" else None
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def checkout(self):
+        """(connection, reused): an idle connection if one is fresh enough, else a new one."""
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, idle_since = self._idle.pop()
+                if now - idle_since < IMAGE_FETCH_KEEPALIVE:
+                    return conn, True
+                conn.close()
+        return self.connect(), False
+
+    def checkin(self, conn):
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    def idle_count(self):
+        with self._lock:
+            return len(self._idle)
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop()[0].close()
+
+    def connect(self):
+        if self._context is not None:
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=IMAGE_FETCH_TIMEOUT, context=self._context)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=IMAGE_FETCH_TIMEOUT)
+        if self.public_only:
+            address = _public_address(self.host, self.port)
+            # Host header and TLS server name stay self.host; only the socket goes to address
+            conn._create_connection = lambda _, timeout, source: socket.create_connection(
+                (address, self.port), timeout, source
+            )
+        return conn
+
+
+class ImageFetcher:
+    """Keep-alive pools per host plus the thread pool downloads run on."""
+
+    def __init__(self, workers=IMAGE_FETCH_WORKERS, per_host=IMAGE_FETCH_PER_HOST,
+                 max_bytes=IMAGE_FETCH_MAX_BYTES, deadline=IMAGE_FETCH_DEADLINE,
+                 allowed_hosts=IMAGE_FETCH_ALLOWED_HOSTS):
+        self.workers = max(1, workers)
+        self.per_host = per_host
+        self.max_bytes = max_bytes
+        self.deadline = deadline
+        self.allowed_hosts = allowed_hosts
+        self._hosts = {}
+        self._lock = threading.Lock()
+        # Created on first use: server.py forks after the warm-up and threads don't survive a fork
+        self._executor = None
+
+    def _host_pool(self, url):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise FetchError(f"not an http(s) URL: {url[:100]}")
+        host = parts.hostname.lower()
+        # Listed by name: trusted wherever it resolves. Through "*": public addresses only
+        public_only = host not in self.allowed_hosts
+        if public_only and "*" not in self.allowed_hosts:
+            raise FetchError(f"host not allowed: {host}", "blocked")
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, host, port)
+        with self._lock:
+            pool = self._hosts.get(key)
+            if pool is None:
+                pool = self._hosts[key] = _HostPool(scheme, host, port, self.per_host, public_only)
+            return pool
+
+    def fetch(self, url):
+        """Body of url as bytes (redirects followed). Raises FetchError."""
+        started = time.monotonic()
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                status, location, body = self._get(url, started + self.deadline)
+                if status in _REDIRECTS and location:
+                    url = urljoin(url, location)
+                    continue
+                if status != 200:
+                    raise FetchError(f"HTTP {status} for {url[:100]}", "http_error")
+                IMAGE_FETCHES.inc(result="ok")
+                return body
+            raise FetchError(f"more than {MAX_REDIRECTS} redirects for {url[:100]}", "http_error")
+        except FetchError as e:
+            IMAGE_FETCHES.inc(result=e.result)
+            raise
+        except (TimeoutError, OSError, http.client.HTTPException) as e:
+            result = "timeout" if isinstance(e, TimeoutError) else "error"
+            IMAGE_FETCHES.inc(result=result)
+            raise FetchError(f"could not download {url[:100]}: {e!r}", result) from e
+        finally:
+            IMAGE_FETCH_SECONDS.observe(time.monotonic() - started)
+
+    def submit(self, url):
+        """Starts fetch(url) on the download pool; returns its Future."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-fetch")
+            return self._executor.submit(self.fetch, url)
+
+    def _get(self, url, deadline):
+        """One GET on a pooled connection: (status, Location header, body or None)."""
+        pool = self._host_pool(url)
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        with pool.slots:
+            conn, reused = pool.checkout()
+            IMAGE_FETCH_CONNECTIONS.inc(result="reused" if reused else "new")
+            try:
+                try:
+                    response = self._request(conn, path)
+                except _STALE:
+                    if not reused:
+                        raise
+                    # The server dropped the idle connection: one retry on a new one
+                    conn.close()
+                    conn = pool.connect()
+                    IMAGE_FETCH_CONNECTIONS.inc(result="new")
+                    response = self._request(conn, path)
+
+                body = None
+                if response.status == 200:
+                    body = self._read_body(response, deadline, url)
+                else:
+                    # Drained (error pages and redirects are small) so the connection can be reused
+                    self._read_body(response, deadline, url)
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                pool.checkin(conn)
+            return response.status, response.getheader("Location"), body
+
+    @staticmethod
+    def _request(conn, path):
+        conn.request("GET", path, headers={"Accept": "image/*, */*;q=0.5"})
+        return conn.getresponse()
+
+    def _read_body(self, response, deadline, url):
+        length = response.getheader("Content-Length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            raise FetchError(f"{url[:100]} is {int(length)} bytes, over the {self.max_bytes} limit", "too_large")
+        chunks = []
+        size = 0
+        while True:
+            if time.monotonic() > deadline:
+                raise FetchError(f"download of {url[:100]} took over {self.deadline}s", "timeout")
+            chunk = response.read(_CHUNK)
+            if not chunk:
+                return b"".join(chunks)
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise FetchError(f"{url[:100]} is over the {self.max_bytes} bytes limit", "too_large")
+            chunks.append(chunk)
+
+    def idle_connections(self):
+        with self._lock:
+            pools = list(self._hosts.values())
+        return sum(pool.idle_count() for pool in pools)
+
+    def close(self):
+        """Stops the download threads and closes every idle connection."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            pools = list(self._hosts.values())
+        if executor is not None:
+            executor.shutdown(wait=True)
+        for pool in pools:
+            pool.close()
+
+
+fetcher = ImageFetcher()
+
+
+def _fetch_metrics():
+    return simple_metric(
+        "image_fetch_idle_connections", "gauge", "Keep-alive connections waiting in the download pool.",
+        [({}, fetcher.idle_connections())],
+    )
+
+
+register_collector(_fetch_metrics)
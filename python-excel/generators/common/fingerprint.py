@@ -0,0 +1,64 @@
+# generators/common/fingerprint.py
+import glob
+import hashlib
+import json
+import os
+
+_GENERATORS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _code_version():
+    """
+    Hash of the generator sources: a deploy that changes how reports look
+    must not keep serving anything rendered by the old code.
+    """
+    h = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(_GENERATORS_DIR, "**", "*.py"), recursive=True)):
+        h.update(os.path.relpath(path, _GENERATORS_DIR).encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+CODE_VERSION = _code_version()
+
+
+def _token(obj):
+    # Uploaded image parts stand in the payload as a hash of their bytes
+    token = getattr(obj, "cache_token", None)
+    if token is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return token
+
+
+def fingerprint(*parts):
+    """
+    sha256 hex digest of JSON-serializable parts. Dicts are normalized (sorted
+    keys, compact separators), so the same data always gives the same digest
+    however the client ordered it. Objects with a cache_token (uploaded image
+    parts) are hashed as that token. Raises TypeError/ValueError for data JSON
+    can't represent.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        encoded = json.dumps(part, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=_token)
+        h.update(encoded.encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def inline_images_only(reference_entries):
+    """
+    True if every photo is inline (a data URI or an uploaded part). A local
+    file path or an http(s) URL can change while the payload stays the same,
+    so such payloads are not cached.
+    """
+    for entry in reference_entries or []:
+        if not isinstance(entry, dict):
+            continue
+        for src in entry.get("images") or []:
+            if isinstance(src, str) and src.startswith("data:") or hasattr(src, "cache_token"):
+                continue
+            if src:
+                return False
+    return True
@@ -3,20 +3,19 @@ from io import BytesIO
 from PIL import Image
 import textwrap
 import os
+from .merges import get_merged_index
 
 def write_to_merged_safe(ws, row, col, value):
     """
     Safely writes a value to a cell that might be part of a merged range.
     Openpyxl requires writing to the top-left cell of a merge to display correctly.
+    Uses the worksheet's merged-range index, so this stays O(log n) as merges pile up.
     """
-    for merged in ws.merged_cells.ranges:
-        if (
-            merged.min_row <= row <= merged.max_row
-            and merged.min_col <= col <= merged.max_col
-        ):
-            # Write to the absolute top-left coordinate of the merge
-            ws.cell(row=merged.min_row, column=merged.min_col).value = value
-            return
+    merged = get_merged_index(ws).find(row, col)
+    if merged is not None:
+        # Write to the absolute top-left coordinate of the merge
+        ws.cell(row=merged.min_row, column=merged.min_col).value = value
+        return
             
     # If not merged, write normally
     ws.cell(row=row, column=col).value = value
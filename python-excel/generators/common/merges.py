@@ -0,0 +1,148 @@
+# generators/common/merges.py
+import weakref
+from bisect import bisect_left, bisect_right, insort
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.worksheet.merge import MergedCellRange
+
+
+class MergedRangeIndex:
+    """
+    Row -> interval index over ws.merged_cells.ranges.
+
+    openpyxl keeps merges in a plain set and answers "is this cell merged?"
+    (and even merge_cells/unmerge_cells themselves) by scanning every range.
+    The reference sheet adds merges for every entry, so those scans made
+    generation quadratic. Here each covered row keeps its ranges sorted by
+    min_col, so a lookup is a bisect on one short list.
+    """
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.rebuild()
+
+    def rebuild(self):
+        # row -> ([min_col, ...], [range, ...]) both sorted by min_col
+        self._rows = {}
+        # min_row -> [range, ...] plus the sorted list of those rows
+        self._by_start = {}
+        self._start_rows = []
+        for merged in self.ws.merged_cells.ranges:
+            self._add(merged)
+        self._synced_count = len(self.ws.merged_cells.ranges)
+
+    def _add(self, merged):
+        for row in range(merged.min_row, merged.max_row + 1):
+            cols, ranges = self._rows.setdefault(row, ([], []))
+            i = bisect_right(cols, merged.min_col)
+            cols.insert(i, merged.min_col)
+            ranges.insert(i, merged)
+
+        starting = self._by_start.get(merged.min_row)
+        if starting is None:
+            starting = self._by_start[merged.min_row] = []
+            insort(self._start_rows, merged.min_row)
+        starting.append(merged)
+
+    def _remove(self, merged):
+        for row in range(merged.min_row, merged.max_row + 1):
+            cols, ranges = self._rows[row]
+            for i, candidate in enumerate(ranges):
+                if candidate == merged:
+                    del cols[i]
+                    del ranges[i]
+                    break
+            if not ranges:
+                del self._rows[row]
+
+        starting = self._by_start[merged.min_row]
+        starting[:] = [r for r in starting if r != merged]
+        if not starting:
+            del self._by_start[merged.min_row]
+            del self._start_rows[bisect_left(self._start_rows, merged.min_row)]
+
+    def sync(self):
+        """Rebuilds the index if something merged/unmerged behind our back."""
+        if len(self.ws.merged_cells.ranges) != self._synced_count:
+            self.rebuild()
+
+    def find(self, row, col):
+        """The merged range covering (row, col), or None."""
+        entry = self._rows.get(row)
+        if entry is None:
+            return None
+        cols, ranges = entry
+        # Walk left from the last range starting at or before col
+        for i in range(bisect_right(cols, col) - 1, -1, -1):
+            if ranges[i].max_col >= col:
+                return ranges[i]
+        return None
+
+    def contains(self, cr):
+        """Same answer as `cr in ws.merged_cells` (cr inside an existing merge)."""
+        entry = self._rows.get(cr.min_row)
+        if entry is None:
+            return False
+        cols, ranges = entry
+        for i in range(bisect_right(cols, cr.min_col) - 1, -1, -1):
+            if cr <= ranges[i]:
+                return True
+        return False
+
+    def starting_in(self, min_row, max_row=None):
+        """All merges whose top row lies in [min_row, max_row] (max_row=None: open ended)."""
+        lo = bisect_left(self._start_rows, min_row)
+        hi = len(self._start_rows) if max_row is None else bisect_right(self._start_rows, max_row)
+        found = []
+        for row in self._start_rows[lo:hi]:
+            found.extend(self._by_start[row])
+        return found
+
+    def merge(self, start_row, start_column, end_row, end_column):
+        """ws.merge_cells() without openpyxl's linear containment scan."""
+        cr = CellRange(min_col=start_column, min_row=start_row, max_col=end_column, max_row=end_row)
+        mcr = MergedCellRange(self.ws, cr.coord)
+        if not self.contains(mcr):
+            self.ws.merged_cells.ranges.add(mcr)
+            self._add(mcr)
+            self._synced_count = len(self.ws.merged_cells.ranges)
+        self.ws._clean_merge_range(mcr)
+        return mcr
+
+    def unmerge(self, merged):
+        """ws.unmerge_cells() without openpyxl's linear containment scan."""
+        cr = merged if isinstance(merged, CellRange) else CellRange(merged)
+        if not self.contains(cr):
+            raise ValueError("Cell range {0} is not merged".format(cr.coord))
+
+        self.ws.merged_cells.remove(cr)
+        self._remove(cr)
+        self._synced_count = len(self.ws.merged_cells.ranges)
+
+        cells = cr.cells
+        next(cells)  # skip first cell
+        for row, col in cells:
+            del self.ws._cells[(row, col)]
+
+
+# Kept outside the worksheet so cached/pickled template workbooks never carry an index
+_indexes = weakref.WeakKeyDictionary()
+
+
+def get_merged_index(ws):
+    """The (lazily built, kept in sync) merged-range index of a worksheet."""
+    index = _indexes.get(ws)
+    if index is None:
+        index = _indexes[ws] = MergedRangeIndex(ws)
+    else:
+        index.sync()
+    return index
+
+
+def merge_cells(ws, start_row, start_column, end_row, end_column):
+    """Merges a block and keeps the worksheet's index up to date."""
+    return get_merged_index(ws).merge(start_row, start_column, end_row, end_column)
+
+
+def unmerge_cells(ws, merged):
+    """Unmerges a range (CellRange or "B25:C25") and keeps the index up to date."""
+    get_merged_index(ws).unmerge(merged)
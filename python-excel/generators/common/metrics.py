@@ -0,0 +1,360 @@
+# generators/common/metrics.py
+"""
+Minimal Prometheus-style metrics (text exposition format 0.0.4), no extra dependency.
+
+Values live in this process. Under server.py, which forks several workers,
+every process also writes its samples to a file in a directory shared by all
+of them (share_samples), and render_metrics() adds those files up, like
+prometheus_client's multiprocess mode. So whichever worker answers a scrape
+reports the whole server. Counters and histograms of workers that exited are
+folded into one archive file by the parent (retire_samples), so they keep
+growing across worker recycling. Gauges only count live processes, and
+collectors registered with shared=True (state every process sees the same,
+e.g. the admission budget) are reported once, by the process answering.
+"""
+import abc
+import functools
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Generation stages run from a few ms (header) to minutes (big reference sheets)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+_collectors = []
+_registry_lock = threading.Lock()
+
+# Multi-process mode (share_samples): the shared directory and this process's file in it
+_shared_dir = None
+_shared_file = None
+_ARCHIVE = "archive.json"
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric(abc.ABC):
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    @abc.abstractmethod
+    def _samples(self):
+        """[(name suffix, label names, label values, value)] for family()"""
+
+    def family(self):
+        """(name, type, documentation, [(sample name, label names, label values, value)])"""
+        samples = [
+            (self.name + suffix, labelnames, labelvalues, value)
+            for suffix, labelnames, labelvalues, value in self._samples()
+        ]
+        return self.name, self.type, self.documentation, samples
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("_total", self.labelnames, key, value) for key, value in items]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("", self.labelnames, key, value) for key, value in items]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non cumulative) counts, sum, count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        samples = []
+        bucket_labels = self.labelnames + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                samples.append(("_bucket", bucket_labels, key + (_format_value(float(bound)),), cumulative))
+            samples.append(("_bucket", bucket_labels, key + ("+Inf",), count))
+            samples.append(("_sum", self.labelnames, key, total))
+            samples.append(("_count", self.labelnames, key, count))
+        return samples
+
+
+def register_collector(collect, shared=False):
+    """
+    collect() is called on every scrape and returns the families (see
+    simple_metric) of values that are kept elsewhere (cache counters, queue sizes...).
+    shared: the values are the same in every process (shared memory), so
+    they are not added up across workers.
+    """
+    with _registry_lock:
+        _collectors.append((collect, shared))
+
+
+def simple_metric(name, metric_type, documentation, samples):
+    """A one-family list for a collector: samples is [(labels dict, value), ...]."""
+    suffix = "_total" if metric_type == "counter" else ""
+    return [(name, metric_type, documentation, [
+        (name + suffix, tuple(labels), tuple(labels.values()), value) for labels, value in samples
+    ])]
+
+
+def _collect(own=True, shared=True):
+    """Families of this process: its own values and/or those of shared collectors."""
+    with _registry_lock:
+        metrics = list(_registry)
+        collectors = list(_collectors)
+    families = [metric.family() for metric in metrics] if own else []
+    for collect, is_shared in collectors:
+        if (shared if is_shared else own):
+            families.extend(collect())
+    return families
+
+
+def _render(families):
+    lines = []
+    for name, metric_type, documentation, samples in families:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for sample_name, labelnames, labelvalues, value in samples:
+            lines.append(f"{sample_name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def render_metrics():
+    """Everything registered, in Prometheus text format: of every process in multi-process mode."""
+    if _shared_dir is None:
+        return _render(_collect())
+    write_samples()
+    return _render(_merge(_read_shared()) + _collect(own=False))
+
+
+# --- Multi-process mode (server.py) ---
+
+def share_samples(directory, fresh=False):
+    """
+    Turns on multi-process mode: this process's samples go to its own file
+    in directory. fresh: forget the values inherited from the parent (a
+    newly forked worker), which the parent's own file already counts.
+    """
+    global _shared_dir, _shared_file
+    if fresh:
+        with _registry_lock:
+            metrics = list(_registry)
+        for metric in metrics:
+            metric.reset()
+    # The random part keeps a reused pid from matching an archived file
+    _shared_file = os.path.join(directory, f"{os.getpid()}-{os.urandom(4).hex()}.json")
+    _shared_dir = directory
+
+
+def write_samples():
+    """Writes this process's samples to its shared file (a no-op outside multi-process mode)."""
+    if _shared_dir is None:
+        return
+    _write_json(_shared_file, {"families": _collect(shared=False)})
+
+
+def retire_samples(pid):
+    """
+    Called by the parent once worker pid has exited: its counters and
+    histograms move into the archive file, its gauges are dropped.
+    """
+    if _shared_dir is None:
+        return
+    archive = _load_json(os.path.join(_shared_dir, _ARCHIVE)) or {"families": [], "merged": []}
+    paths = glob.glob(os.path.join(_shared_dir, f"{pid}-*.json"))
+    if not paths:
+        return
+    families = list(archive["families"])
+    for path in paths:
+        snapshot = _load_json(path) or {"families": []}
+        families.extend(f for f in snapshot["families"] if f[1] != "gauge")
+    names = [os.path.basename(path) for path in paths]
+    # Files already deleted don't need to be skipped any more
+    merged = [name for name in archive["merged"] if os.path.exists(os.path.join(_shared_dir, name))]
+    # The archive lists the files it already holds, so a scrape between these
+    # two steps does not count them twice
+    _write_json(os.path.join(_shared_dir, _ARCHIVE), {"families": _merge([families]), "merged": merged + names})
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _read_shared():
+    """Families of every process file plus the archive."""
+    archive = _load_json(os.path.join(_shared_dir, _ARCHIVE)) or {"families": [], "merged": []}
+    skip = set(archive["merged"])
+    sources = [archive["families"]]
+    for path in sorted(glob.glob(os.path.join(_shared_dir, "*.json"))):
+        name = os.path.basename(path)
+        if name == _ARCHIVE or name in skip:
+            continue
+        snapshot = _load_json(path)
+        if snapshot is not None:
+            sources.append(snapshot["families"])
+    return sources
+
+
+def _merge(sources):
+    """Families with the same name added up, sample by sample (histogram buckets included)."""
+    merged = {}
+    for families in sources:
+        for name, metric_type, documentation, samples in families:
+            family = merged.get(name)
+            if family is None:
+                family = merged[name] = (metric_type, documentation, {})
+            values = family[2]
+            for sample_name, labelnames, labelvalues, value in samples:
+                key = (sample_name, tuple(labelnames), tuple(labelvalues))
+                values[key] = values.get(key, 0) + value
+    return [
+        (name, metric_type, documentation, [(*key, value) for key, value in values.items()])
+        for name, (metric_type, documentation, values) in merged.items()
+    ]
+
+
+def _write_json(path, data):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# --- Generation pipeline ---
+
+STAGE_SECONDS = Histogram(
+    "report_stage_duration_seconds",
+    "Time spent in each report generation stage.",
+    ("stage",),
+)
+
+
+@contextmanager
+def stage_timer(stage):
+    """with stage_timer("template_load"): ... -> one report_stage_duration_seconds observation."""
+    with STAGE_SECONDS.time(stage=stage):
+        yield
+
+
+def timed_stage(stage):
+    """Decorator form of stage_timer, for the fill_* functions."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(stage=stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,28 @@
+# generators/common/optional_codecs.py
+import importlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Optional codecs, imported the first time a photo needs them: cairosvg
+# (cairocffi) and imageio (numpy) are the slowest imports of the whole app,
+# and most payloads are plain JPEG/PNG
+_OPTIONAL_CODECS = {}
+_optional_lock = threading.Lock()
+
+
+def optional_codec(name):
+    """The module, or None if it isn't installed/loadable (tried once per process)."""
+    try:
+        return _OPTIONAL_CODECS[name]
+    except KeyError:
+        pass
+    with _optional_lock:
+        if name not in _OPTIONAL_CODECS:
+            try:
+                _OPTIONAL_CODECS[name] = importlib.import_module(name)
+            except Exception as e:
+                logger.warning("optional codec %s unavailable: %s", name, e)
+                _OPTIONAL_CODECS[name] = None
+        return _OPTIONAL_CODECS[name]
@@ -0,0 +1,106 @@
+# generators/common/uploads.py
+"""
+Binary image transport.
+
+Instead of base64 data URIs inside the JSON body, a client can POST
+multipart/form-data: a "payload" part holding the usual JSON, plus one part
+per image with the raw bytes. In the JSON an image is then referenced by
+part name, e.g. "images": ["attachment:photo-1", "attachment:photo-2"].
+
+Werkzeug spools big parts to temp files while parsing, and the resolved
+payload carries UploadedImage objects wrapping those files, which the
+rasterizer reads like any other file-like source: no base64 step, no copy
+of the photo inside the JSON string. Data URIs keep working next to them.
+"""
+import hashlib
+import json
+from io import BytesIO
+
+ATTACHMENT_PREFIX = "attachment:"
+PAYLOAD_PART = "payload"
+
+_HASH_CHUNK = 1024 * 1024
+
+
+class UploadedImage:
+    """One image part of a multipart request, standing in for its data URI."""
+
+    def __init__(self, name, stream, filename=None, content_type=None):
+        self.name = name
+        self.stream = stream
+        self.filename = filename
+        self.content_type = content_type
+        self._digest = None
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def seek(self, pos, whence=0):
+        return self.stream.seek(pos, whence)
+
+    def close(self):
+        self.stream.close()
+
+    @property
+    def cache_token(self):
+        """
+        Stands for the image in cache fingerprints: a hash of the bytes, so two
+        requests with the same part names but different photos never collide.
+        """
+        if self._digest is None:
+            h = hashlib.sha256()
+            self.stream.seek(0)
+            for chunk in iter(lambda: self.stream.read(_HASH_CHUNK), b""):
+                h.update(chunk)
+            self.stream.seek(0)
+            self._digest = "sha256:" + h.hexdigest()
+        return self._digest
+
+    def __repr__(self):
+        return f"<UploadedImage {self.name!r}>"
+
+
+def load_multipart_payload(form, files, detach=False):
+    """
+    The JSON payload of a multipart request with every "attachment:<name>"
+    image reference replaced by an UploadedImage for that part.
+    The payload may come as a form field or as a file part (no size limit
+    on form fields then). Raises ValueError for a missing/invalid payload
+    or a reference to a part that was not sent.
+
+    detach=True keeps the parts readable after the request ends (async
+    jobs): Werkzeug closes the request's files on teardown, so the spooled
+    files are taken over, not copied, and deleted once the payload is dropped.
+    """
+    if PAYLOAD_PART in files:
+        text = files[PAYLOAD_PART].read().decode("utf-8")
+    elif PAYLOAD_PART in form:
+        text = form[PAYLOAD_PART]
+    else:
+        raise ValueError(f"Missing '{PAYLOAD_PART}' part")
+    try:
+        payload = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON in '{PAYLOAD_PART}' part: {e}") from None
+
+    attachments = {}
+    for name, storage in files.items():
+        if name != PAYLOAD_PART:
+            attachments[name] = UploadedImage(name, storage.stream, storage.filename, storage.mimetype)
+            if detach:
+                storage.stream = BytesIO()
+    return _resolve(payload, attachments, in_images=False)
+
+
+def _resolve(value, attachments, in_images):
+    if isinstance(value, dict):
+        return {k: _resolve(v, attachments, k == "images") for k, v in value.items()}
+    if isinstance(value, list):
+        return [_resolve(v, attachments, in_images) for v in value]
+    if in_images and isinstance(value, str) and value.startswith(ATTACHMENT_PREFIX):
+        name = value[len(ATTACHMENT_PREFIX):]
+        if name not in attachments:
+            raise ValueError(f"Image refers to missing part {name!r}")
+        # The same part referenced twice is the same object, so it is decoded once
+        return attachments[name]
+    return value
@@ -1,66 +1,113 @@
 # generators/excel/engine.py
+import logging
 import os
-from openpyxl import load_workbook
-from .sheets.report import (
-    fill_report_header, 
-    fill_activities, 
-    fill_team_tables, 
-    fill_material_machinery_tables,
-    fill_report_sheet
-)
+from datetime import datetime
+from openpyxl import Workbook
+from .template_cache import load_template, template_version
+from ..common.metrics import stage_timer
+from .sheets.report import fill_report_sheet
 from .sheets.reference import fill_reference_sheet
+from .sheets.rollup import fill_rollup_sheet
+from .sheet_parts import PlannedWorkbook, reuse_sheet, report_inputs, reference_inputs
+from .images import start_fetches
+from ..common.config import DATA_COLUMNS
+from ..common.rollup import aggregate_days
+
+TEMPLATE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "templates",
+    "template.xlsx"
+)
 
-def generate_full_report(data, mode="combined"):
+logger = logging.getLogger(__name__)
+
+def generate_full_report(data, mode="combined", progress=None, reuse_parts=False):
+    """
+    Builds the workbook for mode "report", "reference", "combined" or
+    "rollup" (data = {"days": [daily payload, ...], "title"?}).
+    progress: optional callback(stage, done, total) for long generations
+    (stages: "report", then "reference" once per entry; "rollup").
+    reuse_parts: for callers that only save the result. A sheet whose inputs
+    match an earlier build is then left unfilled and spliced in from cached
+    parts at save time (see sheet_parts.py), so the daily modes return a
+    PlannedWorkbook that writer.save_workbook() accepts and nothing else does.
+    """
+    if mode == "rollup":
+        return generate_rollup(data, progress)
+
+    # Never log the payload itself: photos arrive as multi-megabyte data URIs
+    logger.info(
+        "generating workbook mode=%s project=%r entries=%d",
+        mode, (data or {}).get("projectName"), len((data or {}).get("reference") or []),
+    )
 
-    print(f"Processing data: {data}")
-    
     # Different validation for reference mode
     if mode == "reference":
         if not data or 'reference' not in data:
-            print("ERROR: Missing reference data")
+            logger.warning("missing reference data mode=%s", mode)
             # return create_empty_workbook()
     else:
         # Original validation for report modes
         if not data or 'projectName' not in data:
-            print("ERROR: Missing required data")
+            logger.warning("missing required data mode=%s keys=%s", mode, sorted(data or {}))
             # return create_empty_workbook()
 
-    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    template_path = os.path.join(base_dir, "templates", "template.xlsx")
-    wb = load_workbook(template_path)
+    # http(s) photos download in the background while the template is cloned
+    # and the report sheet filled; the reference sheet waits for them last
+    image_cache = {}
+    if mode in ("reference", "combined") and data:
+        start_fetches(data.get("reference"), image_cache, DATA_COLUMNS)
+
+    # Parsed once per process, cloned per request (reloads if the file changes)
+    with stage_timer("template_load"):
+        wb = load_template(TEMPLATE_PATH)
     
     ws_report = wb.worksheets[0]
     ws_ref = wb.worksheets[1]
 
+    if progress:
+        progress("template", 1, 1)
+
+    # A sheet spliced in from cached parts at save time is left unfilled
+    version = template_version(TEMPLATE_PATH) if reuse_parts else None
+
+    def reuse(ws, inputs):
+        return reuse_parts and reuse_sheet(ws, mode, inputs, version)
+
     if mode == "report":
         # Fill Report, then delete Reference
-        fill_report_sheet(ws_report, data)
-        fill_report_header(ws_report, data)
-        fill_activities(ws_report, data)
-        team_shift = fill_team_tables(ws_report, data)
-        fill_material_machinery_tables(ws_report, data, team_shift)
+        if not reuse(ws_report, report_inputs(data)):
+            fill_report_sheet(ws_report, data)
         wb.remove(ws_ref) 
+        if progress:
+            progress("report", 1, 1)
 
     elif mode == "reference":
         # Fill Reference, then delete Report
         reference_data = data.get('reference', [])
-        print(f"DEBUG: Passing to fill_reference_sheet: {reference_data}")
-        fill_reference_sheet(ws_ref, reference_data, data.get("table_title", "PHOTO REFERENCE"))
-        _apply_reference_print_settings(ws_ref)
+        if not reuse(ws_ref, reference_inputs(data)):
+            logger.debug("passing %d entries to fill_reference_sheet", len(reference_data))
+            fill_reference_sheet(ws_ref, reference_data, data.get("table_title", "PHOTO REFERENCE"), progress, image_cache)
+            _apply_reference_print_settings(ws_ref)
+        elif progress:
+            progress("reference", len(reference_data), len(reference_data))
         wb.remove(ws_report)
 
     elif mode == "combined":
         # FILL BOTH
         reference_data = data.get('reference', [])
         # 1. Report Sheet
-        fill_report_header(ws_report, data)
-        fill_activities(ws_report, data)
-        team_shift = fill_team_tables(ws_report, data)
-        fill_material_machinery_tables(ws_report, data, team_shift)
+        if not reuse(ws_report, report_inputs(data)):
+            fill_report_sheet(ws_report, data)
+        if progress:
+            progress("report", 1, 1)
         
         # 2. Reference Sheet (The 4-per-page logic lives here!)
-        fill_reference_sheet(ws_ref, reference_data, data.get("table_title", "PHOTO REFERENCE"))
-        _apply_reference_print_settings(ws_ref)
+        if not reuse(ws_ref, reference_inputs(data)):
+            fill_reference_sheet(ws_ref, reference_data, data.get("table_title", "PHOTO REFERENCE"), progress, image_cache)
+            _apply_reference_print_settings(ws_ref)
+        elif progress:
+            progress("reference", len(reference_data), len(reference_data))
 
         # Set the Report sheet (index 0) as the active one
         wb.active = 0
@@ -70,6 +117,27 @@ def generate_full_report(data, mode="combined"):
             sheet.sheet_view.tabSelected = False
         wb.worksheets[0].sheet_view.tabSelected = True
 
+    return PlannedWorkbook(wb) if reuse_parts else wb
+
+def generate_rollup(data, progress=None):
+    """
+    One summary sheet for many daily payloads (weekly/monthly summaries):
+    every table item summed per period, with its accumulated and peak figures.
+    Built from scratch in write-only mode; the daily template isn't used.
+    """
+    data = data or {}
+    days = data.get("days")
+    logger.info("generating rollup days=%s", len(days) if isinstance(days, list) else None)
+    rollup = aggregate_days(days, progress)
+
+    wb = Workbook(write_only=True)
+    # Dated by the period it covers, so the same days always give the same bytes
+    wb.properties.created = datetime.combine(rollup.last_day, datetime.min.time()) if rollup.last_day \
+        else datetime(1980, 1, 1)
+    ws = wb.create_sheet("Rollup")
+    fill_rollup_sheet(ws, rollup, data.get("title") or "ROLLUP SUMMARY")
+    if progress:
+        progress("rollup", len(days), len(days))
     return wb
 
 def _apply_reference_print_settings(ws):
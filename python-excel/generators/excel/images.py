@@ -1,32 +1,233 @@
 # python-excel/generators/excel/images.py
+import logging
 import os
 from io import BytesIO
 from openpyxl.drawing.image import Image as XLImage
 from openpyxl.drawing.spreadsheet_drawing import TwoCellAnchor, AnchorMarker
 import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # New imports
 from PIL import Image, UnidentifiedImageError
-try:
-    import cairosvg
-except Exception:
-    cairosvg = None
-try:
-    import imageio
-except Exception:
-    imageio = None
-
-def _rasterize_image_bytes(img_bytes, filename_hint=None):
-    """
-    Convert image bytes to PNG bytes suitable for openpyxl.
-    Supports: SVG (via cairosvg), WebP/BMP/TIFF/GIF (via Pillow), and fallback via imageio.
-    Returns PNG bytes or raises an exception on failure.
+from ..common.config import (
+    IMAGE_WIDTH_IN,
+    IMAGE_HEIGHT_IN,
+    EMU_PER_INCH,
+    IMAGE_DPI,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_WORKERS,
+    IMAGE_MAX_PIXELS,
+    IMAGE_REQUEST_PIXEL_BUDGET,
+    RASTER_CACHE_DIR,
+    RASTER_CACHE_MAX_BYTES
+)
+from ..common.optional_codecs import optional_codec
+from ..common.disk_cache import DiskCache
+from ..common.fetch import FetchError, fetcher, is_remote
+from ..common.metrics import Counter, Histogram, register_collector, simple_metric, timed_stage
+from .svg import render_svg
+
+# Bump when the rasterize/encode pipeline changes so stale cache entries are ignored
+_RASTER_PIPELINE_VERSION = 3
+
+_raster_cache = DiskCache(RASTER_CACHE_DIR, RASTER_CACHE_MAX_BYTES) if RASTER_CACHE_DIR else None
+
+logger = logging.getLogger(__name__)
+
+RASTERIZE_SECONDS = Histogram(
+    "image_rasterize_duration_seconds",
+    "Time to decode, downscale and re-encode one photo (raster cache misses only).",
+    ("kind",),
+)
+IMAGE_FAILURES = Counter(
+    "image_failures",
+    "Photos skipped because they could not be read or rasterized.",
+    ("reason",),
+)
+
+def raster_cache_stats():
+    """Hit/miss counters of the on-disk raster cache for this process (None if disabled)."""
+    return _raster_cache.stats() if _raster_cache else None
+
+def _raster_cache_metrics():
+    stats = raster_cache_stats()
+    if stats is None:
+        return []
+    return simple_metric(
+        "raster_cache_events", "counter",
+        "On-disk raster cache lookups and maintenance.",
+        [({"event": event}, count) for event, count in stats.items()],
+    )
+
+register_collector(_raster_cache_metrics)
+
+class ImageTooLarge(ValueError):
+    """A photo over IMAGE_MAX_PIXELS, or past what is left of the request's pixel budget."""
+
+class PixelBudget:
+    """Pixels one request may still decode (IMAGE_REQUEST_PIXEL_BUDGET), shared by the pre-pass threads."""
+
+    def __init__(self, limit=IMAGE_REQUEST_PIXEL_BUDGET):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def charge(self, pixels):
+        if not self.limit:
+            return
+        with self._lock:
+            if self.used + pixels > self.limit:
+                raise ImageTooLarge(
+                    f"request pixel budget of {self.limit / 1e6:.0f} MP used up "
+                    f"({self.used / 1e6:.0f} MP decoded, this photo needs {pixels / 1e6:.1f} MP)"
+                )
+            self.used += pixels
+
+# image_cache is per request, so the request's budget travels with it
+_BUDGET_KEY = ("pixel_budget",)
+
+def _request_budget(image_cache):
+    return image_cache.setdefault(_BUDGET_KEY, PixelBudget())
+
+# Downloads of http(s) photos started by start_fetches: {url: Future}
+_FETCH_KEY = ("remote_fetches",)
+
+def start_fetches(entries, image_cache, data_columns):
+    """
+    Starts downloading every http(s) photo of entries in the background, so
+    they arrive while the rest of the report is being built. prepare_images
+    and load_sheet_image pick the results up from image_cache.
+    """
+    fetches = image_cache.setdefault(_FETCH_KEY, {})
+    for entry in entries or []:
+        if not isinstance(entry, dict):
+            continue
+        for idx, img_source in enumerate(entry.get("images") or []):
+            if idx >= len(data_columns) or not is_remote(img_source):
+                continue
+            if img_source not in fetches and img_source not in image_cache:
+                fetches[img_source] = fetcher.submit(img_source)
+
+def target_pixel_size(width_in=IMAGE_WIDTH_IN, height_in=IMAGE_HEIGHT_IN, dpi=IMAGE_DPI):
+    """Pixel size of an anchor box (inches) at the configured DPI."""
+    return (max(1, round(width_in * dpi)), max(1, round(height_in * dpi)))
+
+def _has_alpha(im):
+    """True only if the image actually uses transparency (not just an unused alpha band)."""
+    if im.mode in ("RGBA", "LA", "PA"):
+        return im.getchannel("A").getextrema()[0] < 255
+    return "transparency" in im.info
+
+def _cover_size(size, target_size):
+    """Smallest size with size's aspect ratio that still fills target_size on both axes (never upscaled)."""
+    scale = max(target_size[0] / size[0], target_size[1] / size[1])
+    if scale >= 1:
+        return size
+    return (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+
+def _limit_decode(im, target_size, budget=None):
+    """
+    Runs before any pixel is decoded. JPEGs are switched to draft mode: libjpeg
+    scales the DCT by 1/2, 1/4 or 1/8 while decoding, as far as the result still
+    covers target_size, so a 48 MP photo is never held at full size. The size
+    left to decode is then checked against IMAGE_MAX_PIXELS and the budget.
     """
+    if target_size and im.format == "JPEG":
+        im.draft(im.mode, _cover_size(im.size, target_size))
+    _check_pixels(im.width, im.height, im.format, budget)
+
+def _check_pixels(width, height, fmt, budget):
+    pixels = width * height
+    if IMAGE_MAX_PIXELS and pixels > IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(f"{fmt or 'image'} {width}x{height} is over the {IMAGE_MAX_PIXELS / 1e6:.0f} MP limit")
+    if budget is not None:
+        budget.charge(pixels)
+
+def _encode_for_sheet(im, target_size=None):
+    """
+    Downscales an image so it still covers target_size (the anchor box stretches
+    it anyway, so extra pixels are wasted) and encodes it for embedding:
+    JPEG for opaque images, PNG only where transparency is needed.
+    Resizing comes before the mode conversion, so only the small copy is converted.
+    """
+    if _has_alpha(im):
+        mode, fmt = "RGBA", "PNG"
+    else:
+        mode, fmt = ("L" if im.mode in ("1", "L", "I;16") else "RGB"), "JPEG"
+    if im.mode not in ("L", "RGB", "RGBA"):
+        # Palette, CMYK, 16-bit...: LANCZOS can't resample these directly
+        im = im.convert(mode)
+
+    if target_size:
+        new_size = _cover_size(im.size, target_size)
+        if new_size != im.size:
+            # reducing_gap: box-reduce by an integer factor first, then LANCZOS the rest
+            im = im.resize(new_size, Image.LANCZOS, reducing_gap=3.0)
+    if im.mode != mode:
+        im = im.convert(mode)
+
+    out = BytesIO()
+    if fmt == "JPEG":
+        im.save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+    else:
+        im.save(out, format="PNG")
+    return out.getvalue()
+
+def _is_svg(img_bytes, filename_hint=None):
     # Quick SVG sniff: filename endswith .svg or bytes contain '<svg'
-    if (isinstance(filename_hint, str) and filename_hint.lower().endswith(".svg")) or (b"<svg" in img_bytes[:200].lower()):
-        if not cairosvg:
-            raise RuntimeError("SVG input requires cairosvg (pip install cairosvg)")
-        return cairosvg.svg2png(bytestring=img_bytes)
+    return (isinstance(filename_hint, str) and filename_hint.lower().endswith(".svg")) or (b"<svg" in img_bytes[:200].lower())
+
+def _raster_cache_key(img_bytes, filename_hint, target_size):
+    """Content hash of the source plus everything that changes the encoded output."""
+    h = hashlib.sha256(img_bytes)
+    h.update(repr((
+        _RASTER_PIPELINE_VERSION,
+        _is_svg(img_bytes, filename_hint),
+        target_size,
+        IMAGE_JPEG_QUALITY,
+    )).encode())
+    return h.hexdigest()
+
+def rasterize_cached(img_bytes, filename_hint=None, target_size=None, budget=None):
+    """
+    _rasterize_image_bytes backed by the persistent on-disk cache, so the same
+    photo is only converted once across requests and worker processes.
+    """
+    if _raster_cache is None:
+        return _timed_rasterize(img_bytes, filename_hint, target_size, budget)
+
+    key = _raster_cache_key(img_bytes, filename_hint, target_size)
+    cached = _raster_cache.get(key)
+    if cached is not None:
+        return cached
+
+    out = _timed_rasterize(img_bytes, filename_hint, target_size, budget)
+    _raster_cache.put(key, out)
+    return out
+
+def _timed_rasterize(img_bytes, filename_hint, target_size, budget=None):
+    kind = "svg" if _is_svg(img_bytes, filename_hint) else "bitmap"
+    with RASTERIZE_SECONDS.time(kind=kind):
+        return _rasterize_image_bytes(img_bytes, filename_hint=filename_hint, target_size=target_size, budget=budget)
+
+def _rasterize_image_bytes(img_bytes, filename_hint=None, target_size=None, budget=None):
+    """
+    Convert image bytes to PNG/JPEG bytes suitable for openpyxl.
+    Supports: SVG (via cairosvg), WebP/BMP/TIFF/GIF (via Pillow), and fallback via imageio.
+    If target_size (w, h pixels) is given, the image is downscaled to that box
+    (SVGs are rendered at exactly that size, see svg.py).
+    Returns the encoded bytes or raises an exception on failure
+    (ImageTooLarge for photos over the pixel limits, see _limit_decode).
+    """
+    if _is_svg(img_bytes, filename_hint):
+        if target_size:
+            _check_pixels(target_size[0], target_size[1], "SVG", budget)
+        with Image.open(BytesIO(render_svg(img_bytes, target_size))) as im:
+            if not target_size:
+                _check_pixels(im.width, im.height, "SVG", budget)
+            return _encode_for_sheet(im, target_size)
 
     # Try Pillow first (handles webp if built with libwebp)
     try:
@@ -34,64 +235,194 @@ def _rasterize_image_bytes(img_bytes, filename_hint=None):
             # For animated formats like GIF, take first frame
             if getattr(im, "is_animated", False):
                 im.seek(0)
-            # Preserve transparency by converting to RGBA and save PNG
-            out = BytesIO()
-            im.convert("RGBA").save(out, format="PNG")
-            return out.getvalue()
+            _limit_decode(im, target_size, budget)
+            return _encode_for_sheet(im, target_size)
+    except Image.DecompressionBombError as e:
+        # Pillow's own check in Image.open (over twice Image.MAX_IMAGE_PIXELS)
+        raise ImageTooLarge(str(e)) from None
     except UnidentifiedImageError:
         # Try imageio fallback (helps for some exotic formats)
+        imageio = optional_codec("imageio")
         if imageio:
             try:
                 arr = imageio.imread(img_bytes)
-                out = BytesIO()
-                Image.fromarray(arr).convert("RGBA").save(out, format="PNG")
-                return out.getvalue()
             except Exception:
                 pass
+            else:
+                # Only known once decoded, but still keeps it out of the workbook and the budget
+                _check_pixels(arr.shape[1], arr.shape[0], "imageio", budget)
+                return _encode_for_sheet(Image.fromarray(arr), target_size)
         raise
 
+def _read_source_bytes(img_source, fetches=None):
+    """
+    Raw bytes for a data URI, an http(s) URL, a local path or a file-like
+    object (e.g. an uploaded multipart part, read straight from its spooled
+    file). URLs already being downloaded (fetches) are waited for.
+    Returns None if the source is not something we understand.
+    """
+    if is_remote(img_source):
+        future = fetches.get(img_source) if fetches else None
+        return future.result() if future is not None else fetcher.fetch(img_source)
+    elif isinstance(img_source, str) and img_source.startswith("data:image"):
+        header, b64data = img_source.split(",", 1)
+        return base64.b64decode(b64data)
+    elif isinstance(img_source, str) and os.path.exists(img_source):
+        with open(img_source, "rb") as f:
+            return f.read()
+    elif hasattr(img_source, "read"):
+        img_source.seek(0)
+        return img_source.read()
+    return None
+
+def _filename_hint(img_source):
+    # Paths, URLs and uploaded parts carry a file name (svg detection falls back to sniffing)
+    if is_remote(img_source):
+        return img_source.split("?", 1)[0]
+    if isinstance(img_source, str):
+        return img_source
+    return getattr(img_source, "filename", None)
+
+def _read_failed(e):
+    if isinstance(e, FetchError):
+        IMAGE_FAILURES.inc(reason="fetch")
+        logger.warning("could not download image: %s", e)
+    else:
+        IMAGE_FAILURES.inc(reason="read")
+        logger.warning("could not read image source: %s", e)
+
+def _rasterize_failed(e, raw_bytes):
+    if isinstance(e, ImageTooLarge):
+        IMAGE_FAILURES.inc(reason="too_large")
+        logger.warning("skipping image bytes=%d: %s", len(raw_bytes), e)
+    else:
+        IMAGE_FAILURES.inc(reason="rasterize")
+        logger.warning("could not rasterize image bytes=%d: %s", len(raw_bytes), e)
+
+def _prepare_source(img_source, target_size, budget=None, fetches=None):
+    """
+    Worker for the pre-pass: decode + rasterize one source.
+    Returns (raw_bytes, sheet_bytes); either may be None on failure.
+    """
+    try:
+        raw_bytes = _read_source_bytes(img_source, fetches)
+    except Exception as e:
+        _read_failed(e)
+        return None, None
+    if raw_bytes is None:
+        IMAGE_FAILURES.inc(reason="unsupported_source")
+        logger.warning("unsupported image source type=%s", type(img_source).__name__)
+        return None, None
+    try:
+        filename_hint = _filename_hint(img_source)
+        return raw_bytes, rasterize_cached(raw_bytes, filename_hint=filename_hint, target_size=target_size, budget=budget)
+    except Exception as e:
+        _rasterize_failed(e, raw_bytes)
+        return raw_bytes, None
+
+@timed_stage("images")
+def prepare_images(entries, image_cache, data_columns, max_workers=IMAGE_WORKERS):
+    """
+    Pre-pass for fill_reference_sheet: collects every image source used by the
+    entries and decodes/rasterizes them on a bounded thread pool (Pillow and
+    cairosvg release the GIL while working). Results land in image_cache under
+    the same keys process_and_insert_images uses, so the sheet loop only has
+    to anchor ready bytes. Output is identical to the sequential path.
+    http(s) photos are downloaded on the fetch pool (if start_fetches didn't
+    already start them) and each is decoded as soon as it has arrived.
+    """
+    target_size = target_pixel_size()
+    start_fetches(entries, image_cache, data_columns)
+
+    sources = []
+    seen = set()
+    for entry in entries:
+        for idx, img_source in enumerate(entry.get("images", [])):
+            if not img_source or idx >= len(data_columns):
+                continue
+            if (img_source, "raster", target_size) in image_cache or img_source in seen:
+                continue
+            seen.add(img_source)
+            sources.append(img_source)
+
+    if not sources:
+        return
+
+    budget = _request_budget(image_cache)
+    fetches = image_cache[_FETCH_KEY]
+    workers = max(1, min(max_workers, len(sources)))
+    if workers == 1:
+        results = [_prepare_source(src, target_size, budget, fetches) for src in sources]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                _prepare_source, sources,
+                [target_size] * len(sources), [budget] * len(sources), [fetches] * len(sources),
+            ))
+
+    for img_source, (raw_bytes, sheet_bytes) in zip(sources, results):
+        if raw_bytes is None:
+            continue
+        image_cache[img_source] = raw_bytes
+        # None marks a failed conversion so the sheet loop skips it without retrying
+        image_cache[(img_source, "raster", target_size)] = sheet_bytes
+
+def load_sheet_image(img_source, image_cache, target_size=None):
+    """
+    Embeddable (downscaled PNG/JPEG) bytes for one image source, or None if it
+    can't be read or converted. Raw and converted bytes are kept in image_cache.
+    """
+    if target_size is None:
+        target_size = target_pixel_size()
+
+    # 1. Get raw bytes into cache if needed
+    if img_source not in image_cache:
+        try:
+            raw_bytes = _read_source_bytes(img_source, image_cache.get(_FETCH_KEY))
+        except Exception as e:
+            _read_failed(e)
+            return None
+        if raw_bytes is None:
+            IMAGE_FAILURES.inc(reason="unsupported_source")
+            logger.warning("unsupported image source type=%s", type(img_source).__name__)
+            return None
+        image_cache[img_source] = raw_bytes
+
+    raw_bytes = image_cache[img_source]
+
+    # 2. Convert / rasterize + downscale to the anchor box (cache converted bytes to avoid reprocessing)
+    cache_key = (img_source, "raster", target_size)
+    if cache_key not in image_cache:
+        try:
+            filename_hint = _filename_hint(img_source)
+            image_cache[cache_key] = rasterize_cached(
+                raw_bytes, filename_hint=filename_hint, target_size=target_size,
+                budget=_request_budget(image_cache),
+            )
+        except Exception as e:
+            _rasterize_failed(e, raw_bytes)
+            # None marks a failed conversion so it is skipped without retrying
+            image_cache[cache_key] = None
+    return image_cache[cache_key]
+
 def process_and_insert_images(ws, entry, image_cache, image_row, data_columns):
     """
     Revised to work with both file paths (Node.js style) and streams.
     Note: 'files' argument removed, assuming image_cache or paths within 'entry'.
+    Images are downscaled to the anchor box at IMAGE_DPI before embedding.
     """
+    target_size = target_pixel_size()
+
     for idx, img_source in enumerate(entry.get("images", [])):
         if not img_source or idx >= len(data_columns):
             continue
 
-        # 1. Get raw bytes into cache if needed
-        if img_source not in image_cache:
-            try:
-                if isinstance(img_source, str) and img_source.startswith("data:image"):
-                    header, b64data = img_source.split(",", 1)
-                    image_cache[img_source] = base64.b64decode(b64data)
-                elif isinstance(img_source, str) and os.path.exists(img_source):
-                    with open(img_source, "rb") as f:
-                        image_cache[img_source] = f.read()
-                elif hasattr(img_source, "read"):
-                    img_source.seek(0)
-                    image_cache[img_source] = img_source.read()
-                else:
-                    continue
-            except Exception:
-                continue
-
-        raw_bytes = image_cache[img_source]
-
-        # 1.5 Convert / rasterize to PNG bytes (cache converted bytes to avoid reprocessing)
-        cache_key = (img_source, "raster")
-        if cache_key in image_cache:
-            png_bytes = image_cache[cache_key]
-        else:
-            try:
-                filename_hint = img_source if isinstance(img_source, str) else None
-                png_bytes = _rasterize_image_bytes(raw_bytes, filename_hint=filename_hint)
-                image_cache[cache_key] = png_bytes
-            except Exception:
-                # If conversion fails, skip this image
-                continue
+        img_bytes = load_sheet_image(img_source, image_cache, target_size)
+        if img_bytes is None:
+            # If conversion fails, skip this image
+            continue
 
-        img_data = BytesIO(png_bytes)
+        img_data = BytesIO(img_bytes)
         img = XLImage(img_data)
 
         # 2. Anchor Logic (Exactly your old working math)
@@ -101,9 +432,9 @@ def process_and_insert_images(ws, entry, image_cache, image_row, data_columns):
         _from = AnchorMarker(col=col_start, colOff=0, row=row_start, rowOff=0)
         _to = AnchorMarker(
             col=col_start,
-            colOff=int(4.93 * 914400),  # Your template width
+            colOff=int(IMAGE_WIDTH_IN * EMU_PER_INCH),  # Your template width
             row=row_start,
-            rowOff=int(3.7 * 914400)    # Your template height
+            rowOff=int(IMAGE_HEIGHT_IN * EMU_PER_INCH)  # Your template height
         )
 
         anchor = TwoCellAnchor(editAs='oneCell')
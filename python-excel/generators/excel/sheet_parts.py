@@ -0,0 +1,362 @@
+# generators/excel/sheet_parts.py
+"""
+Incremental regeneration.
+
+Each worksheet is fingerprinted by its own inputs (report fields for the
+report sheet, the reference list for the reference sheet). When a workbook
+is saved, the serialized parts of every freshly built sheet (sheet XML,
+drawing XML, media) are cached under that fingerprint. The next workbook
+whose sheet has the same fingerprint leaves that sheet unfilled and the
+writer splices the cached parts back in, so editing one line of
+activityToday no longer rebuilds and re-serializes every photo.
+
+Sheet XML refers to styles by their index in the workbook's cellXfs table,
+whose entries point into the font, fill, border, ... tables. Filling a sheet
+appends to the latter; the cellXfs entries are only added as the sheet is
+written, in document order. So the fingerprint also covers the style tables
+as they stand when the sheet would be filled, the parts keep what filling it
+appended and the cellXfs entry behind every index in the XML, and a hit
+replays both at the same points a fresh build would add them: the spliced
+workbook is byte-for-byte the one a fresh build saves.
+"""
+import hashlib
+import logging
+import pickle
+import re
+from zipfile import ZIP_STORED
+from openpyxl.drawing.spreadsheet_drawing import SpreadsheetDrawing
+from openpyxl.packaging.relationship import Relationship, RelationshipList, get_rels_path
+from openpyxl.worksheet._writer import WorksheetWriter
+from openpyxl.writer.excel import ExcelWriter
+from openpyxl.xml.functions import tostring
+from ..common.config import (
+    SHEET_PART_CACHE_DIR,
+    SHEET_PART_CACHE_MAX_BYTES,
+    IMAGE_DPI,
+    IMAGE_JPEG_QUALITY
+)
+from ..common.disk_cache import DiskCache
+from ..common.fingerprint import CODE_VERSION, fingerprint, inline_images_only
+from ..common.metrics import Counter, register_collector, simple_metric
+
+logger = logging.getLogger(__name__)
+
+_part_cache = DiskCache(SHEET_PART_CACHE_DIR, SHEET_PART_CACHE_MAX_BYTES) if SHEET_PART_CACHE_DIR else None
+
+SHEET_PART_LOOKUPS = Counter(
+    "sheet_part_lookups",
+    "Worksheets re-emitted from cached parts (hit) or built from scratch (miss).",
+    ("sheet", "result"),
+)
+
+# Payload fields that only the reference sheet reads; everything else is report input
+REFERENCE_FIELDS = ("reference", "table_title")
+
+# Media that is already compressed goes into the zip as-is
+_STORED_IMAGE_FORMATS = ("jpeg", "png", "gif")
+
+# The workbook's style tables (IndexedLists) that filling a sheet appends to
+_STYLE_TABLES = ("_fonts", "_fills", "_borders", "_number_formats", "_protections", "_alignments", "_cell_styles")
+
+# Style references inside sheet XML: <c s="..">, <row s="..">, <col style="..">
+_STYLE_ATTR = re.compile(rb'(<(?:c|row) [^>]*?\bs="|<col [^>]*?\bstyle=")(\d+)"')
+
+
+def report_inputs(data):
+    return {k: v for k, v in (data or {}).items() if k not in REFERENCE_FIELDS}
+
+
+def reference_inputs(data):
+    data = data or {}
+    return {k: data.get(k) for k in REFERENCE_FIELDS}
+
+
+class SheetParts:
+    """What one worksheet contributed to a saved xlsx."""
+
+    def __init__(self, xml, styles, added_styles, rels, drawing_xml, images, print_rows, print_cols, print_area):
+        self.xml = xml                    # sheet XML as written
+        self.styles = styles              # {xf index used in xml: its cellXfs entry (StyleArray)}
+        self.added_styles = added_styles  # {style table: entries filling the sheet appended to it}
+        self.rels = rels                  # [(Type, Id, Target)] of the sheet's relationships
+        self.drawing_xml = drawing_xml    # None if the sheet had no images
+        self.images = images              # [(format, bytes)] in drawing relationship order
+        self.print_rows = print_rows      # workbook-level defined names that belong to the sheet
+        self.print_cols = print_cols
+        self.print_area = print_area
+
+
+def _style_sizes(wb):
+    return {name: len(getattr(wb, name)) for name in _STYLE_TABLES}
+
+
+def _style_state(wb):
+    """Digest of wb's style tables, i.e. of what the style indexes in sheet XML mean."""
+    h = hashlib.sha256()
+    for name in _STYLE_TABLES:
+        for entry in getattr(wb, name):
+            h.update(repr(entry).encode())
+            h.update(b"\0")
+        h.update(b"\1")
+    return h.hexdigest()
+
+
+def _used_styles(wb, xml):
+    """{index: cellXfs entry} for every style index the sheet XML refers to."""
+    return {
+        index: wb._cell_styles[index]
+        for index in {int(m.group(2)) for m in _STYLE_ATTR.finditer(xml)}
+    }
+
+
+def _remap_styles(wb, xml, styles):
+    """
+    Rewrites the sheet XML's style indexes for wb, adding the cellXfs entries
+    in document order as openpyxl's WorksheetWriter does.
+    """
+    def replace(match):
+        index = wb._cell_styles.add(styles[int(match.group(2))])
+        return match.group(1) + str(index).encode() + b'"'
+
+    return _STYLE_ATTR.sub(replace, xml)
+
+
+def _capturable(ws):
+    # Only what the daily report produces: cells, merges, images, page setup
+    return not (ws._charts or ws._comments or ws._tables or ws._pivots or ws.legacy_drawing)
+
+
+def reuse_sheet(ws, mode, inputs, template_version):
+    """
+    Looks up cached parts for ws by fingerprint of (mode, sheet, template,
+    generator code, style tables so far, inputs).
+    Hit: returns True, the workbook's style tables get what filling ws would
+    have added, and ws is re-emitted from the parts when the workbook is
+    saved, so the caller must leave it unfilled.
+    Miss: returns False and the parts are captured when the workbook is saved.
+    Call it right before ws would be filled, one sheet after the other.
+    """
+    if _part_cache is None or not inline_images_only((inputs or {}).get("reference")):
+        return False
+    wb = ws.parent
+    try:
+        key = fingerprint(
+            [mode, ws.title, template_version, CODE_VERSION, IMAGE_DPI, IMAGE_JPEG_QUALITY, _style_state(wb)],
+            inputs,
+        )
+    except (TypeError, ValueError):
+        return False
+
+    parts = None
+    cached = _part_cache.get(key)
+    if cached is not None:
+        try:
+            parts = pickle.loads(cached)
+        except Exception:
+            logger.warning("discarding unreadable sheet parts key=%s", key)
+
+    if getattr(wb, "_sheet_parts", None) is None:
+        wb._sheet_parts = {}
+    # Whatever the tables gain from here until the next sheet is planned (or
+    # the workbook saved) is what filling ws added; see PartCachingExcelWriter
+    wb._sheet_parts[ws.title] = (key, parts, _style_sizes(wb))
+    if parts is not None:
+        for name, entries in parts.added_styles.items():
+            table = getattr(wb, name)
+            for entry in entries:
+                table.add(entry)
+    SHEET_PART_LOOKUPS.inc(sheet=ws.title, result="hit" if parts is not None else "miss")
+    return parts is not None
+
+
+class PlannedWorkbook:
+    """
+    A workbook whose reused sheets are still unfilled: it is only complete
+    once writer.save_workbook() splices them in, so that is all it offers.
+    """
+
+    __slots__ = ("_workbook",)
+
+    def __init__(self, workbook):
+        self._workbook = workbook
+
+
+class _CachedImage:
+    """Stands in for openpyxl's Image when re-emitting cached media."""
+
+    _id = 1
+    _path = "/xl/media/image{0}.{1}"
+
+    def __init__(self, fmt, data):
+        self.format = fmt
+        self.data = data
+
+    def _data(self):
+        return self.data
+
+    @property
+    def path(self):
+        return self._path.format(self._id, self.format)
+
+
+class _CachedDrawing(SpreadsheetDrawing):
+    """A drawing whose XML is already serialized (image rIds are local to it)."""
+
+    def __init__(self, xml, images):
+        super().__init__()
+        self.xml = xml
+        self.images = images
+
+
+class PartCachingExcelWriter(ExcelWriter):
+    """
+    ExcelWriter that re-emits worksheets planned by reuse_sheet() from their
+    cached parts and captures the parts of the ones it serializes itself.
+    Identical images share one media part.
+    """
+
+    def __init__(self, workbook, archive):
+        super().__init__(workbook, archive)
+        self._plan = getattr(workbook, "_sheet_parts", None) or {}
+        # What each planned sheet's fill appended to the style tables
+        self._added_styles = {}
+        end = _style_sizes(workbook)
+        for title, (_, _, sizes) in reversed(list(self._plan.items())):
+            self._added_styles[title] = {
+                name: list(getattr(workbook, name)[sizes[name]:end[name]])
+                for name in _STYLE_TABLES if end[name] > sizes[name]
+            }
+            end = sizes
+        self._captures = []
+        self._current = None
+        # (format, sha256) -> media part number, and the bytes of each part
+        self._media_ids = {}
+        self._media = []
+
+    def write_worksheet(self, ws):
+        key, parts, _ = self._plan.get(ws.title, (None, None, None))
+        self._current = None
+        if parts is not None:
+            self._emit_cached(ws, parts)
+            return
+        if key is None or not _capturable(ws):
+            super().write_worksheet(ws)
+            return
+
+        # ExcelWriter.write_worksheet, keeping the XML for the cache
+        ws._drawing = SpreadsheetDrawing()
+        ws._drawing.charts = ws._charts
+        ws._drawing.images = ws._images
+        writer = WorksheetWriter(ws)
+        writer.write()
+        ws._rels = writer._rels
+        with open(writer.out, "rb") as f:
+            xml = f.read()
+        self._archive.writestr(ws.path[1:], xml)
+        self.manifest.append(ws)
+        writer.cleanup()
+
+        self._current = {"ws": ws, "key": key, "xml": xml, "drawing_xml": None, "images": []}
+        self._captures.append(self._current)
+
+    def _emit_cached(self, ws, parts):
+        self._archive.writestr(ws.path[1:], _remap_styles(self.workbook, parts.xml, parts.styles))
+        self.manifest.append(ws)
+
+        rels = RelationshipList()
+        for rel_type, rel_id, target in parts.rels:
+            rels.append(Relationship(Id=rel_id, Type=rel_type, Target=target))
+        ws._rels = rels
+
+        if parts.drawing_xml is not None:
+            ws._drawing = _CachedDrawing(parts.drawing_xml, [_CachedImage(fmt, data) for fmt, data in parts.images])
+        else:
+            ws._drawing = SpreadsheetDrawing()
+        ws._print_rows = parts.print_rows
+        ws._print_cols = parts.print_cols
+        ws._print_area = parts.print_area
+
+    def _write_drawing(self, drawing):
+        # ExcelWriter._write_drawing, with the XML either cached or kept for the
+        # cache, and every image filed under its content hash (see _add_media)
+        capture = self._current
+        if capture is not None and capture["ws"]._drawing is not drawing:
+            capture = None
+
+        self._drawings.append(drawing)
+        drawing._id = len(self._drawings)
+        for chart in drawing.charts:
+            self._charts.append(chart)
+            chart._id = len(self._charts)
+        images = []
+        for img in drawing.images:
+            # openpyxl's Image can only hand out its data once
+            data = img._data()
+            self._add_media(img, data)
+            images.append((img.format, data))
+
+        if isinstance(drawing, _CachedDrawing):
+            xml = drawing.xml
+            for img in drawing.images:
+                drawing._rels.append(Relationship(type="image", Target=img.path))
+        else:
+            xml = tostring(drawing._write())
+            if capture is not None:
+                capture["drawing_xml"] = xml
+                capture["images"] = images
+
+        self._archive.writestr(drawing.path[1:], xml)
+        self._archive.writestr(get_rels_path(drawing.path)[1:], tostring(drawing._write_rels()))
+        self.manifest.append(drawing)
+
+    def _add_media(self, img, data):
+        """
+        Points img at the media part holding data, adding one only for bytes
+        not seen yet in this workbook: a photo used in several entries, sections
+        or both sheets is stored once and every drawing refers to that part.
+        """
+        key = (img.format, hashlib.sha256(data).digest())
+        media_id = self._media_ids.get(key)
+        if media_id is None:
+            self._images.append(img)
+            media_id = self._media_ids[key] = len(self._images)
+            self._media.append(data)
+        img._id = media_id
+
+    def _write_images(self):
+        for img, data in zip(self._images, self._media):
+            compress_type = ZIP_STORED if img.format in _STORED_IMAGE_FORMATS else None
+            self._archive.writestr(img.path[1:], data, compress_type=compress_type)
+
+    def save(self):
+        super().save()
+        for capture in self._captures:
+            self._store(capture)
+
+    def _store(self, capture):
+        ws = capture["ws"]
+        parts = SheetParts(
+            xml=capture["xml"],
+            styles=_used_styles(self.workbook, capture["xml"]),
+            added_styles=self._added_styles[ws.title],
+            rels=[(rel.Type, rel.Id, rel.Target) for rel in ws._rels],
+            drawing_xml=capture["drawing_xml"],
+            images=capture["images"],
+            print_rows=ws._print_rows,
+            print_cols=ws._print_cols,
+            print_area=ws._print_area,
+        )
+        _part_cache.put(capture["key"], pickle.dumps(parts, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _sheet_part_metrics():
+    if _part_cache is None:
+        return []
+    return simple_metric(
+        "sheet_part_cache_events", "counter",
+        "On-disk sheet part cache lookups and maintenance.",
+        [({"event": event}, count) for event, count in _part_cache.stats().items()],
+    )
+
+
+register_collector(_sheet_part_metrics)
@@ -1,4 +1,4 @@
-from ...excel.templates import copy_row, copy_merged_cells
+from ...excel.templates import copy_row, copy_merged_cells, compile_row, compile_merge_plan
 from ...common.helpers import write_to_merged_safe
 from openpyxl.styles import Alignment
 from ...common.config import (
@@ -8,20 +8,24 @@ from ...common.config import (
     DATA_COLUMNS, 
     FOOTER_COLUMNS
 )
-from ..images import process_and_insert_images
+from ..images import process_and_insert_images, prepare_images
 from openpyxl.worksheet.pagebreak import Break
+from ...common.metrics import timed_stage
 
-def prepare_entry_block(ws, current_row, template_start, template_end):
+def prepare_entry_block(ws, current_row, template_start, template_end, compiled_rows=None, merge_plan=None):
     """
     Clones the template structure into the new location and 
     forces the row height specifically for image fitting.
+    compiled_rows: {template_row: compile_row(...)} so styles are stamped by ID.
+    merge_plan: compile_merge_plan(...) of the block, captured before the sheet grew.
     """
     # Only clone if we aren't currently sitting on the template row itself
     if current_row != template_start:
         offset = current_row - template_start
         for r in range(template_start, template_end + 1):
-            copy_row(ws, r, current_row + (r - template_start))
-        copy_merged_cells(ws, template_start, template_end, offset)
+            compiled = compiled_rows.get(r) if compiled_rows else None
+            copy_row(ws, r, current_row + (r - template_start), compiled)
+        copy_merged_cells(ws, template_start, template_end, offset, merge_plan)
     
     # Force the Image Row (usually current_row + 1) to be large enough for photos
     # 3.7 inches * 72 points/inch = ~267 points
@@ -38,7 +42,13 @@ def write_footers(ws, row, entry, footer_columns):
             # Using the common helper to ensure we don't break merged cells
             write_to_merged_safe(ws, row, footer_columns[idx], text)
 
-def fill_reference_sheet(ws, reference_entries, table_title="PHOTO REFERENCE"):
+@timed_stage("fill_reference_sheet")
+def fill_reference_sheet(ws, reference_entries, table_title="PHOTO REFERENCE", progress=None, image_cache=None):
+    """
+    Fills the reference sheet, 4 entries per printed page.
+    progress: optional callback(stage, done, total), called after every entry.
+    image_cache: per-request photo cache, e.g. with downloads already started.
+    """
 
     # """Fill the reference sheet with reference sections"""
     
@@ -90,10 +100,27 @@ def fill_reference_sheet(ws, reference_entries, table_title="PHOTO REFERENCE"):
 
     current_row = ENTRY_BLOCK_START # Row 6
     last_section = None
-    image_cache = {}
+    if image_cache is None:
+        image_cache = {}
     entries_on_current_page = 0 
 
-    for entry in reference_entries:
+    # Decode/rasterize every photo up front on a thread pool;
+    # the loop below then only anchors ready bytes from image_cache.
+    prepare_images(reference_entries, image_cache, DATA_COLUMNS)
+
+    # Compile the section-title row and the entry block once; every clone
+    # below just stamps their style IDs onto the new rows.
+    compiled_rows = {r: compile_row(ws, r) for r in range(5, ENTRY_BLOCK_END + 1)}
+    # Same for the merges: offsetting these fixed plans keeps the per-entry
+    # cost constant however many merges the sheet has accumulated.
+    title_merge_plan = compile_merge_plan(ws, 5, 5)
+    entry_merge_plan = compile_merge_plan(ws, ENTRY_BLOCK_START, ENTRY_BLOCK_END)
+
+    total_entries = len(reference_entries)
+    if progress:
+        progress("reference", 0, total_entries)
+
+    for entry_number, entry in enumerate(reference_entries, 1):
         current_section = entry.get("section_title")
 
         # --- CHANGE 1: SECTION HEADER LOGIC ---
@@ -104,8 +131,8 @@ def fill_reference_sheet(ws, reference_entries, table_title="PHOTO REFERENCE"):
                 entries_on_current_page = 0 
 
             if last_section is not None:
-                copy_row(ws, 5, current_row)
-                copy_merged_cells(ws, 5, 5, current_row - 5)
+                copy_row(ws, 5, current_row, compiled_rows[5])
+                copy_merged_cells(ws, 5, 5, current_row - 5, title_merge_plan)
                 write_to_merged_safe(ws, current_row, 2, current_section)
                 current_row += 1 
             else:
@@ -121,13 +148,16 @@ def fill_reference_sheet(ws, reference_entries, table_title="PHOTO REFERENCE"):
             entries_on_current_page = 0
 
         # 4. IMAGE BLOCK LOGIC (Remains the same)
-        prepare_entry_block(ws, current_row, ENTRY_BLOCK_START, ENTRY_BLOCK_END)
+        prepare_entry_block(ws, current_row, ENTRY_BLOCK_START, ENTRY_BLOCK_END, compiled_rows, entry_merge_plan)
         process_and_insert_images(ws, entry, image_cache, current_row + 1, DATA_COLUMNS)
         write_footers(ws, current_row + 3, entry, FOOTER_COLUMNS)
         
         current_row += ENTRY_HEIGHT
         entries_on_current_page += 1 
 
+        if progress:
+            progress("reference", entry_number, total_entries)
+
     # Final Setup
     ws.print_title_rows = '1:4'
     ws.page_setup.fitToWidth = 1
@@ -0,0 +1,86 @@
+# generators/excel/sheets/report_layout.py
+from ...common.merges import get_merged_index
+
+# Rows of the REPORT sheet in template.xlsx
+TEAM_START = 25          # first Site Management / Working Team row
+TEAM_TOTAL = 31          # team TOTAL row
+MATERIAL_HEADER = 32     # "Materials Deliveries" / "Machinery & Equipment"
+MATERIAL_START = 34      # first materials / machinery row
+FOOTER = 75              # colored bar closing the page
+TABLE_ROWS = 6           # data rows each table has in the template
+
+
+class ReportLayout:
+    """
+    Final row of every block on the report sheet, worked out from the table
+    lengths in the payload before a single cell is written. A table longer
+    than the template's 6 rows pushes everything below it down.
+    """
+
+    def __init__(self, team_rows=0, material_rows=0):
+        self.team_start = TEAM_START
+        self.team_rows = max(TABLE_ROWS, team_rows)
+        self.team_shift = self.team_rows - TABLE_ROWS
+        self.team_total = self.team_start + self.team_rows
+
+        self.material_header = MATERIAL_HEADER + self.team_shift
+        self.material_sub_header = self.material_header + 1
+        self.material_start = MATERIAL_START + self.team_shift
+        self.material_rows = max(TABLE_ROWS, material_rows)
+        self.material_growth = self.material_rows - TABLE_ROWS
+
+        self.footer = FOOTER + self.team_shift + self.material_growth
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(
+            team_rows=max(len(data.get('managementTeam') or []), len(data.get('workingTeam') or [])),
+            material_rows=max(len(data.get('materials') or []), len(data.get('machinery') or [])),
+        )
+
+    def target_row(self, template_row):
+        """Where a template row ends up."""
+        if template_row >= MATERIAL_START + TABLE_ROWS:
+            return template_row + self.team_shift + self.material_growth
+        if template_row >= TEAM_TOTAL:
+            return template_row + self.team_shift
+        return template_row
+
+
+def place_template_rows(ws, layout):
+    """
+    Moves every template row below a growing table straight to its planned
+    row: cells (values + styles), row heights, merges and manual page breaks.
+    Each row is moved once, and the rows the tables grow into are left empty
+    for fill_team_tables / fill_material_machinery_tables to write.
+    (ws.insert_rows moved all cells below once per table and left merges,
+    heights and breaks behind at their old rows.)
+    """
+    if not layout.team_shift and not layout.material_growth:
+        return
+    first = TEAM_TOTAL if layout.team_shift else MATERIAL_START + TABLE_ROWS
+
+    # 1. Cells (MergedCell placeholders included)
+    moved = [ws._cells.pop(key) for key in [key for key in ws._cells if key[0] >= first]]
+    for cell in moved:
+        cell.row = layout.target_row(cell.row)
+        ws._cells[(cell.row, cell.column)] = cell
+
+    # 2. Row heights and formats
+    dims = [(row, ws.row_dimensions.pop(row)) for row in [row for row in ws.row_dimensions if row >= first]]
+    for row, dim in dims:
+        dim.index = layout.target_row(row)
+        ws.row_dimensions[dim.index] = dim
+
+    # 3. Merges (none of the template's cross the tables' last rows)
+    merged_index = get_merged_index(ws)
+    for merged in merged_index.starting_in(first):
+        ws.merged_cells.ranges.remove(merged)
+        merged.shift(row_shift=layout.target_row(merged.min_row) - merged.min_row)
+        ws.merged_cells.ranges.add(merged)
+    merged_index.rebuild()
+
+    # 4. Manual page breaks (the one above the footer)
+    for brk in ws.row_breaks.brk:
+        if brk.id >= first:
+            brk.id = layout.target_row(brk.id)
@@ -0,0 +1,122 @@
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+from ...common.rollup import TABLES
+from ...common.metrics import timed_stage
+
+# Same colours and number format as the daily report's tables
+HEADER_FILL = PatternFill(start_color="657C9C", end_color="657C9C", fill_type="solid")
+TOTAL_FILL = PatternFill(start_color="DDE3EC", end_color="DDE3EC", fill_type="solid")
+DASH_FORMAT = '#,##0;(#,##0);"-"'
+AVERAGE_FORMAT = '#,##0.0;(#,##0.0);"-"'
+DATE_FORMAT = "dd/mm/yyyy"
+
+HEADER_ROW = 4
+_TABLE_LABELS = dict(TABLES)
+_PERIOD_HEADER = {"day": "%a %d/%m", "week": "Wk %d/%m", "month": "%b %Y"}
+
+
+def _styled(ws, font, fill=None, alignment=None, number_format=None):
+    cell = WriteOnlyCell(ws)
+    cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if alignment is not None:
+        cell.alignment = alignment
+    if number_format is not None:
+        cell.number_format = number_format
+    return cell
+
+
+class _RowCells:
+    """
+    One styled cell per column, refilled for every row. A write-only sheet
+    serializes each row as soon as it is appended, so the cells (and their
+    shared style IDs) can be reused instead of styling ~10^5 new ones.
+    """
+
+    def __init__(self, ws, formats, bold):
+        font = Font(name="Arial", size=10, bold=bold)
+        fill = TOTAL_FILL if bold else None
+        left = Alignment(horizontal="left", vertical="center")
+        center = Alignment(horizontal="center", vertical="center")
+        self.cells = [
+            _styled(ws, font, fill, left if fmt is None else center, fmt)
+            for fmt in formats
+        ]
+
+    def row(self, values):
+        for cell, value in zip(self.cells, values):
+            cell.value = value
+        return self.cells
+
+
+def _header(ws, labels):
+    font = Font(name="Arial", size=10, bold=True, color="FFFFFF")
+    alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    row = []
+    for label in labels:
+        cell = _styled(ws, font, HEADER_FILL, alignment)
+        cell.value = label
+        row.append(cell)
+    return row
+
+
+@timed_stage("fill_rollup_sheet")
+def fill_rollup_sheet(ws, rollup, title="ROLLUP SUMMARY"):
+    """
+    Writes a Rollup (common/rollup.py) to a write-only worksheet: one row
+    per item with its opening figure, one column per day/week/month, then
+    the period total, accumulated figure, daily average, peak and the day
+    of the peak. Team tables end with a TOTAL row per project.
+    """
+    period_labels = [start.strftime(_PERIOD_HEADER[rollup.granularity]) for start in rollup.periods]
+    labels = ["Project", "Table", "Description", "Unit", "Opening", *period_labels,
+              "Period Total", "Accumulated", "Daily Avg", "Peak", "Peak Day", "Days"]
+    formats = [None, None, None, None, DASH_FORMAT, *[DASH_FORMAT] * len(period_labels),
+               DASH_FORMAT, DASH_FORMAT, AVERAGE_FORMAT, DASH_FORMAT, DATE_FORMAT, "0"]
+
+    # Column widths and frozen panes have to be set before the first row
+    for col, width in enumerate((26, 22, 36, 10, 12), 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+    for col in range(6, len(labels) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 12
+    ws.freeze_panes = f"F{HEADER_ROW + 1}"
+    ws.print_title_rows = f"{HEADER_ROW}:{HEADER_ROW}"
+
+    title_cell = _styled(ws, Font(name="Arial", size=14, bold=True))
+    title_cell.value = title
+    if rollup.first_day:
+        period = (f"Period: {rollup.first_day:%d/%m/%Y} - {rollup.last_day:%d/%m/%Y}  |  "
+                  f"{rollup.reports} daily reports  |  {rollup.projects} projects")
+    else:
+        period = "No dated daily reports"
+    if rollup.skipped:
+        period += f"  |  {rollup.skipped} without a reportDate skipped"
+    ws.append([title_cell])
+    ws.append([period])
+    ws.append([])
+    ws.append(_header(ws, labels))
+
+    plain = _RowCells(ws, formats, bold=False)
+    total = _RowCells(ws, formats, bold=True)
+
+    # Whole columns to Python lists at once (per-element access on arrays is slow)
+    per_period = rollup.per_period.tolist()
+    columns = zip(
+        rollup.opening.tolist(),
+        rollup.period_total.tolist(),
+        rollup.accumulated.tolist(),
+        rollup.average.tolist(),
+        rollup.peak.tolist(),
+        rollup.peak_day,
+        rollup.days_reported.tolist(),
+    )
+    for item, periods, (opening, period_total, accumulated, average, peak, peak_day, days) in zip(
+        rollup.items, per_period, columns
+    ):
+        cells = total if item.is_total else plain
+        ws.append(cells.row((
+            item.project, _TABLE_LABELS[item.table], item.description, item.unit, opening,
+            *periods, period_total, accumulated, average, peak, peak_day, days,
+        )))
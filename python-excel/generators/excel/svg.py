@@ -0,0 +1,127 @@
+# generators/excel/svg.py
+"""
+SVG photos, rasterized by cairosvg straight at the pixel size of the photo
+box (IMAGE_DPI): icons come out sharp and big drawings never exist as a
+full-size bitmap. The drawing's own preserveAspectRatio places it in the box.
+
+Parsing (XML + CSS cascade into cairosvg's node tree) is most of the work
+for big plans, so parsed trees are kept in a small in-process LRU keyed by
+content hash. cairosvg edits the tree while drawing (<use>, patterns,
+masks...), so each node's state is snapshotted after parsing and put back
+before the tree is drawn again.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from ..common.config import SVG_TREE_CACHE_SIZE
+from ..common.metrics import Counter
+from ..common.optional_codecs import optional_codec
+
+# cairosvg's own default user-unit resolution
+_CSS_DPI = 96
+
+SVG_TREE_LOOKUPS = Counter(
+    "svg_tree_lookups",
+    "Parsed SVG trees reused from the in-process cache (hit) or parsed (miss).",
+    ("result",),
+)
+
+
+def _cairosvg():
+    cairosvg = optional_codec("cairosvg")
+    if not cairosvg:
+        raise RuntimeError("SVG input requires cairosvg (pip install cairosvg)")
+    return cairosvg
+
+
+class _ParsedSvg:
+    """A parsed tree plus what every node looked like right after parsing."""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.lock = threading.Lock()
+        self._pristine = []
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            self._pristine.append((node, dict(node), dict(vars(node)), list(node.children)))
+            stack.extend(node.children)
+
+    def restore(self):
+        for node, attrs, state, children in self._pristine:
+            node.clear()
+            node.update(attrs)
+            fields = vars(node)
+            fields.clear()
+            fields.update(state)
+            node.children = list(children)
+
+
+class _TreeCache:
+    """LRU of parsed trees; a tree is drawn by one thread at a time."""
+
+    def __init__(self, size=SVG_TREE_CACHE_SIZE):
+        self.size = size
+        self._trees = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            parsed = self._trees.get(key)
+            if parsed is not None:
+                self._trees.move_to_end(key)
+            return parsed
+
+    def put(self, key, parsed):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._trees[key] = parsed
+            self._trees.move_to_end(key)
+            while len(self._trees) > self.size:
+                self._trees.popitem(last=False)
+
+
+_trees = _TreeCache()
+
+
+def _parse(cairosvg, svg_bytes):
+    # Same safety as cairosvg.svg2png: no external files, no XML entities
+    return cairosvg.parser.Tree(bytestring=svg_bytes)
+
+
+def _draw(cairosvg, tree, size):
+    out = BytesIO()
+    width, height = size if size else (None, None)
+    surface = cairosvg.surface.PNGSurface(tree, out, _CSS_DPI, output_width=width, output_height=height)
+    surface.finish()
+    return out.getvalue()
+
+
+def render_svg(svg_bytes, size=None):
+    """
+    PNG bytes of the drawing rendered at exactly size (w, h pixels), or at its
+    intrinsic size if size is None. Raises RuntimeError without cairosvg.
+    """
+    cairosvg = _cairosvg()
+    key = hashlib.sha256(svg_bytes).digest()
+
+    parsed = _trees.get(key)
+    if parsed is not None and parsed.lock.acquire(blocking=False):
+        SVG_TREE_LOOKUPS.inc(result="hit")
+        try:
+            parsed.restore()
+            return _draw(cairosvg, parsed.tree, size)
+        finally:
+            parsed.lock.release()
+
+    # Not cached, or being drawn by another thread right now: parse a copy
+    SVG_TREE_LOOKUPS.inc(result="miss")
+    tree = _parse(cairosvg, svg_bytes)
+    if parsed is None:
+        parsed = _ParsedSvg(tree)
+        with parsed.lock:
+            _trees.put(key, parsed)
+            return _draw(cairosvg, tree, size)
+    return _draw(cairosvg, tree, size)
@@ -0,0 +1,100 @@
+# generators/excel/template_cache.py
+import hashlib
+import os
+import pickle
+import threading
+from openpyxl import load_workbook
+from ..common.metrics import Counter
+
+# One parsed snapshot per template path, shared by every request in this process.
+# path -> _TemplateSnapshot
+_snapshots = {}
+_lock = threading.Lock()
+
+TEMPLATE_LOOKUPS = Counter(
+    "template_cache_lookups",
+    "Template loads served from the parsed snapshot (hit) or by parsing the xlsx (miss).",
+    ("result",),
+)
+
+
+class _TemplateSnapshot:
+    """
+    A template parsed once and kept as pickled bytes.
+    Unpickling is a structural clone of the object model, which is
+    an order of magnitude cheaper than re-parsing the xlsx XML.
+    """
+
+    def __init__(self, path, stamp):
+        self.path = path
+        self.stamp = stamp
+        with open(path, "rb") as f:
+            self.version = hashlib.sha256(f.read()).hexdigest()
+        wb = load_workbook(path)
+        self.payload = pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def clone(self):
+        wb = pickle.loads(self.payload)
+        _rebind_dimensions(wb)
+        return wb
+
+
+def _rebind_dimensions(wb):
+    """
+    openpyxl's DimensionHolder is a defaultdict subclass and pickle drops its
+    worksheet back-reference and default_factory. Without this, touching a
+    new row_dimensions[...] key raises KeyError instead of creating the row.
+    """
+    for ws in wb.worksheets:
+        ws.row_dimensions.worksheet = ws
+        ws.row_dimensions.default_factory = ws._add_row
+        ws.column_dimensions.worksheet = ws
+        ws.column_dimensions.default_factory = ws._add_column
+
+
+def _file_stamp(path):
+    # mtime + size so a template swapped in place (same second) is still noticed
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _get_snapshot(path, count=True):
+    path = os.path.abspath(path)
+    stamp = _file_stamp(path)
+
+    snapshot = _snapshots.get(path)
+    if snapshot is not None and snapshot.stamp == stamp:
+        if count:
+            TEMPLATE_LOOKUPS.inc(result="hit")
+        return snapshot
+
+    with _lock:
+        # Another thread may have reloaded it while we waited
+        snapshot = _snapshots.get(path)
+        if snapshot is None or snapshot.stamp != stamp:
+            snapshot = _TemplateSnapshot(path, stamp)
+            _snapshots[path] = snapshot
+            TEMPLATE_LOOKUPS.inc(result="miss")
+        elif count:
+            TEMPLATE_LOOKUPS.inc(result="hit")
+        return snapshot
+
+
+def load_template(path):
+    """
+    Returns a private, writable copy of the template workbook.
+    The file is only parsed again when its mtime/size changes on disk,
+    so ops can swap templates without restarting the service.
+    """
+    return _get_snapshot(path).clone()
+
+
+def template_version(path):
+    """Content hash of the template currently in use (changes when the file does)."""
+    return _get_snapshot(path, count=False).version
+
+
+def clear_template_cache():
+    """Drops every cached template (next request re-parses from disk)."""
+    with _lock:
+        _snapshots.clear()
@@ -1,59 +1,105 @@
-from copy import copy
 from openpyxl.styles import PatternFill
 from openpyxl.cell.cell import MergedCell 
+from openpyxl.styles.cell_style import StyleArray
+from ..common.merges import get_merged_index
 
-def copy_row(ws, src_row, tgt_row):
-    ws.row_dimensions[tgt_row].height = ws.row_dimensions[src_row].height
+# Positions in openpyxl's StyleArray that copy_row/copy_cell_style carry over:
+# fontId, fillId, borderId, numFmtId, protectionId, alignmentId.
+# (pivotButton, quotePrefix and xfId are left alone, same as copying the objects)
+_STYLE_IDS = slice(0, 6)
+_CELL_STYLE_IDS = ("fontId", "fillId", "borderId", "numFmtId", "alignmentId")
+
+
+def _style_array(cell):
+    # openpyxl creates a cell's StyleArray lazily on the first style assignment
+    if cell._style is None:
+        cell._style = StyleArray()
+    return cell._style
+
+
+def compile_row(ws, src_row):
+    """
+    Compiles a template row into a per-column descriptor:
+    [(col, src_cell, style_ids or None), ...] where style_ids are the row's
+    shared style indices in the workbook. Stamping those IDs onto a target
+    cell gives the same result as assigning copies of font/border/fill/...
+    without allocating or re-hashing a single style object.
+    """
+    compiled = []
     for col in range(1, ws.max_column + 1):
         src_cell = ws.cell(row=src_row, column=col)
+        style_ids = src_cell._style[_STYLE_IDS] if src_cell.has_style else None
+        compiled.append((col, src_cell, style_ids))
+    return compiled
+
+
+def copy_row(ws, src_row, tgt_row, compiled=None):
+    """
+    Clones a row (height, values, styles). Pass compile_row(ws, src_row) as
+    `compiled` when the same template row is cloned many times.
+    """
+    if compiled is None:
+        compiled = compile_row(ws, src_row)
+
+    ws.row_dimensions[tgt_row].height = ws.row_dimensions[src_row].height
+    for col, src_cell, style_ids in compiled:
         tgt_cell = ws.cell(row=tgt_row, column=col)
 
         # THIS IS THE FIX: Prevents the "Read-only" crash
         if not isinstance(tgt_cell, MergedCell):
             tgt_cell.value = src_cell.value
         
-        if src_cell.has_style:
-            tgt_cell.font = copy(src_cell.font)
-            tgt_cell.border = copy(src_cell.border)
-            tgt_cell.fill = copy(src_cell.fill)
-            tgt_cell.alignment = copy(src_cell.alignment)
-            tgt_cell.number_format = copy(src_cell.number_format)
-            tgt_cell.protection = copy(src_cell.protection)
+        if style_ids is not None:
+            _style_array(tgt_cell)[_STYLE_IDS] = style_ids
+
+
+def compile_merge_plan(ws, src_start, src_end):
+    """
+    Captures the merges that start in template rows src_start..src_end as
+    (first_row_offset, min_col, last_row_offset, max_col), relative to src_start.
+    Taken once before the sheet grows, so cloning a block later costs the
+    same no matter how many merges the sheet already has.
+    """
+    plan = []
+    for merged in get_merged_index(ws).starting_in(src_start, src_end):
+        plan.append((merged.min_row - src_start, merged.min_col, merged.max_row - src_start, merged.max_col))
+    return plan
 
 
-def copy_merged_cells(ws, src_start, src_end, offset):
+def copy_merged_cells(ws, src_start, src_end, offset, plan=None):
     """
     Copies merged cell structures and clears ghost values 
     in the target range to ensure a clean merge.
+    Pass compile_merge_plan(ws, src_start, src_end) as `plan` when the
+    same template block is cloned many times.
     """
-    # Use a list to avoid issues while iterating
-    merged_ranges = list(ws.merged_cells.ranges)
-    
-    for merged in merged_ranges:
-        # If the merge is within our template rows (6-9)
-        if src_start <= merged.min_row <= src_end:
-            new_min_row = merged.min_row + offset
-            new_max_row = merged.max_row + offset
-            
-            # 1. CLEAR GHOST VALUES: Clear cells B and D before merging
-            # This prevents the "first entry text" from appearing in the second entry
-            for r in range(new_min_row, new_max_row + 1):
-                for c in range(merged.min_col, merged.max_col + 1):
-                    ws.cell(row=r, column=c).value = None
-
-            # 2. APPLY MERGE: Using the correct end_column parameter
-            ws.merge_cells(
-                start_row=new_min_row, 
-                start_column=merged.min_col,
-                end_row=new_max_row, 
-                end_column=merged.max_col
-            )
+    if plan is None:
+        plan = compile_merge_plan(ws, src_start, src_end)
+
+    index = get_merged_index(ws)
+    target_start = src_start + offset
+
+    for first_off, min_col, last_off, max_col in plan:
+        new_min_row = target_start + first_off
+        new_max_row = target_start + last_off
+        
+        # 1. CLEAR GHOST VALUES: Clear cells B and D before merging
+        # This prevents the "first entry text" from appearing in the second entry
+        for r in range(new_min_row, new_max_row + 1):
+            for c in range(min_col, max_col + 1):
+                ws.cell(row=r, column=c).value = None
+
+        # 2. APPLY MERGE: Using the correct end_column parameter
+        index.merge(
+            start_row=new_min_row, 
+            start_column=min_col,
+            end_row=new_max_row, 
+            end_column=max_col
+        )
 
 def copy_cell_style(source_cell, target_cell):
-    """Copies all styling from one cell to another."""
+    """Copies all styling from one cell to another (by shared style ID, no new objects)."""
     if source_cell.has_style:
-        target_cell.font = copy(source_cell.font)
-        target_cell.border = copy(source_cell.border)
-        target_cell.fill = copy(source_cell.fill)
-        target_cell.number_format = copy(source_cell.number_format)
-        target_cell.alignment = copy(source_cell.alignment)
\ No newline at end of file
+        src, tgt = source_cell._style, _style_array(target_cell)
+        for field in _CELL_STYLE_IDS:
+            setattr(tgt, field, getattr(src, field))
@@ -1,11 +1,86 @@
 # generators/excel/writer.py
+import datetime
+import os
+import shutil
+import tempfile
 from io import BytesIO
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+from ..common.config import OUTPUT_SPOOL_MAX_BYTES
+from ..common.metrics import timed_stage
+from .sheet_parts import PartCachingExcelWriter, PlannedWorkbook
 
+# Every zip member gets the DOS epoch, as reproducible-build tools do
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+_COPY_CHUNK = 1024 * 1024
+
+
+class _ReproducibleZipFile(ZipFile):
+    """ZipFile that stamps every member with the same date and permissions."""
+
+    def _member(self, arcname):
+        zinfo = ZipInfo(arcname, date_time=_ZIP_DATE_TIME)
+        zinfo.compress_type = self.compression
+        zinfo.external_attr = 0o600 << 16
+        return zinfo
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        if not isinstance(zinfo_or_arcname, ZipInfo):
+            zinfo_or_arcname = self._member(zinfo_or_arcname)
+        super().writestr(zinfo_or_arcname, data, compress_type, compresslevel)
+
+    def write(self, filename, arcname=None, compress_type=None, compresslevel=None):
+        # openpyxl streams each worksheet's XML in from a temp file
+        zinfo = self._member(arcname or os.path.basename(filename))
+        if compress_type is not None:
+            zinfo.compress_type = compress_type
+        zinfo.file_size = os.path.getsize(filename)
+        with open(filename, "rb") as src, self.open(zinfo, "w") as dst:
+            shutil.copyfileobj(src, dst, _COPY_CHUNK)
+
+
+def save_workbook(wb, target):
+    """
+    wb.save() with reproducible output: the same workbook always gives the
+    same bytes. openpyxl stamps docProps "modified" and every zip member with
+    the wall clock; here "modified" follows the template's "created" date.
+    wb is a Workbook or a sheet_parts.PlannedWorkbook, whose reused sheets
+    are spliced in from cache. target is a path or a writable binary file.
+    """
+    if isinstance(wb, PlannedWorkbook):
+        wb = wb._workbook
+    props = wb.properties
+    props.modified = props.created or datetime.datetime(*_ZIP_DATE_TIME)
+    archive = _ReproducibleZipFile(target, "w", ZIP_DEFLATED, allowZip64=True)
+    try:
+        PartCachingExcelWriter(wb, archive).save()
+    except BaseException:
+        archive.close()
+        raise
+
+@timed_stage("save")
 def save_to_memory(wb):
     """
     Saves the workbook into a BytesIO buffer for the API response.
     """
     stream = BytesIO()
-    wb.save(stream)
+    save_workbook(wb, stream)
+    stream.seek(0)
+    return stream
+
+@timed_stage("save")
+def save_to_spooled_file(wb, max_size=OUTPUT_SPOOL_MAX_BYTES):
+    """
+    Saves the workbook into a spooled temporary file for the API response.
+    Small workbooks stay in memory; past max_size the zip rolls over to disk,
+    so a large reference workbook never holds the object model *and* the
+    whole zip in RAM (openpyxl already writes each sheet part via a temp file).
+    The caller owns the file: send_file() closes it once it has been streamed.
+    """
+    stream = tempfile.SpooledTemporaryFile(max_size=max_size, mode="w+b")
+    try:
+        save_workbook(wb, stream)
+    except BaseException:
+        stream.close()
+        raise
     stream.seek(0)
-    return stream
\ No newline at end of file
+    return stream
@@ -0,0 +1,287 @@
+# generators/jobs.py
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from .admission import admission, estimate_cost
+from .common.config import JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RESULT_TTL, JOB_RESULT_DIR
+from .common.metrics import register_collector, simple_metric, stage_timer
+from .excel.engine import generate_full_report
+from .excel.writer import save_workbook
+from .pdf.engine import generate_pdf_report
+
+_COPY_CHUNK = 256 * 1024
+# Progress is written to the job's state file at most this often (seconds)
+_STATE_WRITE_INTERVAL = 1.0
+# Finished jobs left on disk by other (or recycled) workers are swept this often
+_DISK_SWEEP_INTERVAL = 60.0
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised by JobManager.submit when every worker is busy and the queue is full."""
+
+
+class Job:
+    """One asynchronous generation: its state, progress and (once done) result file."""
+
+    def __init__(self, data, mode, fmt, download_name):
+        self.id = uuid.uuid4().hex
+        self.data = data
+        self.mode = mode
+        self.format = fmt
+        self.download_name = download_name
+        self.status = "queued"       # queued -> running -> done | failed
+        self.stage = None
+        self.done = 0
+        self.total = 0
+        self.error = None
+        self.detail = None
+        self.result_path = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._on_change = None
+        self._state_written_at = 0.0
+
+    def report_progress(self, stage, done, total):
+        # Called from the worker thread; plain attribute writes are atomic enough here
+        self.stage = stage
+        self.done = done
+        self.total = total
+        if self._on_change and time.monotonic() - self._state_written_at >= _STATE_WRITE_INTERVAL:
+            self._on_change(self)
+
+    def state(self):
+        """to_dict() plus what's needed to serve the result from another process."""
+        state = self.to_dict()
+        state["result_path"] = self.result_path
+        state["download_name"] = self.download_name
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """A read-only view of a job another worker process is running (or ran)."""
+        job = cls(None, state["mode"], state["format"], state["download_name"])
+        job.id = state["job_id"]
+        job.status = state["status"]
+        job.stage = state["progress"]["stage"]
+        job.done = state["progress"]["done"]
+        job.total = state["progress"]["total"]
+        job.error = state["error"]
+        job.result_path = state["result_path"]
+        job.created_at = state["created_at"]
+        job.started_at = state["started_at"]
+        job.finished_at = state["finished_at"]
+        return job
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "mode": self.mode,
+            "format": self.format,
+            "progress": {
+                "stage": self.stage,
+                "done": self.done,
+                "total": self.total,
+                "percent": round(100 * self.done / self.total, 1) if self.total else None,
+            },
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    In-process job runner: a small thread pool plus a bounded queue, no broker.
+    Finished results live in result_dir and are dropped `retention` seconds
+    after the job finishes (cleanup happens lazily on submit/get).
+
+    Every job also keeps a small <id>.json state file next to its result, so
+    with several server workers (server.py) a job submitted to one worker can
+    be polled and downloaded through any other.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_queue=JOB_QUEUE_SIZE,
+                 retention=JOB_RESULT_TTL, result_dir=JOB_RESULT_DIR):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retention = retention
+        self.result_dir = result_dir
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._swept_at = 0.0
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="report-job")
+        return self._pool
+
+    def _active_count(self):
+        return sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+
+    def submit(self, data, mode="combined", fmt="xlsx", download_name=None):
+        self.reap()
+        ext = "pdf" if fmt == "pdf" else "xlsx"
+        job = Job(data, mode, fmt, download_name or f"Report_{mode}.{ext}")
+        job._on_change = self._write_state
+        with self._lock:
+            # Running jobs occupy the workers, everything else waits in the queue
+            if self._active_count() >= self.workers + self.max_queue:
+                raise QueueFull()
+            self._jobs[job.id] = job
+            self._write_state(job)
+            self._get_pool().submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        self.reap()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            job = self._read_state(job_id)
+        return job
+
+    def shutdown(self, wait=True):
+        """Stops taking jobs; with wait=True, returns once queued and running jobs are finished."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.result_dir, f"{job_id}.json")
+
+    def _write_state(self, job):
+        job._state_written_at = time.monotonic()
+        try:
+            os.makedirs(self.result_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.result_dir, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(job.state(), f)
+            os.replace(tmp_path, self._state_path(job.id))
+        except OSError as e:
+            # Polling from other workers degrades, the job itself goes on
+            logger.warning("could not write state of job %s: %s", job.id, e)
+
+    def _read_state_file(self, job_id):
+        try:
+            with open(self._state_path(job_id)) as f:
+                return Job.from_state(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _read_state(self, job_id):
+        """A job this process doesn't run, from its state file (None if unknown or expired)."""
+        if not _JOB_ID.fullmatch(job_id or ""):
+            return None
+        job = self._read_state_file(job_id)
+        if job is not None and job.finished_at is not None and job.finished_at < time.time() - self.retention:
+            return None
+        return job
+
+    def counts(self):
+        """Number of known jobs per status."""
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ("queued", "running", "done", "failed")}
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        self._write_state(job)
+        try:
+            # Same budget as the synchronous routes; waits instead of failing
+            with admission.admit(estimate_cost(job.data, job.mode), timeout=None):
+                self._generate(job)
+        except Exception as e:
+            logger.exception("job %s failed mode=%s format=%s", job.id, job.mode, job.format)
+            job.error = f"{type(e).__name__}: {e}"
+            job.detail = traceback.format_exc(limit=5)
+            job.status = "failed"
+        finally:
+            # The payload (with its photos) is not needed any more
+            job.data = None
+            job.finished_at = time.time()
+            self._write_state(job)
+
+    def _generate(self, job):
+        os.makedirs(self.result_dir, exist_ok=True)
+        path = os.path.join(self.result_dir, f"{job.id}.{'pdf' if job.format == 'pdf' else 'xlsx'}")
+        if job.format == "pdf":
+            with generate_pdf_report(job.data, mode=job.mode, progress=job.report_progress) as src, \
+                    open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst, _COPY_CHUNK)
+        else:
+            wb = generate_full_report(job.data, mode=job.mode, progress=job.report_progress, reuse_parts=True)
+            job.report_progress("saving", 0, 1)
+            with stage_timer("save"):
+                save_workbook(wb, path)
+            job.report_progress("saving", 1, 1)
+        job.result_path = path
+        job.status = "done"
+
+    def reap(self):
+        """Forgets finished jobs older than the retention window and deletes their files."""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            self._remove_files(job.id, job.result_path)
+        if time.monotonic() - self._swept_at >= _DISK_SWEEP_INTERVAL:
+            self._swept_at = time.monotonic()
+            self._sweep_disk(cutoff)
+
+    def _sweep_disk(self, cutoff):
+        """Deletes expired jobs left on disk by workers that are gone."""
+        try:
+            names = os.listdir(self.result_dir)
+        except OSError:
+            return
+        for name in names:
+            job_id, ext = os.path.splitext(name)
+            if ext != ".json" or not _JOB_ID.fullmatch(job_id):
+                continue
+            job = self._read_state_file(job_id)
+            if job is not None and job.finished_at is not None and job.finished_at < cutoff:
+                self._remove_files(job_id, job.result_path)
+
+    def _remove_files(self, job_id, result_path):
+        for path in (result_path, self._state_path(job_id)):
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+jobs = JobManager()
+
+
+def _job_metrics():
+    return simple_metric(
+        "report_jobs", "gauge",
+        "Async jobs currently held by the workers, by status.",
+        [({"status": status}, count) for status, count in jobs.counts().items()],
+    )
+
+
+register_collector(_job_metrics)
@@ -0,0 +1,58 @@
+# generators/output_cache.py
+from .common.config import OUTPUT_CACHE_DIR, OUTPUT_CACHE_MAX_BYTES, IMAGE_DPI, IMAGE_JPEG_QUALITY
+from .common.disk_cache import DiskCache
+from .common.fingerprint import CODE_VERSION, fingerprint, inline_images_only
+from .common.metrics import register_collector, simple_metric
+from .excel.engine import TEMPLATE_PATH
+from .excel.template_cache import template_version
+
+_output_cache = DiskCache(OUTPUT_CACHE_DIR, OUTPUT_CACHE_MAX_BYTES) if OUTPUT_CACHE_DIR else None
+
+
+def output_cache_key(data, mode, fmt):
+    """
+    Hex key for one rendered output, or None if this payload must not be cached.
+    The payload is normalized (sorted keys, compact JSON), so clients that
+    serialize the same report differently still share an entry.
+    Payloads with photos given as local paths are never cached.
+    """
+    if _output_cache is None or not isinstance(data, dict):
+        return None
+    if not inline_images_only(data.get("reference")):
+        return None
+    try:
+        return fingerprint(
+            [mode, fmt, template_version(TEMPLATE_PATH), CODE_VERSION, IMAGE_DPI, IMAGE_JPEG_QUALITY],
+            data,
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def open_cached_output(key):
+    """The cached output as an open binary file, or None on a miss."""
+    if key is None or _output_cache is None:
+        return None
+    return _output_cache.open(key)
+
+
+def store_output(key, stream):
+    """Copies a freshly rendered output into the cache and rewinds the stream for sending."""
+    if key is None or _output_cache is None:
+        return
+    stream.seek(0)
+    _output_cache.put_file(key, stream)
+    stream.seek(0)
+
+
+def _output_cache_metrics():
+    if _output_cache is None:
+        return []
+    return simple_metric(
+        "output_cache_events", "counter",
+        "On-disk rendered output cache lookups and maintenance.",
+        [({"event": event}, count) for event, count in _output_cache.stats().items()],
+    )
+
+
+register_collector(_output_cache_metrics)
@@ -0,0 +1,129 @@
+# generators/pdf/drawer.py
+import hashlib
+import textwrap
+from io import BytesIO
+from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
+from ..common.helpers import to_num
+
+HEADER_FILL = colors.HexColor("#657C9C")
+GRID_COLOR = colors.HexColor("#808080")
+FONT = "Helvetica"
+FONT_BOLD = "Helvetica-Bold"
+
+
+class ImageXObjects:
+    """
+    Keeps one PDF Form XObject per distinct photo (by content hash).
+    The first time a photo is drawn its bytes are embedded once; every later
+    occurrence (same entry repeated, same logo in several sections...) only
+    references the existing XObject.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self._names = {}
+
+    def _form_name(self, img_bytes):
+        digest = hashlib.sha1(img_bytes).hexdigest()
+        name = self._names.get(digest)
+        if name is None:
+            name = f"img{len(self._names)}_{digest[:12]}"
+            # Unit-square form; callers scale it into place with the CTM
+            self.canvas.beginForm(name, lowerx=0, lowery=0, upperx=1, uppery=1)
+            self.canvas.drawImage(ImageReader(BytesIO(img_bytes)), 0, 0, width=1, height=1, mask="auto")
+            self.canvas.endForm()
+            self._names[digest] = name
+        return name
+
+    def draw(self, img_bytes, x, y, width, height):
+        """Draws the photo stretched into the box, like the xlsx anchor does."""
+        name = self._form_name(img_bytes)
+        c = self.canvas
+        c.saveState()
+        c.translate(x, y)
+        c.scale(width, height)
+        c.doForm(name)
+        c.restoreState()
+
+
+def format_number(value):
+    """Same look as the sheet's '#,##0;(#,##0);"-"' number format."""
+    num = to_num(value)
+    if num == 0:
+        return "-"
+    if num < 0:
+        return f"({abs(num):,.0f})"
+    return f"{num:,.0f}"
+
+
+def fit_text(canvas, text, max_width, font=FONT, size=9):
+    """Truncates text with an ellipsis so it stays inside its cell."""
+    text = "" if text is None else str(text)
+    if canvas.stringWidth(text, font, size) <= max_width:
+        return text
+    while text and canvas.stringWidth(text + "...", font, size) > max_width:
+        text = text[:-1]
+    return text + "..."
+
+
+def draw_bar(canvas, x, y, width, height, text, fill=HEADER_FILL, font_size=11, align="center"):
+    """A filled title bar with white bold text (y is the bar's top edge)."""
+    canvas.saveState()
+    canvas.setFillColor(fill)
+    canvas.rect(x, y - height, width, height, stroke=0, fill=1)
+    canvas.setFillColor(colors.white)
+    canvas.setFont(FONT_BOLD, font_size)
+    text = fit_text(canvas, text, width - 8, FONT_BOLD, font_size)
+    baseline = y - height / 2 - font_size / 3
+    if align == "left":
+        canvas.drawString(x + 4, baseline, text)
+    else:
+        canvas.drawCentredString(x + width / 2, baseline, text)
+    canvas.restoreState()
+
+
+def draw_cell(canvas, x, y, width, height, text, align="left", font=FONT, size=9, fill=None):
+    """One bordered table cell (y is the cell's top edge)."""
+    canvas.saveState()
+    canvas.setStrokeColor(GRID_COLOR)
+    canvas.setLineWidth(0.5)
+    if fill is not None:
+        canvas.setFillColor(fill)
+        canvas.rect(x, y - height, width, height, stroke=1, fill=1)
+        canvas.setFillColor(colors.black)
+    else:
+        canvas.rect(x, y - height, width, height, stroke=1, fill=0)
+    canvas.setFont(font, size)
+    text = fit_text(canvas, text, width - 6, font, size)
+    baseline = y - height / 2 - size / 3
+    if align == "center":
+        canvas.drawCentredString(x + width / 2, baseline, text)
+    elif align == "right":
+        canvas.drawRightString(x + width - 3, baseline, text)
+    else:
+        canvas.drawString(x + 3, baseline, text)
+    canvas.restoreState()
+
+
+def draw_row(canvas, x, y, widths, height, values, aligns=None, font=FONT, size=9, fill=None):
+    """A row of cells; returns the y of the next row."""
+    for i, (width, value) in enumerate(zip(widths, values)):
+        align = aligns[i] if aligns else "left"
+        draw_cell(canvas, x, y, width, height, value, align, font, size, fill)
+        x += width
+    return y - height
+
+
+def wrap_lines(text, width, max_rows):
+    """Same wrapping rules as write_wrapped_rows in the xlsx report."""
+    if not text:
+        return []
+    lines = []
+    for p in str(text).splitlines():
+        p = p.strip()
+        if not p:
+            lines.append("")
+            continue
+        lines.extend(textwrap.wrap(p, width=width) or [""])
+    return lines[:max_rows]
@@ -0,0 +1,410 @@
+# generators/pdf/engine.py
+import logging
+import tempfile
+from datetime import datetime
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas as pdf_canvas
+from ..common.config import (
+    PDF_MARGIN,
+    PDF_IMAGE_HEIGHT,
+    PDF_FOOTER_HEIGHT,
+    PDF_PADDING_HEIGHT,
+    IMAGE_WIDTH_IN,
+    IMAGE_HEIGHT_IN,
+    DATA_COLUMNS,
+    OUTPUT_SPOOL_MAX_BYTES
+)
+from ..common.helpers import to_num
+from ..common.metrics import stage_timer, timed_stage
+from ..excel.images import prepare_images, load_sheet_image, start_fetches, target_pixel_size
+from .drawer import (
+    ImageXObjects,
+    HEADER_FILL,
+    FONT,
+    FONT_BOLD,
+    draw_bar,
+    draw_cell,
+    draw_row,
+    format_number,
+    wrap_lines
+)
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+CONTENT_WIDTH = PAGE_WIDTH - 2 * PDF_MARGIN
+TITLE_BAR_HEIGHT = 30   # Same as rows 1/3/5 of the reference template
+ENTRIES_PER_PAGE = 4    # Same 4-per-page rule as fill_reference_sheet
+SECTION_TITLES_PER_PAGE = 2  # Room reserved for section titles when sizing the layout
+ROW_HEIGHT = 14
+
+logger = logging.getLogger(__name__)
+
+
+class _PageCursor:
+    """Tracks the y position on the current page and starts new pages as needed."""
+
+    def __init__(self, canvas, on_new_page=None):
+        self.canvas = canvas
+        self.on_new_page = on_new_page
+        self.top = PAGE_HEIGHT - PDF_MARGIN
+        self.bottom = PDF_MARGIN
+        self.y = self.top
+        self.page_has_content = False
+        if on_new_page:
+            on_new_page(self)
+
+    def new_page(self):
+        # reportlab keeps every finished page in memory until canvas.save()
+        self.canvas.showPage()
+        self.y = self.top
+        self.page_has_content = False
+        if self.on_new_page:
+            self.on_new_page(self)
+
+    def need(self, height):
+        """
+        Starts a new page unless `height` still fits on this one.
+        Returns True if a new page was started.
+        """
+        # Small tolerance: the reference layout is sized to fill the page exactly
+        if self.y - height < self.bottom - 0.01 and self.page_has_content:
+            self.new_page()
+            return True
+        return False
+
+    def advance(self, height):
+        self.y -= height
+        self.page_has_content = True
+
+
+# --- REPORT ---
+
+def _format_report_date(report_date):
+    if not report_date:
+        return ""
+    try:
+        dt = datetime.fromisoformat(str(report_date).replace('Z', ''))
+        return dt.strftime("%A, %B %d, %Y")
+    except Exception:
+        return str(report_date)
+
+
+def _draw_report_header(cur, data):
+    c = cur.canvas
+    x = PDF_MARGIN
+    draw_bar(c, x, cur.y, CONTENT_WIDTH, 24, "DAILY REPORT", font_size=14)
+    cur.advance(24 + 8)
+
+    temp_am = f"{data.get('tempAM')}°C" if data.get('tempAM') else ""
+    temp_pm = f"{data.get('tempPM')}°C" if data.get('tempPM') else ""
+    lines = [
+        f"Project Name : {data.get('projectName', '')}",
+        f"Weather : AM {data.get('weatherAM', '')}  |  PM {data.get('weatherPM', '')}",
+        f"Temperature : AM {temp_am}  |  PM {temp_pm}",
+    ]
+    c.setFont(FONT, 9)
+    for i, line in enumerate(lines):
+        c.drawString(x, cur.y - 10, line)
+        if i == len(lines) - 1:
+            c.drawRightString(x + CONTENT_WIDTH, cur.y - 10, _format_report_date(data.get('reportDate')))
+        cur.advance(ROW_HEIGHT)
+    cur.advance(6)
+
+
+def _draw_activities(cur, data):
+    c = cur.canvas
+    half = CONTENT_WIDTH / 2
+    x = PDF_MARGIN
+    draw_bar(c, x, cur.y, half, 18, "Working Activity Today", font_size=10)
+    draw_bar(c, x + half, cur.y, half, 18, "Work Plan for the Next Day", font_size=10)
+    cur.advance(18)
+
+    # Same 10-row budget as B12:B21 / G12:G21 in the sheet
+    today = wrap_lines(data.get('activityToday', ''), 60, 10)
+    plan = wrap_lines(data.get('workPlanNextDay', ''), 60, 10)
+    for i in range(10):
+        draw_cell(c, x, cur.y, half, 12, today[i] if i < len(today) else "", size=8)
+        draw_cell(c, x + half, cur.y, half, 12, plan[i] if i < len(plan) else "", size=8)
+        cur.advance(12)
+    cur.advance(6)
+
+
+def _draw_side_by_side_table(cur, titles, headers, widths, aligns, left_rows, right_rows, total=False):
+    """
+    Two tables next to each other (management/working team, materials/machinery),
+    padded to at least 6 rows like the template. Rows continue on the next page
+    (with the headers repeated) if they don't fit.
+    """
+    c = cur.canvas
+    half = CONTENT_WIDTH / 2
+    x = PDF_MARGIN
+
+    def draw_headers():
+        draw_bar(c, x, cur.y, half, 18, titles[0], font_size=10)
+        draw_bar(c, x + half, cur.y, half, 18, titles[1], font_size=10)
+        cur.advance(18)
+        draw_row(c, x, cur.y, widths, ROW_HEIGHT, headers, ["center"] * len(headers), FONT_BOLD, 8)
+        draw_row(c, x + half, cur.y, widths, ROW_HEIGHT, headers, ["center"] * len(headers), FONT_BOLD, 8)
+        cur.advance(ROW_HEIGHT)
+
+    cur.need(18 + ROW_HEIGHT * 3)
+    draw_headers()
+
+    needed_rows = max(6, len(left_rows), len(right_rows))
+    blank = [""] * len(headers)
+    for i in range(needed_rows):
+        if cur.y - ROW_HEIGHT < cur.bottom:
+            cur.new_page()
+            draw_headers()
+        left = left_rows[i] if i < len(left_rows) else blank
+        right = right_rows[i] if i < len(right_rows) else blank
+        draw_row(c, x, cur.y, widths, ROW_HEIGHT, left, aligns, size=8)
+        draw_row(c, x + half, cur.y, widths, ROW_HEIGHT, right, aligns, size=8)
+        cur.advance(ROW_HEIGHT)
+
+    if total:
+        cur.need(ROW_HEIGHT)
+        for offset, rows in ((0, left_rows), (half, right_rows)):
+            sums = [sum(r.values[i] for r in rows) for i in range(3)]
+            totals = ["TOTAL"] + [""] * (len(headers) - 4) + [format_number(v) for v in sums]
+            draw_row(c, x + offset, cur.y, widths, ROW_HEIGHT, totals, aligns, FONT_BOLD, 8)
+        cur.advance(ROW_HEIGHT)
+    cur.advance(6)
+
+
+class _TableRow(list):
+    """A list of display strings that also keeps the numbers behind the last 3 columns."""
+
+    def __init__(self, cells, values):
+        super().__init__(cells)
+        self.values = values
+
+
+def _team_rows(members):
+    rows = []
+    for m in members:
+        prev, today = to_num(m.get('prev', 0)), to_num(m.get('today', 0))
+        values = (prev, today, prev + today)
+        rows.append(_TableRow([m.get('description', '')] + [format_number(v) for v in values], values))
+    return rows
+
+
+def _resource_rows(items):
+    rows = []
+    # Same rule as the sheet: rows without a description stay blank
+    for item in items:
+        if not item.get('description'):
+            rows.append(_TableRow(["", "", "", "", ""], (0.0, 0.0, 0.0)))
+            continue
+        prev, today = to_num(item.get('prev')), to_num(item.get('today'))
+        values = (prev, today, prev + today)
+        rows.append(_TableRow(
+            [item.get('description'), item.get('unit') or ""] + [format_number(v) for v in values],
+            values
+        ))
+    return rows
+
+
+@timed_stage("draw_report_pages")
+def draw_report_pages(c, data):
+    """Report sheet equivalent: header, activities, resources, materials/machinery."""
+    cur = _PageCursor(c)
+    _draw_report_header(cur, data)
+    _draw_activities(cur, data)
+
+    cur.need(18)
+    draw_bar(c, PDF_MARGIN, cur.y, CONTENT_WIDTH, 18, "Resources Employed", font_size=10)
+    cur.advance(18)
+
+    half = CONTENT_WIDTH / 2
+    team_widths = [half * 0.43, half * 0.19, half * 0.19, half * 0.19]
+    _draw_side_by_side_table(
+        cur,
+        ("Site Management Team", "Site Working Team"),
+        ["Description", "Up to Previous", "Today", "Accumulated"],
+        team_widths,
+        ["left", "center", "center", "center"],
+        _team_rows(data.get('managementTeam', [])),
+        _team_rows(data.get('workingTeam', [])),
+        total=True
+    )
+
+    resource_widths = [half * 0.34, half * 0.12, half * 0.18, half * 0.18, half * 0.18]
+    _draw_side_by_side_table(
+        cur,
+        ("Materials Deliveries", "Machinery & Equipment"),
+        ["Description", "Unit", "Up to Previous", "Today", "Accumulated"],
+        resource_widths,
+        ["left", "center", "center", "center", "center"],
+        _resource_rows(data.get('materials', [])),
+        _resource_rows(data.get('machinery', []))
+    )
+
+    # Dynamic floor bar, like row 75 of the sheet
+    cur.need(8)
+    c.setFillColor(HEADER_FILL)
+    c.rect(PDF_MARGIN, cur.y - 8, CONTENT_WIDTH, 8, stroke=0, fill=1)
+    c.showPage()
+
+
+# --- REFERENCE ---
+
+class _ReferenceLayout:
+    """
+    Natural sizes come from common/config.py (one entry = padding, image,
+    padding, footer, mirroring the sheet's 4-row entry block). Like the sheet's
+    fit-to-width print setup, everything is scaled down uniformly so that the
+    repeated header, SECTION_TITLES_PER_PAGE section titles and 4 entries fit
+    on one A4 page.
+    """
+
+    def __init__(self):
+        image_w = PDF_IMAGE_HEIGHT * IMAGE_WIDTH_IN / IMAGE_HEIGHT_IN
+        natural_width = image_w * len(DATA_COLUMNS) + PDF_PADDING_HEIGHT * (len(DATA_COLUMNS) - 1)
+        natural_entry = 2 * PDF_PADDING_HEIGHT + PDF_IMAGE_HEIGHT + PDF_FOOTER_HEIGHT
+        natural_header = 2 * (TITLE_BAR_HEIGHT + PDF_PADDING_HEIGHT)
+        natural_height = (
+            natural_header
+            + SECTION_TITLES_PER_PAGE * TITLE_BAR_HEIGHT
+            + ENTRIES_PER_PAGE * natural_entry
+        )
+        usable_height = PAGE_HEIGHT - 2 * PDF_MARGIN
+
+        scale = min(1.0, CONTENT_WIDTH / natural_width, usable_height / natural_height)
+        self.image_w = image_w * scale
+        self.image_h = PDF_IMAGE_HEIGHT * scale
+        self.gap = PDF_PADDING_HEIGHT * scale
+        self.padding = PDF_PADDING_HEIGHT * scale
+        self.footer_h = PDF_FOOTER_HEIGHT * scale
+        self.title_h = TITLE_BAR_HEIGHT * scale
+        self.title_font = max(6, self.title_h * 0.55)
+        self.footer_font = max(5, self.footer_h * 0.7)
+        self.entry_h = natural_entry * scale
+        self.width = natural_width * scale
+        self.x = PDF_MARGIN + (CONTENT_WIDTH - self.width) / 2
+
+
+@timed_stage("draw_reference_pages")
+def draw_reference_pages(c, reference_entries, table_title="PHOTO REFERENCE", image_cache=None, progress=None):
+    """
+    Reference sheet equivalent with the same 4-entries-per-page breaks.
+    Every distinct photo is embedded once as a shared XObject. The pages are
+    not streamed: reportlab holds the whole document until c.save(), so its
+    size (the downscaled photos, roughly) stays in memory for the request.
+    progress: optional callback(stage, done, total), called after every entry.
+    """
+    if image_cache is None:
+        image_cache = {}
+    layout = _ReferenceLayout()
+    xobjects = ImageXObjects(c)
+    target_size = target_pixel_size()
+
+    # Same decode/rasterize pre-pass (and disk cache) as the xlsx reference sheet
+    prepare_images(reference_entries, image_cache, DATA_COLUMNS)
+
+    def page_header(cur):
+        # Rows 1-4 of the sheet are repeated on every printed page
+        draw_bar(c, layout.x, cur.y, layout.width, layout.title_h, "REFERENCE PHOTOS", font_size=layout.title_font)
+        cur.advance(layout.title_h)
+        cur.advance(layout.padding)
+        draw_bar(c, layout.x, cur.y, layout.width, layout.title_h, table_title, font_size=layout.title_font * 0.85, align="left")
+        cur.advance(layout.title_h)
+        cur.advance(layout.padding)
+        cur.page_has_content = False
+
+    cur = _PageCursor(c, page_header)
+    last_section = None
+    entries_on_current_page = 0
+
+    total_entries = len(reference_entries)
+    if progress:
+        progress("reference", 0, total_entries)
+
+    for entry_number, entry in enumerate(reference_entries, 1):
+        current_section = entry.get("section_title")
+
+        if current_section and current_section != last_section:
+            if entries_on_current_page >= ENTRIES_PER_PAGE and last_section is not None:
+                cur.new_page()
+                entries_on_current_page = 0
+            if cur.need(layout.title_h + layout.entry_h):
+                entries_on_current_page = 0
+            draw_bar(c, layout.x, cur.y, layout.width, layout.title_h, current_section, font_size=layout.title_font * 0.85, align="left")
+            cur.advance(layout.title_h)
+            last_section = current_section
+
+        if entries_on_current_page >= ENTRIES_PER_PAGE:
+            cur.new_page()
+            entries_on_current_page = 0
+        if cur.need(layout.entry_h):
+            entries_on_current_page = 0
+
+        # Padding, image row, padding, footer row
+        image_top = cur.y - layout.padding
+        for idx, img_source in enumerate(entry.get("images", [])):
+            if not img_source or idx >= len(DATA_COLUMNS):
+                continue
+            img_bytes = load_sheet_image(img_source, image_cache, target_size)
+            if img_bytes is None:
+                continue
+            x = layout.x + idx * (layout.image_w + layout.gap)
+            xobjects.draw(img_bytes, x, image_top - layout.image_h, layout.image_w, layout.image_h)
+
+        footer_top = image_top - layout.image_h - layout.padding
+        for idx, text in enumerate(entry.get("footers", ["", ""])[:len(DATA_COLUMNS)]):
+            x = layout.x + idx * (layout.image_w + layout.gap)
+            draw_cell(c, x, footer_top, layout.image_w, layout.footer_h, text, align="center", size=layout.footer_font)
+
+        cur.advance(layout.entry_h)
+        entries_on_current_page += 1
+
+        if progress:
+            progress("reference", entry_number, total_entries)
+
+    c.showPage()
+
+
+def generate_pdf_report(data, mode="combined", max_size=OUTPUT_SPOOL_MAX_BYTES, progress=None):
+    """
+    Renders the report and/or reference pages straight to PDF (no xlsx
+    conversion step). Returns a spooled temp file positioned at 0, in the
+    same way as writer.save_to_spooled_file.
+    progress: optional callback(stage, done, total), see generate_full_report.
+    """
+    if mode == "rollup":
+        raise ValueError("mode 'rollup' is only available as xlsx")
+    data = data or {}
+    logger.info(
+        "generating pdf mode=%s project=%r entries=%d",
+        mode, data.get("projectName"), len(data.get("reference") or []),
+    )
+    stream = tempfile.SpooledTemporaryFile(max_size=max_size, mode="w+b")
+    try:
+        # invariant: fixed creation date and document ID, so equal input gives equal bytes
+        c = pdf_canvas.Canvas(stream, pagesize=A4, pageCompression=1, invariant=1)
+        c.setTitle(data.get("projectName") or data.get("table_title") or "Daily Report")
+
+        # http(s) photos download while the report pages are drawn
+        image_cache = {}
+        if mode in ("reference", "combined"):
+            start_fetches(data.get("reference"), image_cache, DATA_COLUMNS)
+
+        if mode in ("report", "combined"):
+            draw_report_pages(c, data)
+            if progress:
+                progress("report", 1, 1)
+        if mode in ("reference", "combined"):
+            draw_reference_pages(
+                c,
+                data.get('reference', []),
+                data.get("table_title", "PHOTO REFERENCE"),
+                image_cache=image_cache,
+                progress=progress
+            )
+
+        with stage_timer("save"):
+            c.save()
+    except BaseException:
+        stream.close()
+        raise
+    stream.seek(0)
+    return stream
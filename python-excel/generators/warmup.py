@@ -0,0 +1,98 @@
+# generators/warmup.py
+"""
+What a fresh process would otherwise pay for on its first request: parsing
+the template, loading Pillow's codec plugins, reportlab's font metrics and
+the openpyxl writer. server.py runs this once in the parent process before
+forking, so every worker starts warm and shares that memory copy-on-write.
+Anywhere else (python app.py, another WSGI server) the first GET /ready
+starts it on a background thread; /ready answers 503 until it is done.
+"""
+import logging
+import threading
+import time
+from io import BytesIO
+from PIL import Image
+from reportlab.pdfgen import canvas as pdf_canvas
+from .excel.engine import TEMPLATE_PATH
+from .excel.template_cache import load_template
+from .excel.writer import save_workbook
+from .pdf.drawer import FONT, FONT_BOLD
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_started_at = None
+_timings = None      # {step: seconds} once warm-up has finished
+_failed = ()         # steps that raised
+# Without these every request fails, so the instance is not ready if they did
+REQUIRED_STEPS = ("template",)
+
+
+def _warm_template():
+    # Parses template.xlsx into the snapshot cache, then one clone + save
+    # imports and exercises the whole openpyxl reader/writer path
+    save_workbook(load_template(TEMPLATE_PATH), BytesIO())
+
+
+def _warm_images():
+    # Registers every Pillow plugin and runs the JPEG/PNG paths photos take
+    Image.init()
+    buf = BytesIO()
+    Image.new("RGB", (64, 48), (128, 128, 128)).save(buf, "JPEG")
+    with Image.open(BytesIO(buf.getvalue())) as im:
+        im.convert("RGBA").resize((32, 24), Image.LANCZOS).save(BytesIO(), "PNG")
+
+
+def _warm_pdf_fonts():
+    c = pdf_canvas.Canvas(BytesIO(), invariant=1)
+    for font in (FONT, FONT_BOLD):
+        c.setFont(font, 10)
+        c.drawString(10, 10, "warm-up")
+    c.save()
+
+
+def warm_up():
+    """
+    Runs every warm-up step; returns {step: seconds}. A failing step is
+    logged and skipped; if it is one of REQUIRED_STEPS, /ready stays 503.
+    """
+    global _started_at, _timings, _failed
+    with _lock:
+        if _started_at is None:
+            _started_at = time.time()
+    timings = {}
+    failed = []
+    for name, step in (("template", _warm_template), ("images", _warm_images), ("pdf_fonts", _warm_pdf_fonts)):
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("warm-up step %s failed", name)
+            failed.append(name)
+        timings[name] = time.perf_counter() - started
+    logger.info("warm-up done in %.2fs %s", sum(timings.values()),
+                " ".join(f"{name}={seconds:.3f}s" for name, seconds in timings.items()))
+    _failed = tuple(failed)
+    _timings = timings
+    return timings
+
+
+def start_warm_up():
+    """Starts warm_up() on a daemon thread unless it has already run or started."""
+    global _started_at
+    with _lock:
+        if _started_at is not None:
+            return
+        _started_at = time.time()
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+def warm_up_status():
+    """{"ready", "started_at", "steps", "failed"} for the readiness endpoint."""
+    timings, failed = _timings, _failed
+    return {
+        "ready": timings is not None and not any(step in failed for step in REQUIRED_STEPS),
+        "started_at": _started_at,
+        "steps": {name: round(seconds, 3) for name, seconds in (timings or {}).items()},
+        "failed": list(failed),
+    }
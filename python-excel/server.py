@@ -0,0 +1,292 @@
+"""
+Production entry point: a pre-forking server for app.py.
+
+    python server.py
+
+The parent process imports the app, warms it up (template parsed, Pillow
+codecs, PDF fonts), binds the port and then forks SERVER_WORKERS workers.
+They share the warmed memory copy-on-write and accept on the same socket,
+so reports are generated on every core instead of behind one GIL. Each
+worker handles requests on threads, so requests beyond what is rendering
+reach admission control (generators/admission.py) and wait in its queue or
+get 503 + Retry-After, instead of sitting in the listen backlog. The
+admission budget is shared by all workers.
+
+A worker retires after about SERVER_MAX_REQUESTS requests or once its RSS
+passes SERVER_MAX_RSS_MB (openpyxl's memory only grows): it stops accepting,
+finishes its async jobs and exits, and the parent forks a replacement right
+away. SIGHUP retires every worker, SIGTERM/SIGINT shut the server down.
+Every process writes its metrics to a temp directory the parent creates, so
+/metrics on any worker reports the whole server (generators/common/metrics.py).
+Settings: section 10 of generators/common/config.py.
+
+Where os.fork doesn't exist (Windows) this falls back to one threaded process.
+"""
+import gc
+import logging
+import os
+import random
+import select
+import shutil
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+from werkzeug.serving import make_server
+
+from app import app
+from generators.admission import admission
+from generators.batch import shutdown_pool
+from generators.common.fetch import fetcher
+from generators.common.metrics import retire_samples, share_samples, write_samples
+from generators.jobs import jobs
+from generators.warmup import warm_up
+from generators.common.config import (
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    SERVER_MAX_REQUESTS,
+    SERVER_MAX_REQUESTS_JITTER,
+    SERVER_MAX_RSS_BYTES,
+    SERVER_GRACEFUL_TIMEOUT
+)
+
+logger = logging.getLogger("server")
+
+# A retiring worker writes its pid to the parent through this pipe
+_PID = struct.Struct("=i")
+
+
+def current_rss():
+    """Resident set size of this process in bytes (0 where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class Worker:
+    """One forked process serving requests from the shared listening socket."""
+
+    def __init__(self, listener, notify_fd):
+        self.listener = listener
+        self.notify_fd = notify_fd
+        self.max_requests = SERVER_MAX_REQUESTS + random.randint(0, max(0, SERVER_MAX_REQUESTS_JITTER)) \
+            if SERVER_MAX_REQUESTS > 0 else 0
+        self.handled = 0
+        self._handled_lock = threading.Lock()
+        self.stopping = False
+
+    def _count(self, environ, start_response):
+        with self._handled_lock:
+            self.handled += 1
+        return app(environ, start_response)
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _should_retire(self):
+        if self.max_requests and self.handled >= self.max_requests:
+            return f"served {self.handled} requests"
+        rss = current_rss() if SERVER_MAX_RSS_BYTES > 0 else 0
+        if rss > SERVER_MAX_RSS_BYTES:
+            return f"rss {rss // (1024 * 1024)}MB"
+        return None
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        server = make_server(SERVER_HOST, SERVER_PORT, self._count, threaded=True, fd=self.listener.fileno())
+        # server_close() then waits for the requests still running (downloads included)
+        server.daemon_threads = False
+        handle = server.process_request_thread
+
+        def process_request_thread(request, client_address):
+            try:
+                handle(request, client_address)
+            finally:
+                # Once the response is out, so other workers' scrapes see this request
+                write_samples()
+
+        server.process_request_thread = process_request_thread
+        # handle_request() returns after this long without a connection,
+        # so signals and the recycle checks are seen within a second
+        server.timeout = 1.0
+        logger.info("worker %d started", os.getpid())
+
+        reason = None
+        while not self.stopping:
+            server.handle_request()
+            # Picks up what background threads (async jobs) recorded meanwhile
+            write_samples()
+            reason = self._should_retire()
+            if reason:
+                break
+        server.server_close()
+        self.listener.close()
+
+        if reason:
+            logger.info("worker %d retiring: %s", os.getpid(), reason)
+            # The parent forks the replacement now, not after the jobs below are done
+            os.write(self.notify_fd, _PID.pack(os.getpid()))
+        jobs.shutdown(wait=True)
+        shutdown_pool()
+        fetcher.close()
+        write_samples()
+        logger.info("worker %d exiting after %d requests", os.getpid(), self.handled)
+
+
+class Arbiter:
+    """The parent process: keeps `workers` non-retiring workers alive."""
+
+    def __init__(self, listener, workers):
+        self.listener = listener
+        self.workers = workers
+        self.children = set()
+        self.retiring = set()
+        # Exited workers whose admission slots are still to be freed
+        self.unreleased = set()
+        self.stopping = False
+        self.recycle = False
+        self.notify_r, self.notify_w = os.pipe()
+        # Shared metrics; the parent's own file holds what the warm-up recorded
+        self.metrics_dir = tempfile.mkdtemp(prefix="report-metrics-")
+        share_samples(self.metrics_dir)
+        write_samples()
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return
+        # Child
+        code = 0
+        try:
+            os.close(self.notify_r)
+            share_samples(self.metrics_dir, fresh=True)
+            Worker(self.listener, self.notify_w).run()
+        except BaseException:
+            logger.exception("worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_hup(self, signum, frame):
+        self.recycle = True
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            self.children.discard(pid)
+            self.retiring.discard(pid)
+            retire_samples(pid)
+            # A worker killed mid-render (OOM) would otherwise hold its share of the budget
+            self.unreleased.add(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0 and not self.stopping:
+                logger.warning("worker %d exited with %d", pid, code)
+        # Never blocks: while a live worker holds the lock, try again next time
+        for pid in list(self.unreleased):
+            if admission.release_process(pid):
+                self.unreleased.discard(pid)
+
+    def _read_notifications(self, timeout):
+        ready, _, _ = select.select([self.notify_r], [], [], timeout)
+        if not ready:
+            return
+        data = os.read(self.notify_r, _PID.size * 64)
+        for (pid,) in _PID.iter_unpack(data[:len(data) - len(data) % _PID.size]):
+            if pid in self.children:
+                self.retiring.add(pid)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_hup)
+        logger.info("serving on %s:%d with %d workers", SERVER_HOST, SERVER_PORT, self.workers)
+
+        while not self.stopping:
+            self._reap()
+            if self.recycle:
+                self.recycle = False
+                logger.info("recycling all workers")
+                for pid in self.children - self.retiring:
+                    self._kill(pid, signal.SIGTERM)
+                    self.retiring.add(pid)
+            spawned = 0
+            while len(self.children - self.retiring) < self.workers:
+                self.spawn()
+                spawned += 1
+            if spawned > 1 and len(self.children) > spawned:
+                # Several died at once: don't fork in a tight loop if they keep crashing
+                time.sleep(1)
+            try:
+                self._read_notifications(0.5)
+            except InterruptedError:
+                pass
+
+        self.shutdown()
+
+    def shutdown(self):
+        logger.info("shutting down %d workers", len(self.children))
+        for pid in self.children:
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + SERVER_GRACEFUL_TIMEOUT
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in self.children:
+            logger.warning("worker %d did not stop in %ds, killing it", pid, SERVER_GRACEFUL_TIMEOUT)
+            self._kill(pid, signal.SIGKILL)
+        self._reap()
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+    @staticmethod
+    def _kill(pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+def main():
+    if not hasattr(os, "fork"):
+        logger.warning("os.fork is not available, serving from a single process")
+        warm_up()
+        make_server(SERVER_HOST, SERVER_PORT, app, threaded=True).serve_forever()
+        return
+
+    # Bind first so a busy port fails before the (slower) warm-up
+    listener = socket.create_server((SERVER_HOST, SERVER_PORT), backlog=128)
+    listener.set_inheritable(True)
+    # Every idle worker wakes up for a new connection and only one gets it:
+    # the others' accept() must fail (and be retried) rather than block
+    # forever, deaf to SIGTERM and the recycle checks
+    listener.setblocking(False)
+
+    warm_up()
+    # Keep the warmed objects out of the collector's generations: a collection
+    # in a worker would otherwise write to (and un-share) every page holding them
+    gc.collect()
+    gc.freeze()
+
+    Arbiter(listener, max(1, SERVER_WORKERS)).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
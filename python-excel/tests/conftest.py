@@ -0,0 +1,28 @@
+# tests/conftest.py
+"""
+Run from python-excel/:
+    python -m pytest -q
+
+The disk caches and the job results default to shared directories under the
+system temp dir. Every test run gets its own, set before generators/common/config.py
+reads them, so no result depends on an earlier run.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="daily-report-tests-")
+for _name in ("RASTER_CACHE_DIR", "OUTPUT_CACHE_DIR", "SHEET_PART_CACHE_DIR", "JOB_RESULT_DIR"):
+    os.environ[_name] = os.path.join(_TEMP_ROOT, _name.lower())
+
+
+def pytest_configure(config):
+    # openpyxl's "extension is not supported" noise on every template load
+    config.addinivalue_line("filterwarnings", "ignore:.*extension is not supported:UserWarning")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
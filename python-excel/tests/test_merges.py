@@ -0,0 +1,70 @@
+# tests/test_merges.py
+import pytest
+from openpyxl import Workbook
+from openpyxl.worksheet.cell_range import CellRange
+
+from generators.common.merges import get_merged_index, merge_cells, unmerge_cells
+
+
+@pytest.fixture
+def ws():
+    ws = Workbook().active
+    for coord in ("A1:C1", "B3:D5", "F3:F4", "A7:B7"):
+        ws.merge_cells(coord)
+    return ws
+
+
+def _covering(ws, row, col):
+    """openpyxl's own answer: the merged range covering (row, col), or None."""
+    return next((r for r in ws.merged_cells.ranges if (row, col) in set(r.cells)), None)
+
+
+def test_find_agrees_with_openpyxl(ws):
+    index = get_merged_index(ws)
+    for row in range(1, 9):
+        for col in range(1, 8):
+            assert index.find(row, col) == _covering(ws, row, col), (row, col)
+
+
+def test_contains_matches_merged_cells_membership(ws):
+    index = get_merged_index(ws)
+    for coord in ("A1:C1", "B1", "B3:C4", "D5", "C3:E3", "F3:F5", "A6", "A7:B7", "C7"):
+        cr = CellRange(coord)
+        assert index.contains(cr) == (cr in ws.merged_cells), coord
+
+
+def test_starting_in(ws):
+    index = get_merged_index(ws)
+    assert {r.coord for r in index.starting_in(3)} == {"B3:D5", "F3:F4", "A7:B7"}
+    assert {r.coord for r in index.starting_in(2, 5)} == {"B3:D5", "F3:F4"}
+    assert index.starting_in(8) == []
+
+
+def test_merge_and_unmerge_keep_the_index_in_sync(ws):
+    index = get_merged_index(ws)
+    merged = merge_cells(ws, 9, 2, 10, 4)
+    assert merged.coord == "B9:D10"
+    assert "B9:D10" in {r.coord for r in ws.merged_cells.ranges}
+    assert index.find(10, 3) == merged
+
+    # Merging a block that is already covered adds nothing
+    count = len(ws.merged_cells.ranges)
+    merge_cells(ws, 9, 2, 9, 3)
+    assert len(ws.merged_cells.ranges) == count
+
+    unmerge_cells(ws, "B9:D10")
+    assert index.find(10, 3) is None
+    assert "B9:D10" not in {r.coord for r in ws.merged_cells.ranges}
+    with pytest.raises(ValueError):
+        unmerge_cells(ws, "B9:D10")
+
+
+def test_index_rebuilds_after_merges_behind_its_back(ws):
+    index = get_merged_index(ws)
+    ws.merge_cells("E8:G9")
+    assert get_merged_index(ws) is index
+    assert index.find(9, 6).coord == "E8:G9"
+
+    ws.unmerge_cells("B3:D5")
+    get_merged_index(ws)
+    assert index.find(4, 3) is None
@@ -0,0 +1,55 @@
+# tests/test_output_cache.py
+import uuid
+
+import pytest
+
+import app as server_app
+from benchmarks.payloads import build_payload
+
+
+@pytest.fixture
+def client():
+    return server_app.app.test_client()
+
+
+@pytest.fixture
+def payload():
+    # A project name of its own, so no other test rendered this payload
+    return dict(build_payload(entries=2, image_size=(320, 240), distinct_images=2),
+                projectName=f"ETag {uuid.uuid4().hex}")
+
+
+def test_first_render_is_a_miss_with_a_strong_etag(client, payload):
+    response = client.post("/generate-combined", json=payload)
+    assert response.status_code == 200
+    assert response.headers["X-Output-Cache"] == "miss"
+    etag, weak = response.get_etag()
+    assert etag and not weak
+
+
+def test_matching_if_none_match_gets_304(client, payload):
+    first = client.post("/generate-combined", json=payload)
+    etag, _ = first.get_etag()
+
+    response = client.post("/generate-combined", json=payload, headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 304
+    assert response.get_etag() == (etag, False)
+    assert response.data == b""
+
+
+def test_repeat_without_etag_is_served_from_cache(client, payload):
+    first = client.post("/generate-combined", json=payload)
+    again = client.post("/generate-combined", json=payload)
+    assert again.status_code == 200
+    assert again.headers["X-Output-Cache"] == "hit"
+    assert again.get_etag() == first.get_etag()
+    assert again.data == first.data
+
+
+def test_changed_payload_gets_a_new_etag(client, payload):
+    etag, _ = client.post("/generate-combined", json=payload).get_etag()
+    changed = dict(payload, activityToday="Changed")
+
+    response = client.post("/generate-combined", json=changed, headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
@@ -0,0 +1,102 @@
+# tests/test_rollup.py
+from datetime import date, timedelta
+
+import pytest
+
+from generators.common.rollup import aggregate_days
+
+
+def _day(project, day, materials=(), working=()):
+    return {
+        "projectName": project,
+        "reportDate": f"{day}T00:00:00Z",
+        "materials": [dict(zip(("description", "unit", "prev", "today"), row)) for row in materials],
+        "workingTeam": [dict(zip(("description", "prev", "today"), row)) for row in working],
+    }
+
+
+def _row(rollup, project, table, description):
+    for i, item in enumerate(rollup.items):
+        if (item.project, item.table, item.description) == (project, table, description):
+            return i
+    raise AssertionError(f"no item {project}/{table}/{description}")
+
+
+@pytest.fixture
+def rollup():
+    return aggregate_days([
+        _day("Tower", "2026-03-02", materials=[("Concrete", "m3", 100, 10), ("Rebar", "t", 5, 1)],
+             working=[("Masons", 0, 4), ("Carpenters", 0, 2)]),
+        # Same item with different case and spacing, twice on one day
+        _day("Tower", "2026-03-03", materials=[("  concrete ", "M3", 110, 7), ("CONCRETE", "m3", 0, "5")],
+             working=[("Masons", 4, 6)]),
+        _day("Tower", "2026-03-04", materials=[("Concrete", "m3", 122, 12), ("", "m3", 0, 99)]),
+        _day("Bridge", "2026-03-03", materials=[("Concrete", "m3", 0, 3)]),
+        dict(_day("Tower", "2026-03-05", materials=[("Concrete", "m3", 0, 50)]), reportDate=""),
+    ])
+
+
+def test_period_and_counts(rollup):
+    assert rollup.reports == 4
+    assert rollup.skipped == 1
+    assert (rollup.first_day, rollup.last_day) == (date(2026, 3, 2), date(2026, 3, 4))
+    assert rollup.granularity == "day"
+    assert rollup.periods == [date(2026, 3, 2), date(2026, 3, 3), date(2026, 3, 4)]
+    assert rollup.projects == 2
+
+
+def test_items_are_matched_and_same_day_rows_summed(rollup):
+    tower = [it for it in rollup.items if it.project == "Tower" and it.table == "materials"]
+    assert [(it.description, it.unit) for it in tower] == [("Concrete", "m3"), ("Rebar", "t")]
+    concrete = _row(rollup, "Tower", "materials", "Concrete")
+    assert rollup.per_period[concrete].tolist() == [10, 12, 12]
+    assert rollup.opening[concrete] == 100
+    assert rollup.period_total[concrete] == 34
+    assert rollup.accumulated[concrete] == 134
+    assert rollup.peak[concrete] == 12
+    assert rollup.peak_day[concrete] == date(2026, 3, 3)
+    assert rollup.days_reported[concrete] == 3
+    assert rollup.average[concrete] == pytest.approx(34 / 3)
+
+
+def test_rows_without_description_are_skipped(rollup):
+    assert all(it.description for it in rollup.items)
+    materials = (10 + 12 + 12) + 1 + 3
+    working = (4 + 6) + 2
+    assert rollup.per_period.sum() == materials + working * 2  # members and their TOTAL
+
+
+def test_team_tables_get_a_total(rollup):
+    total = _row(rollup, "Tower", "workingTeam", "TOTAL")
+    assert rollup.items[total].is_total
+    assert rollup.per_period[total].tolist() == [6, 6, 0]
+    assert rollup.peak[total] == 6
+    assert not any(it.is_total for it in rollup.items if it.table == "materials")
+
+
+def test_sort_order(rollup):
+    keys = [(it.project, it.table, it.is_total) for it in rollup.items]
+    assert keys == [
+        ("Bridge", "materials", False),
+        ("Tower", "workingTeam", False),
+        ("Tower", "workingTeam", False),
+        ("Tower", "workingTeam", True),
+        ("Tower", "materials", False),
+        ("Tower", "materials", False),
+    ]
+
+
+@pytest.mark.parametrize("days, granularity", [(31, "day"), (60, "week"), (400, "month")])
+def test_granularity_follows_the_span(days, granularity):
+    start = date(2026, 1, 1)
+    result = aggregate_days([
+        _day("P", start + timedelta(days=d), materials=[("Sand", "t", 0, 1)]) for d in range(days)
+    ])
+    assert result.granularity == granularity
+    assert result.per_period.sum() == days
+
+
+def test_rejects_anything_but_a_list():
+    with pytest.raises(ValueError):
+        aggregate_days({"days": []})
+    assert aggregate_days([]).items == []
@@ -0,0 +1,74 @@
+# tests/test_sheet_parts.py
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook
+
+from benchmarks.payloads import build_payload
+from generators.common.disk_cache import DiskCache
+from generators.excel import sheet_parts
+from generators.excel.engine import generate_full_report
+from generators.excel.writer import save_workbook
+
+MODES = ("report", "reference", "combined")
+
+
+@pytest.fixture(scope="module")
+def payload():
+    return build_payload(entries=4, image_size=(320, 240), distinct_images=3)
+
+
+@pytest.fixture(autouse=True)
+def part_cache(tmp_path, monkeypatch):
+    """An empty sheet part cache for every test."""
+    monkeypatch.setattr(sheet_parts, "_part_cache", DiskCache(str(tmp_path), 64 * 1024 * 1024))
+    sheet_parts.SHEET_PART_LOOKUPS.reset()
+
+
+def _build(data, mode, reuse_parts=True):
+    out = BytesIO()
+    save_workbook(generate_full_report(data, mode=mode, reuse_parts=reuse_parts), out)
+    return out.getvalue()
+
+
+def _lookups():
+    """{(sheet, "hit"/"miss"): count} since the last reset."""
+    lookups = {labels: value for _, _, labels, value in sheet_parts.SHEET_PART_LOOKUPS.family()[3]}
+    sheet_parts.SHEET_PART_LOOKUPS.reset()
+    return lookups
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_spliced_build_equals_fresh_build(payload, mode):
+    fresh = _build(payload, mode, reuse_parts=False)
+    first = _build(payload, mode)
+    assert not any(result == "hit" for _, result in _lookups())
+
+    again = _build(payload, mode)
+    lookups = _lookups()
+    assert lookups and all(result == "hit" for _, result in lookups)
+    assert first == fresh
+    assert again == fresh
+
+
+def test_edited_report_splices_unchanged_reference_sheet(payload):
+    _build(payload, "combined")
+    _lookups()
+    edited = dict(payload, activityToday="Something else entirely\non two lines")
+
+    spliced = _build(edited, "combined")
+    assert _lookups() == {("REPORT", "miss"): 1, ("REFERENCE", "hit"): 1}
+    assert spliced == _build(edited, "combined", reuse_parts=False)
+
+
+def test_only_planned_workbooks_skip_filling(payload):
+    _build(payload, "combined")
+
+    planned = generate_full_report(payload, mode="combined", reuse_parts=True)
+    assert isinstance(planned, sheet_parts.PlannedWorkbook)
+    assert not hasattr(planned, "worksheets")
+
+    # Without reuse_parts the cached sheets are filled as usual
+    wb = generate_full_report(payload, mode="combined")
+    assert isinstance(wb, Workbook)
+    assert [len(ws._images) > 0 for ws in wb.worksheets] == [True, True]